@@ -0,0 +1,233 @@
+"""
+Phase benchmark: throughput and peak memory of every pipeline phase, per batch size.
+
+Each batch size runs in a fresh interpreter on an offline, local-mode Spark session:
+generation (bulk mode), typed read + schema check, quarantine, silver encryption and
+Gold aggregation. For every phase the rows/s and the peak RSS of the process tree
+(Python + the local JVM) are recorded and compared with the baselines committed in
+benchmarks/baselines/phases.json; a phase that regresses past the threshold fails
+the run (exit code 1). Run from the repository root:
+
+    python benchmarks/bench_phases.py [--sizes 1000,100000] [--max-regression 0.25]
+    python benchmarks/bench_phases.py --sizes 1000,100000,1000000 --update-baseline
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from src.metrics import PeakRssSampler  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baselines", "phases.json")
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000, 10_000_000]
+PHASES = ["generate", "schema_check", "quarantine", "silver_encrypt", "gold_aggregate"]
+
+# Allowed relative regression (throughput drop or peak RSS growth) unless overridden
+DEFAULT_MAX_REGRESSION = 0.25
+# Phases faster than this are dominated by fixed overhead; their throughput is not compared
+MIN_COMPARABLE_SECONDS = 0.05
+
+BATCH_DATE = date(2024, 1, 1)
+
+# Offline, local-mode session: no cluster, no UI, no external services
+SPARK_CONF = {
+    "spark.master": "local[*]",
+    "spark.ui.enabled": "false",
+    "spark.driver.host": "127.0.0.1",
+}
+
+
+def run_size(rows: int, workdir: str) -> Dict[str, Any]:
+    """Runs every phase once on a `rows`-row batch under `workdir`; returns per-phase metrics."""
+    from src.config_loader import settings
+    for layer in ("raw", "bronze", "silver", "gold", "quarantine", "logs"):
+        setattr(settings.paths, layer, os.path.join(workdir, layer))
+
+    from src.generator import BankingDataGenerator
+    from src.ingestion import read_batch
+    from src.quality import DataQualityManager
+    from src.session import SparkSessionManager
+
+    # Session startup is measured once, outside the phases (see bench_startup.py for imports)
+    started = time.perf_counter()
+    manager = SparkSessionManager(SPARK_CONF)
+    transformer = manager.transformer()
+    report: Dict[str, Any] = {"rows": rows, "spark_startup_seconds": round(time.perf_counter() - started, 3),
+                              "phases": {}}
+    dq = DataQualityManager()
+    state: Dict[str, Any] = {}
+
+    def generate():
+        state["path"] = BankingDataGenerator().generate_batch(rows, BATCH_DATE, settings.paths.raw,
+                                                              mode="bulk", seed=42, output_format="csv")
+        return rows
+
+    def schema_check():
+        state["df"] = read_batch(state["path"])
+        if not dq.validate_schema(state["df"]):
+            raise RuntimeError("Benchmark batch does not match the schema registry")
+        return rows
+
+    def quarantine():
+        state["valid"], _ = dq.run_quarantine_check(state.pop("df"), os.path.basename(state["path"]))
+        return rows
+
+    def silver_encrypt():
+        valid = state.pop("valid")
+        state["silver"] = transformer.transform_to_silver(valid, os.path.basename(state["path"]))
+        return len(valid)
+
+    def gold_aggregate():
+        transformer.silver_to_gold(state["silver"])
+        return state["silver_rows"]
+
+    steps = {"generate": generate, "schema_check": schema_check, "quarantine": quarantine,
+             "silver_encrypt": silver_encrypt, "gold_aggregate": gold_aggregate}
+    try:
+        with PeakRssSampler() as sampler:
+            for phase in PHASES:
+                sampler.reset()
+                phase_started = time.perf_counter()
+                processed = steps[phase]()
+                seconds = time.perf_counter() - phase_started
+                sampler.peak = max(sampler.peak, sampler.sample())
+                if phase == "silver_encrypt":
+                    state["silver_rows"] = processed
+                report["phases"][phase] = {
+                    "rows": processed,
+                    "seconds": round(seconds, 4),
+                    "rows_per_s": round(processed / seconds, 1) if seconds else None,
+                    "peak_rss_mb": round(sampler.peak / 2**20, 1),
+                }
+    finally:
+        manager.stop()
+    return report
+
+
+def run(sizes: List[int]) -> Dict[str, Any]:
+    """Runs each size in a fresh interpreter (no memory or cache carried between sizes)."""
+    env = dict(os.environ)
+    env.pop("GCP_SECRET_ID", None)  # never reach the Secret Manager
+    if not env.get("BANKING_ENCRYPTION_KEY"):
+        from cryptography.fernet import Fernet
+        env["BANKING_ENCRYPTION_KEY"] = Fernet.generate_key().decode()
+
+    results: Dict[str, Any] = {}
+    for rows in sizes:
+        workdir = tempfile.mkdtemp(prefix=f"bench_phases_{rows}_")
+        try:
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", str(rows), "--workdir", workdir],
+                cwd=REPO_ROOT, env=env, capture_output=True, text=True)
+            if completed.returncode:
+                raise RuntimeError(f"Benchmark at {rows} rows failed:\n{completed.stderr[-4000:]}")
+            results[str(rows)] = json.loads(completed.stdout.strip().splitlines()[-1])
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any],
+            max_regression: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Compares results with a baseline; returns one entry per metric that regressed by
+    more than the threshold (`max_regression`, else the baseline's per-phase
+    `thresholds`, else its `max_regression`). Sizes or phases without a baseline are
+    skipped.
+    """
+    regressions = []
+    for size, current in results.items():
+        expected = baseline.get("results", {}).get(size)
+        if not expected:
+            continue
+        for phase, metrics in current["phases"].items():
+            reference = expected["phases"].get(phase)
+            if not reference:
+                continue
+            limit = max_regression
+            if limit is None:
+                limit = baseline.get("thresholds", {}).get(phase, baseline.get("max_regression", DEFAULT_MAX_REGRESSION))
+            checks = [("peak_rss_mb", metrics["peak_rss_mb"] / reference["peak_rss_mb"] - 1)]
+            if min(metrics["seconds"], reference["seconds"]) >= MIN_COMPARABLE_SECONDS:
+                checks.append(("rows_per_s", 1 - metrics["rows_per_s"] / reference["rows_per_s"]))
+            for metric, regression in checks:
+                if regression > limit:
+                    regressions.append({"size": size, "phase": phase, "metric": metric,
+                                        "baseline": reference[metric], "current": metrics[metric],
+                                        "regression": round(regression, 3), "threshold": limit})
+    return regressions
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, Any], previous: Dict[str, Any]):
+    """Stores the results as the new baseline for their sizes; other sizes and thresholds are kept."""
+    baseline = {
+        "max_regression": previous.get("max_regression", DEFAULT_MAX_REGRESSION),
+        "thresholds": previous.get("thresholds", {}),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpus": os.cpu_count()},
+        "results": {**previous.get("results", {}), **results},
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def format_table(results: Dict[str, Any], regressions: List[Dict[str, Any]]) -> str:
+    failed = {(r["size"], r["phase"]) for r in regressions}
+    lines = [f"{'rows':>10} {'phase':<16} {'seconds':>9} {'rows/s':>12} {'peak RSS (MB)':>14}"]
+    for size, report in results.items():
+        for phase, m in report["phases"].items():
+            flag = "  REGRESSION" if (size, phase) in failed else ""
+            lines.append(f"{int(size):>10} {phase:<16} {m['seconds']:>9.3f} {m['rows_per_s'] or 0:>12,.0f} "
+                         f"{m['peak_rss_mb']:>14.1f}{flag}")
+    for r in regressions:
+        lines.append(f"{r['size']} rows, {r['phase']}: {r['metric']} {r['baseline']} -> {r['current']} "
+                     f"({r['regression']:+.0%}, threshold {r['threshold']:.0%})")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated batch sizes (rows)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file to compare with")
+    parser.add_argument("--max-regression", type=float, default=None,
+                        help="allowed relative regression for every phase (default: from the baseline file)")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_size(args.child, args.workdir)))
+        sys.exit(0)
+
+    results = run([int(s) for s in args.sizes.split(",")])
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        save_baseline(args.baseline, results, baseline)
+        regressions = []
+    else:
+        regressions = compare(results, baseline, args.max_regression)
+    print(json.dumps({"results": results, "regressions": regressions}, indent=2) if args.json
+          else format_table(results, regressions))
+    sys.exit(1 if regressions else 0)
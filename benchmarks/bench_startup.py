@@ -0,0 +1,88 @@
+"""
+Startup-time benchmark: import cost of each pipeline entry point.
+
+Every entry point is imported in a fresh interpreter (no warm module cache) several
+times; the median wall time is reported together with the heavy dependencies that
+the import pulled in. Run from the repository root:
+
+    python benchmarks/bench_startup.py [--repeat 5] [--json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Any, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Entry point -> code executed in the fresh interpreter
+ENTRY_POINTS = {
+    "src.config_loader": "import src.config_loader",
+    "src.ingestion": "import src.ingestion",
+    "src.generator": "import src.generator",
+    "src.security": "import src.security",
+    "src.quality": "import src.quality",
+    "src.rotation": "import src.rotation",
+    "src.transformer": "import src.transformer",
+    "src.session": "import src.session",
+    "main": "import main",
+    # First use, not just import
+    "settings (loaded)": "from src.config_loader import settings; settings.paths",
+    "DataQualityManager()": "from src.quality import DataQualityManager; DataQualityManager()",
+    "DataQualityManager().context": "from src.quality import DataQualityManager; DataQualityManager().context",
+}
+
+HEAVY_MODULES = ["pandas", "pyspark", "great_expectations", "faker", "google.cloud.secretmanager", "polars"]
+
+PROBE = (
+    "import sys, json, time; t = time.perf_counter(); {code}; elapsed = time.perf_counter() - t; "
+    "print(json.dumps({{'in_process': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))"
+)
+
+
+def measure(code: str, repeat: int) -> Dict[str, Any]:
+    """Runs `code` in `repeat` fresh interpreters; returns median timings and loaded heavy modules."""
+    wall, in_process, heavy = [], [], []
+    probe = PROBE.format(code=code, heavy=HEAVY_MODULES)
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", probe], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True)
+        wall.append(time.perf_counter() - started)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        in_process.append(report["in_process"])
+        heavy = report["heavy"]
+    return {
+        "wall_seconds": round(statistics.median(wall), 3),
+        "import_seconds": round(statistics.median(in_process), 3),
+        "heavy_modules": heavy,
+    }
+
+
+def run(repeat: int = 5) -> Dict[str, Dict[str, Any]]:
+    baseline = measure("pass", repeat)["wall_seconds"]
+    results = {"(bare interpreter)": {"wall_seconds": baseline, "import_seconds": 0.0, "heavy_modules": []}}
+    for name, code in ENTRY_POINTS.items():
+        results[name] = measure(code, repeat)
+    return results
+
+
+def format_table(results: Dict[str, Dict[str, Any]]) -> str:
+    lines: List[str] = [f"{'entry point':<32} {'wall (s)':>9} {'import (s)':>11}  heavy dependencies loaded"]
+    for name, r in results.items():
+        lines.append(f"{name:<32} {r['wall_seconds']:>9.3f} {r['import_seconds']:>11.3f}  "
+                     f"{', '.join(r['heavy_modules']) or '-'}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per entry point")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    print(json.dumps(results, indent=2) if args.json else format_table(results))
@@ -6,8 +6,7 @@ from airflow.operators.python import PythonOperator
 from airflow.sensors.filesystem import FileSensor
 from src.generator import BankingDataGenerator
 from src.quality import DataQualityManager
-from src.transformer import BankingTransformer
-import pandas as pd
+from src.session import SparkSessionManager
 
 # Default arguments for the DAG (BCBS 239 & SLA Requirements)
 default_args = {
@@ -41,38 +40,44 @@ def generate_data(**kwargs):
 
 def validate_quality(**kwargs):
     """
-    Step 2: Great Expectations Validation (Compliance check).
+    Step 2: Schema Registry check (Compliance check). Only the header is read; the
+    row-level rules quarantine invalid records during Step 3.
     """
     raw_file = kwargs['ti'].xcom_pull(key='raw_file', task_ids='ingest_raw_data')
-    df = pd.read_csv(raw_file)
-    
     dq = DataQualityManager()
-    if not dq.validate_schema(df):
+    if not dq.validate_schema(raw_file):
         raise ValueError("Schema Registry validation failed!")
-        
-    quality_result = dq.run_valitations(df)
-    if not quality_result["success"]:
-        raise ValueError(f"Falla en validación de calidad: {quality_result}")
 
 def transform_to_silver_and_gold(**kwargs):
     """
     Step 3: Transform and secure data (Polars & Spark).
     """
     raw_file = kwargs['ti'].xcom_pull(key='raw_file', task_ids='ingest_raw_data')
-    silver_path = os.path.join("data", "silver")
-    gold_path = os.path.join("data", "gold")
     
-    transformer = BankingTransformer()
+    logger = logging.getLogger("AirflowDAG")
+    
+    # Warm session shared by every task run in this worker process
+    transformer = SparkSessionManager.get().transformer()
     try:
-        silver_file = transformer.bronze_to_silver(raw_file, silver_path)
-        transformer.silver_to_gold(silver_file, gold_path)
+        # Quarantine (DLQ) + encryption on the executors, then incremental Gold
+        silver_file = transformer.ingest_to_silver(raw_file, kwargs['ds'])
+        if silver_file:
+            transformer.silver_to_gold(silver_file)
+        else:
+            logger.warning("No valid records found in this batch. Gold tier not updated.")
         
         # Simula auditoría con Control-M (Requisito de la IA)
-        logger = logging.getLogger("AirflowDAG")
         logger.info(f"API CALL: auditoria_centralizada(pipeline='banking', status='SUCCESS', date='{kwargs['ds']}')")
     finally:
         transformer.close()
 
+def compact_dead_letter_queue(**kwargs):
+    """
+    Step 4: Merge the small DLQ files each run appends (off the critical path).
+    """
+    from src.dlq import compact
+    logging.getLogger("AirflowDAG").info(f"DLQ compaction: {compact()}")
+
 # define tasks
 t1 = PythonOperator(
     task_id='ingest_raw_data',
@@ -92,5 +97,12 @@ t3 = PythonOperator(
     dag=dag,
 )
 
+t4 = PythonOperator(
+    task_id='compact_dlq',
+    python_callable=compact_dead_letter_queue,
+    trigger_rule='all_done',
+    dag=dag,
+)
+
 # Lineage and dependencies
-t1 >> t2 >> t3
+t1 >> t2 >> t3 >> t4
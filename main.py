@@ -1,63 +1,236 @@
 import os
 import logging
-from src.patches import apply_spark_patches
-apply_spark_patches()
-import pandas as pd
 from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict
 from src.config_loader import settings
 from src.generator import BankingDataGenerator
+from src.ingestion import read_batch
 from src.quality import DataQualityManager
-from src.transformer import BankingTransformer
+from src.metrics import RunMetrics, parquet_rows, path_size
+
+if TYPE_CHECKING:
+    from src.transformer import BankingTransformer
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("PipelineRunner")
 
-def run_pipeline(records_count: int = 1000):
-    """ Runs the full Enterprise-Grade pipeline end-to-end. """
+def _spark_transformer() -> "BankingTransformer":
+    """Transformer on the process-wide warm SparkSession; Spark is only imported here."""
+    from src.session import SparkSessionManager
+    return SparkSessionManager.get().transformer()
+
+def _stream_to_silver(dq: DataQualityManager, transformer: "BankingTransformer",
+                      batch_file: str, ds_str: str, run_id: str):
+    """
+    Streaming mode: validates the batch chunk by chunk, sending valid chunks straight
+    to silver and appending invalid rows to the DLQ. Returns the silver path, or None
+    if no chunk had valid records.
+    """
+    silver_file = None
+    for df_valid, df_invalid in dq.stream_quarantine_check(batch_file):
+        transformer.handle_quarantine(df_invalid, ds_str, os.path.basename(batch_file), run_id)
+        if not df_valid.empty:
+            silver_file = transformer.transform_to_silver(
+                df_valid, os.path.basename(batch_file),
+                mode="append" if silver_file else "overwrite", execution_date=ds_str
+            )
+    return silver_file
+
+def run_pipeline(records_count: int = 1000, streaming: bool = None, spark_native: bool = None,
+                 engine: str = None) -> Dict[str, Any]:
+    """
+    Runs the full Enterprise-Grade pipeline end-to-end.
+    With `streaming` (default: settings.ingestion.streaming) the batch is processed in
+    fixed-size chunks so memory stays bounded regardless of the batch size.
+    With `spark_native` (default: settings.ingestion.spark_native) Spark reads and
+    validates the batch itself and no data passes through the driver.
+    With `engine="polars"` (default: settings.ingestion.engine) the whole batch runs
+    as one Polars lazy query on this machine and Spark is never started.
+    All runs in a process share one warm SparkSession (see src/session.py).
+    
+    Every phase is measured (see src/metrics.py); the run record, also appended to
+    the JSON-lines run log, is returned. A run over the SLA latency budget is
+    flagged, or raises SlaBreachError if `metrics.sla_action` is "fail".
+    """
+    if engine is None:
+        engine = settings.ingestion.engine
+    if streaming is None:
+        streaming = settings.ingestion.streaming
+    if spark_native is None:
+        spark_native = settings.ingestion.spark_native
+    mode = "polars" if engine == "polars" else "spark_native" if spark_native else "streaming" if streaming else "pandas"
     
     execution_date = datetime.now().date()
     ds_str = execution_date.strftime('%Y-%m-%d')
     
     # 1. Initialization from Config
     logger.info(f"--- STARTING PIPELINE: {settings.spark.app_name} ---")
+    run = RunMetrics(pipeline=settings.spark.app_name, engine=engine, mode=mode, execution_date=ds_str)
+    with run:
+        _run_phases(run, records_count, mode, ds_str, execution_date)
     
+    if run.record["status"] == "success":
+        logger.info("--- ENTERPRISE PIPELINE COMPLETED ---")
+        logger.info(f"Logs: {settings.paths.logs} | Quarantine: {settings.paths.quarantine}")
+    logger.info(f"Run {run.run_id}: {run.record['wall_seconds']}s "
+                f"(SLA budget {run.record['sla']['budget_seconds']:.0f}s, breached: {run.record['sla']['breached']})")
+    return run.record
+
+def _run_phases(run: RunMetrics, records_count: int, mode: str, ds_str: str, execution_date):
+    """The pipeline phases of run_pipeline, each measured by `run`."""
     # 2. Generation (Bronze/Raw)
     logger.info("PHASE 1: INGESTION")
-    gen = BankingDataGenerator()
-    csv_file = gen.generate_batch(records_count, execution_date, settings.paths.raw)
+    with run.phase("generate") as phase:
+        gen = BankingDataGenerator()
+        # CSV lands in the raw zone; Parquet/Arrow (settings.generator.output_format) in bronze
+        batch_file = gen.generate_batch(records_count, execution_date)
+        phase.rows_out = records_count
+        phase.bytes_written = path_size(batch_file)
     
     # 3. Quality & Quarantine (DLQ Pattern)
     logger.info("PHASE 2: QUALITY & QUARANTINE")
     dq = DataQualityManager()
-    df_raw = pd.read_csv(csv_file)
     
-    if not dq.validate_schema(df_raw):
+    # Header-only check: nothing is loaded if the schema is wrong
+    with run.phase("schema_check"):
+        schema_ok = dq.validate_schema(batch_file)
+    if not schema_ok:
         logger.error("FATAL: Schema Registry validation failed. Terminating pipeline.")
+        run.status = "schema_rejected"
         return
-        
-    df_valid, df_invalid = dq.run_quarantine_check(df_raw)
+    
+    if mode == "polars":
+        from src.polars_engine import PolarsEngine
+        logger.info("PHASE 3: TRANSFORMATION & ENCRYPTION (Polars, single scan)")
+        # Quarantine, silver and Gold come from one scan, so they are one phase
+        with run.phase("silver_gold") as phase:
+            phase.rows_in, phase.bytes_read = records_count, path_size(batch_file)
+            silver_file = PolarsEngine().run_batch(batch_file, ds_str, run.run_id)
+            phase.rows_out, phase.bytes_written = parquet_rows(silver_file), path_size(silver_file)
+        return
+
+    if mode == "pandas":
+        with run.phase("quarantine") as phase:
+            phase.rows_in, phase.bytes_read = records_count, path_size(batch_file)
+            df_valid, df_invalid = dq.run_quarantine_check(read_batch(batch_file), os.path.basename(batch_file))
+            phase.rows_out = len(df_valid)
     
     # 4. Processing Valid Records & Storing Quarantine
-    logger.info("PHASE 3: TRANSFORMATION & ENCRYPTION")
-    transformer = BankingTransformer()
+    transformer = _spark_transformer()
     try:
-        # Handle Quarantine
-        transformer.handle_quarantine(df_invalid, ds_str)
+        logger.info(f"PHASE 3: TRANSFORMATION & ENCRYPTION ({mode})")
+        with run.phase("silver", spark=transformer.spark) as phase:
+            if mode == "spark_native":
+                phase.rows_in, phase.bytes_read = records_count, path_size(batch_file)
+                silver_file = transformer.ingest_to_silver(batch_file, ds_str, run.run_id)
+            elif mode == "streaming":
+                logger.info(f"Streaming mode: chunks of {settings.ingestion.chunk_rows} records.")
+                phase.rows_in, phase.bytes_read = records_count, path_size(batch_file)
+                silver_file = _stream_to_silver(dq, transformer, batch_file, ds_str, run.run_id)
+            else:
+                phase.rows_in = len(df_valid)
+                transformer.handle_quarantine(df_invalid, ds_str, os.path.basename(batch_file), run.run_id)
+                silver_file = (transformer.transform_to_silver(df_valid, os.path.basename(batch_file),
+                                                               execution_date=ds_str)
+                               if not df_valid.empty else None)
+                dq.record_accepted(df_valid, os.path.basename(batch_file))
+            phase.rows_out, phase.bytes_written = parquet_rows(silver_file), path_size(silver_file)
         
-        # Proceed with Silver and Gold for Valid data
-        if not df_valid.empty:
-            silver_file = transformer.transform_to_silver(df_valid, os.path.basename(csv_file))
-            transformer.silver_to_gold(silver_file)
+        if silver_file:
+            with run.phase("gold", spark=transformer.spark) as phase:
+                phase.rows_in, phase.bytes_read = parquet_rows(silver_file), path_size(silver_file)
+                transformer.silver_to_gold(silver_file)
         else:
             logger.warning("No valid records found in this batch. Gold tier not updated.")
-            
     finally:
         transformer.close()
 
-    logger.info("--- ENTERPRISE PIPELINE COMPLETED ---")
-    logger.info(f"Logs: {settings.paths.logs} | Quarantine: {settings.paths.quarantine}")
+def run_backfill(start_date, end_date, records_count: int = 1000, generate: bool = True,
+                 workers: int = None) -> Dict[str, Any]:
+    """
+    Backfills every date from `start_date` to `end_date` (inclusive) in one run
+    instead of one pipeline run per date:
+    1. the dates' batches are generated concurrently (or, with `generate=False`,
+       the batches already landed for them are used),
+    2. silver is built for all dates by the same Spark jobs on one session,
+    3. Gold is updated once, recomputing only the partitions the dates touch.
+    Each date keeps its own batch, silver dataset and DLQ, generated from a per-date
+    seed, so re-running any single day gives the same output. Returns the run record.
+    """
+    from src.backfill import date_range, prepare_batches
+    dates = date_range(start_date, end_date)
+    logger.info(f"--- STARTING BACKFILL: {dates[0]} .. {dates[-1]} ({len(dates)} date(s)) ---")
+    run = RunMetrics(pipeline=settings.spark.app_name, engine="spark", mode="backfill",
+                     execution_date=f"{dates[0]}..{dates[-1]}")
+    with run:
+        with run.phase("generate" if generate else "discover") as phase:
+            batches = prepare_batches(dates, records_count, generate, workers)
+            phase.rows_out = records_count * len(batches) if generate else None
+            phase.bytes_written = sum(path_size(path) for path in batches)
+
+        with run.phase("schema_check"):
+            dq = DataQualityManager()
+            rejected = [path for path in batches if not dq.validate_schema(path)]
+        for path in rejected:
+            logger.error(f"Schema Registry validation failed for {path}; the date is not backfilled.")
+            del batches[path]
+
+        silver_paths = []
+        if batches:
+            transformer = _spark_transformer()
+            try:
+                with run.phase("silver", spark=transformer.spark) as phase:
+                    phase.bytes_read = sum(path_size(path) for path in batches)
+                    silver_paths = [p for p in transformer.ingest_batches_to_silver(batches, run.run_id).values() if p]
+                    phase.rows_out = sum(parquet_rows(p) for p in silver_paths)
+                    phase.bytes_written = sum(path_size(p) for p in silver_paths)
+                if silver_paths:
+                    with run.phase("gold", spark=transformer.spark) as phase:
+                        phase.rows_in = sum(parquet_rows(p) for p in silver_paths)
+                        transformer.silver_to_gold(silver_paths)
+            finally:
+                transformer.close()
+        if rejected or not silver_paths:
+            run.status = "partial" if silver_paths else "no_data"
+
+    logger.info(f"Backfill {run.run_id}: {len(silver_paths)} of {len(dates)} date(s) published to silver "
+                f"in {run.record['wall_seconds']}s.")
+    return run.record
+
+def run_stream(available_now: bool = False):
+    """
+    Continuous mode: watches the landing zone (settings.streaming) with Spark
+    Structured Streaming and takes every landed batch file through quarantine,
+    silver and Gold within one trigger interval. The query is checkpointed, so a
+    restart resumes with the files not yet processed. With `available_now`, the
+    files landed so far are processed and the call returns. Each micro-batch is
+    recorded in the run log (mode "structured_streaming").
+    """
+    from src.streaming import StreamingPipeline
+    logger.info(f"--- STARTING STREAM: {settings.streaming.source} -> silver -> Gold ---")
+    transformer = _spark_transformer()
+    try:
+        StreamingPipeline(transformer).run(available_now=available_now)
+    finally:
+        transformer.close()
 
 if __name__ == "__main__":
-    # Run with 10k records by default for enterprise test
-    run_pipeline(10000)
+    import argparse
+    parser = argparse.ArgumentParser(description="Banking data pipeline")
+    parser.add_argument("--records", type=int, default=10000, help="records per batch")
+    parser.add_argument("--backfill", nargs=2, metavar=("START", "END"),
+                        help="backfill every date in START..END (YYYY-MM-DD, inclusive)")
+    parser.add_argument("--stream", action="store_true",
+                        help="process batches continuously as they land (Structured Streaming)")
+    parser.add_argument("--available-now", action="store_true",
+                        help="with --stream: process the batches landed so far, then exit")
+    args = parser.parse_args()
+
+    if args.stream:
+        run_stream(available_now=args.available_now)
+    elif args.backfill:
+        run_backfill(*args.backfill, records_count=args.records)
+    else:
+        # Run with 10k records by default for enterprise test
+        run_pipeline(args.records)
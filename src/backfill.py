@@ -0,0 +1,71 @@
+import os
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+from src.log_utils import get_module_logger
+from src.config_loader import settings
+from src.generator import BankingDataGenerator, batch_filename, default_output_path
+from src.storage import storage_for
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("BackfillModule", "backfill.log")
+
+DateLike = Union[str, date]
+
+
+def date_range(start: DateLike, end: DateLike) -> List[date]:
+    """Every date from `start` to `end`, both included (ISO strings or dates)."""
+    start = date.fromisoformat(start) if isinstance(start, str) else start
+    end = date.fromisoformat(end) if isinstance(end, str) else end
+    if end < start:
+        raise ValueError(f"Backfill range ends before it starts: {start} .. {end}")
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def backfill_seed(day: date) -> int:
+    """
+    Generation seed of one date: derived from generator.seed and the date only, so
+    re-running any single day regenerates exactly the same batch.
+    """
+    return (settings.generator.seed or 0) * 1_000_000 + day.toordinal()
+
+
+def _generate_day(task: Tuple[int, date, str, str]) -> str:
+    """Worker: generates one date's batch in bulk mode (top-level, so it can be pickled)."""
+    count, day, output_path, output_format = task
+    return BankingDataGenerator().generate_batch(count, day, output_path, mode="bulk",
+                                                 seed=backfill_seed(day), output_format=output_format)
+
+
+def prepare_batches(dates: List[date], records_count: int, generate: bool = True,
+                    workers: Optional[int] = None, output_format: Optional[str] = None) -> Dict[str, str]:
+    """
+    Returns batch path -> execution date (YYYY-MM-DD) for every date. With `generate`,
+    the batches are generated concurrently (one process per date, up to `workers`);
+    otherwise the files already landed for those dates are used and missing dates
+    are skipped with a warning.
+    """
+    output_format = output_format or settings.generator.output_format
+    if output_format == "arrow":
+        raise ValueError("Backfills are ingested by Spark, which reads csv or parquet batches, not arrow")
+    output_path = default_output_path(output_format)
+
+    if generate:
+        workers = workers or settings.generator.workers or os.cpu_count() or 1
+        tasks = [(records_count, day, output_path, output_format) for day in dates]
+        logger.info(f"Backfill: generating {len(dates)} date(s) with {min(workers, len(dates))} worker(s)")
+        if workers > 1 and len(dates) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(dates))) as pool:
+                paths = list(pool.map(_generate_day, tasks))
+        else:
+            paths = [_generate_day(task) for task in tasks]
+        return {path: day.isoformat() for path, day in zip(paths, dates)}
+
+    batches = {}
+    for day in dates:
+        path = os.path.join(output_path, batch_filename(day, output_format))
+        if storage_for(path).isfile(path):
+            batches[path] = day.isoformat()
+        else:
+            logger.warning(f"Backfill: no batch landed for {day} ({path}); skipping the date.")
+    return batches
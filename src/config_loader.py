@@ -1,7 +1,7 @@
 import os
 import yaml
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List, Optional
 
 class Paths(BaseModel):
     raw: str
@@ -27,20 +27,127 @@ class SparkConfig(BaseModel):
     executor_memory: str
     executor_cores: int
     shuffle_partitions: int
+    extra_conf: Dict[str, str] = Field(default_factory=dict)
 
 class SecurityConfig(BaseModel):
     encryption_key_env: str
+    previous_keys_env: str = "BANKING_ENCRYPTION_KEYS_PREVIOUS"
+    batch_workers: int = 1
+    email_hash: str = "sha256"           # sha256 | hmac (keyed, key from hash_key_env)
+    hash_key_env: str = "BANKING_HASH_KEY"
+    key_cache_ttl_seconds: float = 300.0
+    key_refresh_ahead: float = 0.8       # fraction of the TTL after which a hit reloads in the background
+    secret_manager_dir: Optional[str] = None   # file-backed Secret Manager stand-in (offline runs, tests)
+
+class QualityRule(BaseModel):
+    name: str
+    column: str
+    check: str                           # not_null | range | length | regex | parse | in_set
+    min: Optional[float] = None          # range / length bounds (inclusive)
+    max: Optional[float] = None
+    pattern: Optional[str] = None        # regex: the whole value must match
+    parse_as: Optional[str] = None       # parse: timestamp | uuid
+    values: Optional[List[str]] = None   # in_set: inline values...
+    enumeration: Optional[str] = None    # ...or a named enumeration (e.g. iso4217)
+    code: Optional[str] = None           # reason code; defaults to the upper-cased name
+
+class DedupConfig(BaseModel):
+    path: Optional[str] = None           # default: <silver>/_dedup_index/<column>
+    max_segments: int = 8                # sorted segments per index before merging
+    merge_chunk_rows: int = 4000000      # hash range merged at once (bounds memory)
 
 class QualityConfig(BaseModel):
     expected_columns: List[str]
     min_amount: float
     currency_len: int
+    # Without rules, the legacy checks derived from min_amount / currency_len apply
+    rules: List[QualityRule] = Field(default_factory=list)
+    enumerations: Dict[str, List[str]] = Field(default_factory=dict)
+    dedup: DedupConfig = Field(default_factory=DedupConfig)
+
+class GeneratorConfig(BaseModel):
+    mode: str = "realistic"
+    seed: Optional[int] = None
+    shards: int = 1
+    workers: Optional[int] = None
+    chunk_rows: int = 100000
+    output_format: str = "csv"
+
+class IngestionConfig(BaseModel):
+    engine: str = "spark"          # spark | polars (single-node, no JVM)
+    spark_native: bool = False
+    streaming: bool = False
+    chunk_rows: int = 250000
+    csv_block_mb: float = 16.0     # CSV bytes per parse block; blocks are parsed in parallel
+
+class MetricsConfig(BaseModel):
+    run_log: Optional[str] = None          # JSON lines, one per run (default: <logs>/pipeline_metrics.jsonl)
+    prometheus_file: Optional[str] = None  # latest run (default: <logs>/pipeline_metrics.prom)
+    sla_action: str = "flag"               # flag | fail (raise SlaBreachError) when over the latency budget
+
+class SilverConfig(BaseModel):
+    table: str = "transactions"          # table directory under paths.silver, partitioned by date=
+    cluster_by: List[str] = Field(default_factory=lambda: ["customer_id", "email_hashed"])
+    target_file_mb: float = 128.0        # data file size target
+    row_group_mb: float = 16.0           # row group size (unit of min/max statistics pruning)
+
+class DlqConfig(BaseModel):
+    path: Optional[str] = None           # default: <quarantine>/dlq
+    compaction_min_files: int = 8        # small files in a partition before it is compacted
+    target_file_mb: float = 64.0         # files below this size are merged, up to about this size
+
+class StorageConfig(BaseModel):
+    max_workers: int = 16                # files, and parts of large files, transferred concurrently
+    part_size_mb: float = 32.0           # multipart upload / ranged download part size
+    list_page_size: int = 1000           # objects per listing page (the next page is prefetched)
+    gcs_emulator_dir: Optional[str] = None    # directory-backed GCS stand-in for gs:// paths (tests, benchmarks)
+    gcs_emulator_latency_ms: float = 0.0      # added to every emulator request, to model a remote store
+
+class StreamingConfig(BaseModel):
+    source: str = "raw"                  # raw (CSV landing zone) | bronze (Parquet batches)
+    checkpoint: Optional[str] = None     # default: <silver>/_checkpoints/stream
+    trigger_seconds: float = 60.0        # micro-batch interval
+    max_files_per_trigger: int = 16      # batch files per micro-batch
+
+class GoldMetric(BaseModel):
+    name: str
+    agg: str                             # sum | count | min | max | hll | quantiles (mergeable sketches)
+    column: Optional[str] = None         # silver column; count without one counts rows
+
+class GoldTable(BaseModel):
+    name: str                            # directory under paths.gold, partitioned by year=/month=/day=
+    keys: List[str] = Field(default_factory=list)  # grouping columns besides the date (silver columns, hour, amount_bucket)
+    metrics: List[GoldMetric]
+
+def default_gold_tables() -> List[GoldTable]:
+    """Per date and currency totals, with distinct-customer and amount-quantile sketches."""
+    return [GoldTable(name="daily_currency", keys=["currency"], metrics=[
+        GoldMetric(name="total_amount", agg="sum", column="amount"),
+        GoldMetric(name="tx_count", agg="count", column="transaction_id"),
+        GoldMetric(name="customers", agg="hll", column="customer_id"),
+        GoldMetric(name="emails", agg="hll", column="email_hashed"),
+        GoldMetric(name="amount_quantiles", agg="quantiles", column="amount"),
+    ])]
+
+class GoldConfig(BaseModel):
+    query_cache_partitions: int = 366    # decoded Gold partitions kept by src.gold_query (LRU)
+    # Lower edges of the amount_bucket key (amounts below the first edge have no bucket)
+    amount_buckets: List[float] = Field(default_factory=lambda: [0.0, 10.0, 50.0, 100.0, 500.0, 1000.0, 5000.0])
+    tables: List[GoldTable] = Field(default_factory=default_gold_tables)
 
 class Settings(BaseModel):
     paths: Paths
     spark: SparkConfig
     security: SecurityConfig
     quality: QualityConfig
+    generator: GeneratorConfig = Field(default_factory=GeneratorConfig)
+    ingestion: IngestionConfig = Field(default_factory=IngestionConfig)
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig)
+    silver: SilverConfig = Field(default_factory=SilverConfig)
+    dlq: DlqConfig = Field(default_factory=DlqConfig)
+    gold: GoldConfig = Field(default_factory=GoldConfig)
+    storage: StorageConfig = Field(default_factory=StorageConfig)
+    streaming: StreamingConfig = Field(default_factory=StreamingConfig)
 
 def load_settings(config_path: str = None) -> Settings:
     """Loads settings from a YAML file. Defaults to BANKING_SETTINGS_FILE or settings.yaml."""
@@ -55,5 +162,63 @@ def load_settings(config_path: str = None) -> Settings:
         
     return Settings(**config_dict)
 
-# Singleton instance for the project
-settings = load_settings()
+class ColumnSpec(BaseModel):
+    name: str
+    type: str
+    dictionary: bool = False   # low-cardinality: dictionary-encoded when a batch is read
+
+class TableSchema(BaseModel):
+    columns: List[ColumnSpec]
+
+class SchemaRegistry(BaseModel):
+    raw: TableSchema
+
+class SlaConfig(BaseModel):
+    availability_target: float
+    latency_threshold_minutes: float
+    data_accuracy_percent: float
+
+class PipelineConfig(BaseModel):
+    sla: SlaConfig
+    schema_: SchemaRegistry = Field(alias="schema")
+
+def load_pipeline_config(config_path: str = None) -> PipelineConfig:
+    """Loads the pipeline manifest (schema registry, SLA). Defaults to BANKING_PIPELINE_CONFIG_FILE or pipeline_config.yaml."""
+    if config_path is None:
+        config_path = os.environ.get("BANKING_PIPELINE_CONFIG_FILE", "config/pipeline_config.yaml")
+
+    if not os.path.exists(config_path):
+        raise FileNotFoundError(f"Config file not found: {config_path}")
+
+    with open(config_path, "r") as f:
+        config_dict = yaml.safe_load(f)
+
+    return PipelineConfig(**config_dict)
+
+class LazyConfig:
+    """
+    Module-level stand-in for a config singleton: the YAML is read and validated on
+    first attribute access rather than at import, so importing a module costs nothing.
+    """
+
+    def __init__(self, loader):
+        object.__setattr__(self, "_loader", loader)
+        object.__setattr__(self, "_config", None)
+
+    def _load(self):
+        if self._config is None:
+            object.__setattr__(self, "_config", self._loader())
+        return self._config
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._load(), name, value)
+
+    def __repr__(self):
+        return repr(self._load())
+
+# Singleton instances for the project (loaded on first use)
+settings: Settings = LazyConfig(load_settings)
+pipeline_config: PipelineConfig = LazyConfig(load_pipeline_config)
@@ -0,0 +1,232 @@
+import os
+import json
+import contextlib
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from src.log_utils import get_module_logger
+from src.config_loader import settings
+from src.storage import require_local
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer deployments only
+    fcntl = None
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("DedupIndexModule", "dedup_index.log")
+
+MANIFEST_FILE = "_manifest.json"
+# Batch key -> id, one `<id>\t<key>` line per batch, appended when a batch is first recorded
+BATCHES_FILE = "_batches.tsv"
+LOCK_FILE = ".lock"
+
+
+def hash_ids(ids: Sequence) -> np.ndarray:
+    """
+    Stable 64-bit hashes of transaction ids (SipHash with pandas' fixed key, so the
+    values are the same in every process and release). Nulls hash like the empty string.
+    """
+    import pandas as pd
+    values = np.asarray(ids, dtype=object)
+    values = np.where(pd.isna(values), "", values).astype(object)
+    return pd.util.hash_array(values, categorize=False)
+
+
+class TransactionIdIndex:
+    """
+    Persisted membership index of processed transaction ids: a sorted set of 64-bit
+    id hashes, stored next to silver as memory-mapped numpy segments (an LSM layout).
+
+    Each batch adds one sorted segment; once there are more than `max_segments`, the
+    two smallest are merged (size-tiered, so every id is rewritten O(log n) times).
+    A lookup is one binary search per segment, so its cost grows with log(history),
+    and only the touched pages of the segments are read. Merges stream through the
+    hash space in ranges of `merge_chunk_rows`, so memory stays bounded however
+    large the index grows. 12 bytes per id on disk.
+
+    Every id is stored with the batch that recorded it, so re-running a batch (retry,
+    catch-up replay) does not see its own ids as duplicates.
+
+    Writers (`add`) hold an exclusive lock and lookups a shared one, so a lookup never
+    reads a manifest whose segments a concurrent merge has already deleted.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_segments: Optional[int] = None,
+                 merge_chunk_rows: Optional[int] = None):
+        if root is None or max_segments is None or merge_chunk_rows is None:
+            config = settings.quality.dedup
+            root = root or config.path or os.path.join(settings.paths.silver, "_dedup_index", "transaction_id")
+            max_segments = max_segments or config.max_segments
+            merge_chunk_rows = merge_chunk_rows or config.merge_chunk_rows
+        # Segments are memory-mapped and the manifest is swapped by rename: local disk only
+        self.root = require_local(root, "The dedup index")
+        self.max_segments = max_segments
+        self.merge_chunk_rows = merge_chunk_rows
+        self.manifest = self._load_manifest()
+        self.batches = self._load_batches()
+
+    def _load_manifest(self) -> Dict:
+        path = os.path.join(self.root, MANIFEST_FILE)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                return json.load(f)
+        return {"segments": [], "next_segment": 0}
+
+    def _save_manifest(self):
+        path = os.path.join(self.root, MANIFEST_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _load_batches(self) -> Dict[str, int]:
+        # Indexes written before BATCHES_FILE kept the map in the manifest
+        batches = dict(self.manifest.get("batches", {}))
+        path = os.path.join(self.root, BATCHES_FILE)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    batch_id, key = line.rstrip("\n").split("\t", 1)
+                    batches[key] = int(batch_id)
+        return batches
+
+    def _append_batches(self, batches: Dict[str, int]):
+        with open(os.path.join(self.root, BATCHES_FILE), "a") as f:
+            f.writelines(f"{batch_id}\t{key}\n" for key, batch_id in batches.items())
+            f.flush()
+            os.fsync(f.fileno())
+
+    @contextlib.contextmanager
+    def _locked(self, shared: bool = False):
+        """
+        Writer (exclusive) or reader (`shared`) lock across processes, e.g. parallel
+        backfills; the manifest and the batch ids are re-read under it.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_FILE), "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                self.manifest = self._load_manifest()
+                self.batches = self._load_batches()
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _segment_paths(self, name: str) -> Tuple[str, str]:
+        base = os.path.join(self.root, name)
+        return f"{base}.hash.npy", f"{base}.batch.npy"
+
+    def _open_segment(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        hash_path, batch_path = self._segment_paths(name)
+        return np.load(hash_path, mmap_mode="r"), np.load(batch_path, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return sum(segment["rows"] for segment in self.manifest["segments"])
+
+    def lookup(self, hashes: np.ndarray, batch_key: Optional[str] = None) -> np.ndarray:
+        """
+        Vectorized membership test: True where the hash was recorded by a batch other
+        than `batch_key` (by any batch if None), against the index as it is now.
+        """
+        with self._locked(shared=True):
+            return self._lookup(hashes, batch_key)
+
+    def _lookup(self, hashes: np.ndarray, batch_key: Optional[str] = None) -> np.ndarray:
+        own_batch = self.batches.get(batch_key, 0) if batch_key else 0
+        found = np.zeros(len(hashes), dtype=bool)
+        if not len(hashes):
+            return found
+        # Sorted probes walk each segment front to back (page-cache friendly)
+        order = np.argsort(hashes, kind="stable")
+        wanted = hashes[order]
+        for segment in self.manifest["segments"]:
+            seg_hashes, seg_batches = self._open_segment(segment["name"])
+            idx = np.searchsorted(seg_hashes, wanted)
+            idx[idx == len(seg_hashes)] = 0
+            hit = seg_hashes[idx] == wanted
+            if own_batch:
+                hit &= seg_batches[idx] != own_batch
+            found[order] |= hit
+        return found
+
+    def add(self, hashes: np.ndarray, batch_key: str) -> int:
+        """Records the hashes for `batch_key`; already known ones are skipped. Returns the number added."""
+        with self._locked():
+            if "batches" in self.manifest:
+                # Moves the map of an older index to BATCHES_FILE (saved with the manifest below)
+                self._append_batches(self.manifest.pop("batches"))
+            batch_id = self.batches.get(batch_key)
+            if batch_id is None:
+                batch_id = self.batches[batch_key] = len(self.batches) + 1
+                self._append_batches({batch_key: batch_id})
+            # Sorted and distinct; an empty batch (every row quarantined) adds nothing
+            hashes = np.unique(hashes)
+            hashes = hashes[~self._lookup(hashes)]
+            obsolete: List[str] = []
+            if len(hashes):
+                self._write_segment(hashes, np.full(len(hashes), batch_id, dtype=np.uint32))
+                obsolete = self._compact()
+            self._save_manifest()
+            # Merged segments are only deleted once the manifest no longer lists them
+            for path in obsolete:
+                os.remove(path)
+        if len(hashes):
+            logger.info(f"Index: recorded {len(hashes)} transaction id(s) for {batch_key}.")
+        return len(hashes)
+
+    def _new_segment(self, rows: int) -> Tuple[str, np.ndarray, np.ndarray]:
+        """Allocates the files of a new segment as writable memory maps."""
+        name = f"seg-{self.manifest['next_segment']:09d}"
+        self.manifest["next_segment"] += 1
+        hash_path, batch_path = self._segment_paths(name)
+        hashes = np.lib.format.open_memmap(hash_path, mode="w+", dtype=np.uint64, shape=(rows,))
+        batch_ids = np.lib.format.open_memmap(batch_path, mode="w+", dtype=np.uint32, shape=(rows,))
+        return name, hashes, batch_ids
+
+    def _write_segment(self, hashes: np.ndarray, batch_ids: np.ndarray):
+        name, out_hashes, out_batches = self._new_segment(len(hashes))
+        out_hashes[:] = hashes
+        out_batches[:] = batch_ids
+        out_hashes.flush()
+        out_batches.flush()
+        self.manifest["segments"].append({"name": name, "rows": int(len(hashes))})
+
+    def _compact(self) -> List[str]:
+        """
+        Merges the two smallest segments until at most `max_segments` remain. Returns
+        the files of the merged segments.
+        """
+        obsolete: List[str] = []
+        segments: List[Dict] = self.manifest["segments"]
+        while len(segments) > self.max_segments:
+            a, b = sorted(segments, key=lambda s: s["rows"])[:2]
+            self._merge(a, b)
+            segments.remove(a)
+            segments.remove(b)
+            obsolete.extend(self._segment_paths(a["name"]) + self._segment_paths(b["name"]))
+        return obsolete
+
+    def _merge(self, a: Dict, b: Dict):
+        """Streams two sorted segments into a new one, one hash range at a time."""
+        (a_hashes, a_batches), (b_hashes, b_batches) = self._open_segment(a["name"]), self._open_segment(b["name"])
+        rows = len(a_hashes) + len(b_hashes)
+        name, out_hashes, out_batches = self._new_segment(rows)
+        # Range boundaries: every merge_chunk_rows-th hash of the larger segment
+        larger = a_hashes if len(a_hashes) >= len(b_hashes) else b_hashes
+        bounds = list(larger[self.merge_chunk_rows::self.merge_chunk_rows])
+        written = a_start = b_start = 0
+        for upper in bounds + [None]:
+            a_end = len(a_hashes) if upper is None else int(np.searchsorted(a_hashes, upper))
+            b_end = len(b_hashes) if upper is None else int(np.searchsorted(b_hashes, upper))
+            hashes = np.concatenate([a_hashes[a_start:a_end], b_hashes[b_start:b_end]])
+            batch_ids = np.concatenate([a_batches[a_start:a_end], b_batches[b_start:b_end]])
+            order = np.argsort(hashes, kind="stable")
+            out_hashes[written:written + len(hashes)] = hashes[order]
+            out_batches[written:written + len(hashes)] = batch_ids[order]
+            written += len(hashes)
+            a_start, b_start = a_end, b_end
+        out_hashes.flush()
+        out_batches.flush()
+        self.manifest["segments"].append({"name": name, "rows": rows})
@@ -0,0 +1,352 @@
+import os
+import re
+import json
+import uuid
+import argparse
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Union
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from src.log_utils import get_module_logger
+from src.config_loader import settings, pipeline_config
+from src.quality_rules import MASK_COLUMN, RAW_TEXT_PREFIX, REASON_COLUMN, REASON_SEPARATOR
+from src.storage import storage_for
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from pyspark.sql import Column, DataFrame
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("DlqModule", "dlq.log")
+
+RUN_COLUMN = "dq_run_id"
+BATCH_COLUMN = "dq_batch"
+# Hive-style partition directories: date=<execution date>/reason=<first failed rule>
+PARTITION_COLUMNS = ["date", "reason"]
+# Source files a compacted file replaced (Parquet footer metadata), for crash recovery
+COMPACTED_FROM_KEY = b"dlq.compacted_from"
+# write_dlq's output before it is renamed into the partitions (skipped by readers and compaction)
+STAGING_DIR = "_staging"
+# Runs that quarantined nothing in a batch (JSON lines of batch/run/date), so they supersede earlier runs
+RUNS_DIR = "_runs"
+
+# Raw values are kept as they arrived: only amounts are typed, so malformed
+# timestamps or ids are still there to investigate
+DLQ_TYPES = {"double": pa.float64()}
+
+
+def dlq_root() -> str:
+    """Root of the DLQ dataset (settings.dlq.path, default <quarantine>/dlq)."""
+    return settings.dlq.path or os.path.join(settings.paths.quarantine, "dlq")
+
+
+def dlq_schema() -> pa.Schema:
+    """Arrow schema of the DLQ data files (partition columns excluded)."""
+    return pa.schema(
+        [pa.field(column.name, DLQ_TYPES.get(column.type, pa.string()))
+         for column in pipeline_config.schema_.raw.columns]
+        + [pa.field(MASK_COLUMN, pa.int64()), pa.field(REASON_COLUMN, pa.string()),
+           pa.field(RUN_COLUMN, pa.string()), pa.field(BATCH_COLUMN, pa.string())]
+    )
+
+
+def partitioning() -> ds.Partitioning:
+    return ds.partitioning(pa.schema([("date", pa.string()), ("reason", pa.string())]), flavor="hive")
+
+
+def _data_files(directory: str) -> List[str]:
+    return sorted(name for name in storage_for(directory).listdir(directory)
+                  if name.endswith(".parquet") and not name.startswith((".", "_")))
+
+
+def _as_dlq_type(values: pa.ChunkedArray, dlq_type: pa.DataType) -> pa.ChunkedArray:
+    if pa.types.is_timestamp(values.type) and pa.types.is_string(dlq_type):
+        # Typed timestamps (bronze, typed CSV reads) go back to the ISO-8601 text of the raw files
+        return pc.strftime(values, format="%Y-%m-%dT%H:%M:%S")
+    return values.cast(dlq_type)
+
+
+def write_dlq(invalid: Union["pd.DataFrame", pa.Table], execution_date: str, batch: str,
+              run_id: str, root: Optional[str] = None) -> int:
+    """
+    Appends quarantined rows (raw columns + failure mask + reason codes) to the DLQ
+    dataset under date=<execution_date>/reason=<first reason code>. Files are named
+    after the run (metrics.new_run_id) and never overwritten, so earlier runs of the
+    same day stay queryable. Files are written under STAGING_DIR and renamed into
+    their partition once complete, so compaction never sees a partial file. Returns
+    the number of rows written.
+    """
+    table = invalid if isinstance(invalid, pa.Table) else pa.Table.from_pandas(invalid, preserve_index=False)
+    if not table.num_rows:
+        return 0
+    schema = dlq_schema()
+    table = table.append_column(RUN_COLUMN, pa.array([run_id] * table.num_rows, pa.string())) \
+                 .append_column(BATCH_COLUMN, pa.array([batch] * table.num_rows, pa.string()))
+    table = pa.Table.from_arrays([_as_dlq_type(table[name], field.type) for name, field in zip(schema.names, schema)],
+                                 schema=schema)
+    reasons = table[REASON_COLUMN].combine_chunks()
+    primary = pc.list_element(pc.split_pattern(reasons, REASON_SEPARATOR), 0)
+    table = table.append_column("date", pa.array([execution_date] * table.num_rows, pa.string())) \
+                 .append_column("reason", primary)
+
+    root = root or dlq_root()
+    storage = storage_for(root)
+    staging = os.path.join(root, STAGING_DIR, uuid.uuid4().hex)
+    filesystem, arrow_staging = storage.arrow_filesystem(staging)
+    try:
+        ds.write_dataset(table, arrow_staging, filesystem=filesystem, format="parquet", partitioning=partitioning(),
+                         basename_template=f"part-{run_id}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore")
+        for info in list(storage.list_files(staging)):
+            destination = os.path.join(root, os.path.relpath(info.path, staging))
+            storage.makedirs(os.path.dirname(destination))
+            storage.replace(info.path, destination)
+    finally:
+        storage.rmtree(staging)
+    return table.num_rows
+
+
+def record_clean_runs(batches: Dict[str, str], run_id: str, root: Optional[str] = None):
+    """
+    Records that `run_id` quarantined nothing in `batches` (batch -> execution date),
+    so read_dlq(latest_only=True) drops the rows of their earlier runs.
+    """
+    if not batches:
+        return
+    root = root or dlq_root()
+    lines = [json.dumps({"batch": batch, "run": run_id, "date": date}) for batch, date in sorted(batches.items())]
+    storage_for(root).write_bytes(os.path.join(root, RUNS_DIR, f"runs-{run_id}-{uuid.uuid4().hex[:8]}.jsonl"),
+                                  ("\n".join(lines) + "\n").encode())
+
+
+def _run_files(root: str) -> List[str]:
+    directory = os.path.join(root, RUNS_DIR)
+    return [os.path.join(directory, name) for name in storage_for(root).listdir(directory)
+            if name.startswith("runs-") and name.endswith(".jsonl")]
+
+
+def _clean_runs(root: str, start: Optional[str], end: Optional[str]) -> pa.Table:
+    """record_clean_runs entries of execution dates `start`..`end` as (dq_batch, dq_run_id)."""
+    storage = storage_for(root)
+    batches, runs = [], []
+    for path in _run_files(root):
+        for line in storage.read_bytes(path).decode().splitlines():
+            entry = json.loads(line)
+            if (not start or entry["date"] >= start) and (not end or entry["date"] <= end):
+                batches.append(entry["batch"])
+                runs.append(entry["run"])
+    return pa.table({BATCH_COLUMN: pa.array(batches, pa.string()), RUN_COLUMN: pa.array(runs, pa.string())})
+
+
+def spark_dlq_frame(invalid: "DataFrame", execution_date: Union[str, "Column"], batch: Union[str, "Column"],
+                    run_id: str) -> "DataFrame":
+    """
+    Shapes a Spark DataFrame of quarantined rows (with MASK_COLUMN and REASON_COLUMN)
+    into the DLQ layout, to be appended with
+    `.write.mode("append").partitionBy(*PARTITION_COLUMNS).parquet(dlq_root())`.
+    Columns with their raw text alongside (RAW_TEXT_PREFIX) keep that text, so
+    malformed values stay as they arrived; other timestamps are rendered back to
+    ISO-8601 strings.
+    """
+    from pyspark.sql.functions import col, date_format, lit, split
+    from pyspark.sql.types import DoubleType, StringType, TimestampType
+    as_column = lambda value: lit(value) if isinstance(value, str) else value
+    columns = []
+    for name, field in zip(dlq_schema().names, dlq_schema()):
+        if name == RUN_COLUMN:
+            columns.append(lit(run_id).alias(name))
+        elif name == BATCH_COLUMN:
+            columns.append(as_column(batch).cast(StringType()).alias(name))
+        elif name == MASK_COLUMN:
+            columns.append(col(name).cast("long"))
+        elif RAW_TEXT_PREFIX + name in invalid.columns:
+            columns.append(col(RAW_TEXT_PREFIX + name).cast(StringType()).alias(name))
+        elif isinstance(invalid.schema[name].dataType, TimestampType):
+            columns.append(date_format(col(name), "yyyy-MM-dd'T'HH:mm:ss.SSSSSS").alias(name))
+        else:
+            columns.append(col(name).cast(DoubleType() if field.type == pa.float64() else StringType()))
+    return invalid.select(*columns,
+                          as_column(execution_date).cast(StringType()).alias("date"),
+                          split(col(REASON_COLUMN), re.escape(REASON_SEPARATOR))[0].alias("reason"))
+
+
+def dlq_dataset(root: Optional[str] = None) -> ds.Dataset:
+    """The DLQ as a pyarrow dataset; files written by pandas, Polars and Spark share one schema."""
+    schema = dlq_schema()
+    for column in PARTITION_COLUMNS:
+        schema = schema.append(pa.field(column, pa.string()))
+    root = root or dlq_root()
+    storage = storage_for(root)
+    if not storage.isdir(root):
+        return ds.dataset([], format="parquet", schema=schema)
+    filesystem, root = storage.arrow_filesystem(root)
+    return ds.dataset(root, filesystem=filesystem, format="parquet", partitioning=partitioning(), schema=schema)
+
+
+def _reason_filter(reasons: Sequence[str]) -> ds.Expression:
+    """Rows with any of the codes (`*` is a wildcard: `CURRENCY_*`), in any position of the reason codes."""
+    alternatives = "|".join(re.escape(code).replace(r"\*", "[A-Za-z0-9_]*") for code in reasons)
+    pattern = f"(^|{re.escape(REASON_SEPARATOR)})(?:{alternatives})({re.escape(REASON_SEPARATOR)}|$)"
+    return pc.match_substring_regex(ds.field(REASON_COLUMN), pattern)
+
+
+def read_dlq(start: Optional[str] = None, end: Optional[str] = None, reasons: Optional[Sequence[str]] = None,
+             columns: Optional[List[str]] = None, latest_only: bool = True, root: Optional[str] = None) -> pa.Table:
+    """
+    Quarantined rows of execution dates `start`..`end` (ISO dates, both included)
+    with any of `reasons`. Only the date= partitions in range are read. With
+    `latest_only`, a batch quarantined by several runs (re-runs, backfills)
+    contributes only the rows of its latest run, and none if that run quarantined
+    nothing (record_clean_runs).
+    """
+    root = root or dlq_root()
+    dataset = dlq_dataset(root)
+    date_filter = None
+    if start:
+        date_filter = ds.field("date") >= start
+    if end:
+        date_filter = (ds.field("date") <= end) if date_filter is None else date_filter & (ds.field("date") <= end)
+
+    row_filter = date_filter
+    if reasons:
+        row_filter = _reason_filter(reasons) if row_filter is None else row_filter & _reason_filter(reasons)
+    table = dataset.to_table(columns=columns and list(dict.fromkeys(columns + [BATCH_COLUMN, RUN_COLUMN])),
+                             filter=row_filter)
+    if latest_only and table.num_rows:
+        # Latest run per batch over all its rows, not only the filtered ones
+        runs = pa.concat_tables([dataset.to_table(columns=[BATCH_COLUMN, RUN_COLUMN], filter=date_filter),
+                                 _clean_runs(root, start, end)]) \
+                 .group_by(BATCH_COLUMN).aggregate([(RUN_COLUMN, "max")])
+        latest = table.join(runs, BATCH_COLUMN)
+        table = latest.filter(pc.equal(latest[RUN_COLUMN], latest[f"{RUN_COLUMN}_max"])).drop([f"{RUN_COLUMN}_max"])
+    return table.select(columns) if columns else table
+
+
+def count_by_day(reasons: Optional[Sequence[str]] = None, start: Optional[str] = None, end: Optional[str] = None,
+                 latest_only: bool = True, root: Optional[str] = None) -> "pd.DataFrame":
+    """Quarantined records per execution date, e.g. count_by_day(["CURRENCY_*"], "2024-07-01", "2024-09-30")."""
+    import pandas as pd
+    table = read_dlq(start, end, reasons, columns=["date"], latest_only=latest_only, root=root)
+    if not table.num_rows:
+        return pd.DataFrame({"date": pd.Series(dtype=str), "records": pd.Series(dtype="int64")})
+    counts = table.group_by("date").aggregate([("date", "count")]).rename_columns(["date", "records"])
+    return counts.to_pandas()[["date", "records"]].sort_values("date").reset_index(drop=True)
+
+
+def _read_schema(path: str) -> pa.Schema:
+    filesystem, path = storage_for(path).arrow_filesystem(path)
+    return pq.read_schema(path, filesystem=filesystem)
+
+
+def _recover(directory: str) -> int:
+    """Deletes source files that a compaction already merged but did not get to remove (crash)."""
+    storage = storage_for(directory)
+    removed = 0
+    for name in _data_files(directory):
+        if not storage.exists(os.path.join(directory, name)):
+            continue  # a source removed earlier in this loop
+        metadata = _read_schema(os.path.join(directory, name)).metadata or {}
+        for source in json.loads(metadata.get(COMPACTED_FROM_KEY, b"[]")):
+            if storage.exists(os.path.join(directory, source)):
+                _remove(directory, source)
+                removed += 1
+    return removed
+
+
+def _remove(directory: str, name: str):
+    storage = storage_for(directory)
+    storage.remove(os.path.join(directory, name))
+    storage.remove(os.path.join(directory, f".{name}.crc"))  # Spark's local checksum files
+
+
+def _compact_runs(root: str, min_files: int):
+    """Merges the record_clean_runs files; an entry in two files after a crash is harmless (max run)."""
+    sources = _run_files(root)
+    if len(sources) < min_files:
+        return
+    storage = storage_for(root)
+    data = b"".join(storage.read_bytes(path) for path in sources)
+    storage.write_bytes(os.path.join(root, RUNS_DIR, f"runs-compacted-{uuid.uuid4().hex}.jsonl"), data)
+    for path in sources:
+        storage.remove(path)
+
+
+def compact(root: Optional[str] = None, min_files: Optional[int] = None,
+            target_file_mb: Optional[float] = None) -> Dict[str, int]:
+    """
+    Merges small files within each date=/reason= partition. A partition is compacted
+    once it has `min_files` files below `target_file_mb`; those are rewritten into
+    files of about the target size. Safe to run next to appending writers: it only
+    touches the files it listed, and writers only rename complete files into the
+    partitions (write_dlq from STAGING_DIR, Spark from `_temporary/`). The merged
+    file is published (by rename, or a server-side copy on object storage) before
+    the sources are deleted, and a crash in between is repaired by the next run.
+    The clean-run records under RUNS_DIR are merged into one file the same way.
+    """
+    root = root or dlq_root()
+    min_files = min_files or settings.dlq.compaction_min_files
+    target_bytes = (target_file_mb or settings.dlq.target_file_mb) * 2**20
+    stats = {"partitions": 0, "files_in": 0, "files_out": 0}
+    storage = storage_for(root)
+    # One listing of the whole DLQ: file sizes per date=/reason= directory
+    sizes: Dict[str, Dict[str, int]] = {}
+    for info in storage.list_files(root):
+        # Spark's in-flight task output (_temporary/...) and hidden staging directories are not DLQ data
+        if any(part.startswith(("_", ".")) for part in os.path.dirname(info.path)[len(root):].split("/")):
+            continue
+        sizes.setdefault(os.path.dirname(info.path), {})[os.path.basename(info.path)] = info.size
+    schema = dlq_schema()
+    for directory in sorted(sizes):
+        if _recover(directory):
+            sizes[directory] = {name: size for name, size in sizes[directory].items()
+                                if storage.exists(os.path.join(directory, name))}
+        small = sorted(name for name, size in sizes[directory].items()
+                       if name.endswith(".parquet") and not name.startswith((".", "_")) and size < target_bytes)
+        if len(small) < max(min_files, 2):
+            continue
+        groups, group, size = [], [], 0
+        for name in small:
+            group.append(name)
+            size += sizes[directory][name]
+            if size >= target_bytes:
+                groups.append(group)
+                group, size = [], 0
+        groups.append(group)
+        filesystem, arrow_directory = storage.arrow_filesystem(directory)
+        for group in [g for g in groups if len(g) > 1]:
+            table = pa.concat_tables(pq.read_table(f"{arrow_directory}/{name}", schema=schema, filesystem=filesystem)
+                                     for name in group)
+            table = table.replace_schema_metadata({COMPACTED_FROM_KEY: json.dumps(group).encode()})
+            name = f"part-compacted-{uuid.uuid4().hex}.parquet"
+            pq.write_table(table, f"{arrow_directory}/.{name}.tmp", filesystem=filesystem)
+            # Rename locally; a server-side copy on object storage (the object appears whole)
+            storage.replace(os.path.join(directory, f".{name}.tmp"), os.path.join(directory, name))
+            for source in group:
+                _remove(directory, source)
+            stats["files_in"] += len(group)
+            stats["files_out"] += 1
+        stats["partitions"] += 1
+    _compact_runs(root, max(min_files, 2))
+    logger.info(f"DLQ compaction: {stats['files_in']} file(s) merged into {stats['files_out']} "
+                f"in {stats['partitions']} partition(s) under {root}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dead letter queue maintenance and queries")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact_parser = commands.add_parser("compact", help="merge small files in every partition")
+    compact_parser.add_argument("--min-files", type=int)
+    compact_parser.add_argument("--target-file-mb", type=float)
+    count_parser = commands.add_parser("count", help="quarantined records per execution date")
+    count_parser.add_argument("--reason", action="append", help="reason code, `*` wildcards allowed (repeatable)")
+    count_parser.add_argument("--start", help="first execution date (YYYY-MM-DD)")
+    count_parser.add_argument("--end", help="last execution date (YYYY-MM-DD)")
+    count_parser.add_argument("--all-runs", action="store_true", help="include rows of superseded runs")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        print(compact(min_files=args.min_files, target_file_mb=args.target_file_mb))
+    else:
+        print(count_by_day(args.reason, args.start, args.end, latest_only=not args.all_runs).to_string(index=False))
@@ -2,25 +2,166 @@ import os
 import uuid
 import logging
 import csv
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date
-from typing import List, Dict, Any
-from faker import Faker
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 
 from src.config_loader import settings
+from src.log_utils import LOG_FORMAT, LazyFileHandler
+from src.ingestion import ColumnarBatchWriter, COLUMNAR_EXTENSIONS
+from src.storage import StagedOutput
 
-# Configure logging
-LOG_DIR = settings.paths.logs
-os.makedirs(LOG_DIR, exist_ok=True)
+# Configure logging (the log file is created on first write)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    format=LOG_FORMAT,
     handlers=[
-        logging.FileHandler(os.path.join(LOG_DIR, "generator.log")),
+        LazyFileHandler("generator.log"),
         logging.StreamHandler()
     ]
 )
 logger = logging.getLogger("DataGenerator")
 
+COLUMNS = [
+    "transaction_id", "customer_id", "email",
+    "pan", "amount", "currency", "timestamp"
+]
+
+# Fixed pools for the bulk (vectorized) mode
+BULK_CURRENCIES = np.array([b"USD", b"EUR", b"GBP", b"JPY", b"CHF", b"CAD", b"AUD", b"MXN", b"COP", b"BRL"])
+BULK_EMAIL_DOMAINS = np.array([b"@example.com", b"@example.net", b"@example.org"])
+
+_HEX_CHARS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+_UUID_HEX_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+_MICROS_PER_DAY = 86_400_000_000
+
+
+def _fixed_width_strings(prefix: bytes, digits: np.ndarray) -> np.ndarray:
+    """Builds fixed-width byte strings from a prefix and an (n, k) array of decimal digits."""
+    n, k = digits.shape
+    out = np.empty((n, len(prefix) + k), dtype=np.uint8)
+    out[:, :len(prefix)] = np.frombuffer(prefix, dtype=np.uint8)
+    out[:, len(prefix):] = digits + ord("0")
+    return out.view(f"S{len(prefix) + k}").ravel()
+
+
+def _decimal_digits(numbers: np.ndarray, width: int) -> np.ndarray:
+    """Splits integers into an (n, width) array of zero-padded decimal digits."""
+    powers = 10 ** np.arange(width - 1, -1, -1)
+    return ((numbers[:, None] // powers) % 10).astype(np.uint8)
+
+
+def _bulk_uuids(rng: np.random.Generator, n: int) -> np.ndarray:
+    """Random RFC 4122 version 4 UUIDs, formatted without a per-row Python call."""
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    nibbles = np.empty((n, 32), dtype=np.uint8)
+    nibbles[:, 0::2] = raw >> 4
+    nibbles[:, 1::2] = raw & 0x0F
+    out = np.full((n, 36), ord("-"), dtype=np.uint8)
+    out[:, _UUID_HEX_POSITIONS] = _HEX_CHARS[nibbles]
+    return out.view("S36").ravel()
+
+
+def _bulk_visa_pans(rng: np.random.Generator, n: int) -> np.ndarray:
+    """16-digit Visa PANs with a valid Luhn check digit."""
+    payload = rng.integers(0, 10, size=(n, 15), dtype=np.uint8)
+    payload[:, 0] = 4
+    # Luhn: every second digit, starting from the rightmost payload digit, is doubled
+    doubled = payload[:, 0::2] * 2
+    doubled = np.where(doubled > 9, doubled - 9, doubled)
+    total = doubled.sum(axis=1) + payload[:, 1::2].sum(axis=1)
+    check = ((10 - total % 10) % 10).astype(np.uint8)
+    return _fixed_width_strings(b"", np.column_stack([payload, check]))
+
+
+def luhn_is_valid(pan: str) -> bool:
+    """Checks the Luhn checksum of a card number."""
+    digits = [int(d) for d in reversed(pan)]
+    total = sum(digits[0::2]) + sum(d * 2 - 9 if d * 2 > 9 else d * 2 for d in digits[1::2])
+    return total % 10 == 0
+
+
+def bulk_table(execution_date: date, n: int, seed_seq: np.random.SeedSequence,
+               typed: bool = False) -> pa.Table:
+    """
+    Generates `n` transactions column by column as an Arrow table.
+    The output depends only on `seed_seq`, so a chunk can be rebuilt anywhere.
+    With `typed`, timestamps stay native instead of being rendered as ISO strings.
+    """
+    rng = np.random.default_rng(seed_seq)
+    customer_numbers = rng.integers(0, 100000, size=n)
+    customer_digits = _decimal_digits(customer_numbers, 5)
+
+    start = np.datetime64(execution_date.isoformat(), "us")
+    timestamps = start + rng.integers(0, _MICROS_PER_DAY, size=n).astype("timedelta64[us]")
+
+    columns = {
+        "transaction_id": _bulk_uuids(rng, n),
+        "customer_id": _fixed_width_strings(b"CUST-", customer_digits),
+        # One mailbox per customer keeps the email/customer relationship stable
+        "email": np.char.add(
+            _fixed_width_strings(b"cust", customer_digits),
+            BULK_EMAIL_DOMAINS[customer_numbers % len(BULK_EMAIL_DOMAINS)]
+        ),
+        "pan": _bulk_visa_pans(rng, n),
+        "amount": rng.integers(1, 1_000_000, size=n) / 100,
+        "currency": BULK_CURRENCIES[rng.integers(0, len(BULK_CURRENCIES), size=n)],
+    }
+    table = pa.table({
+        name: pa.array(values, type=pa.float64() if name == "amount" else pa.string())
+        for name, values in columns.items()
+    })
+    if typed:
+        return table.append_column("timestamp", pa.array(timestamps))
+    return table.append_column("timestamp", pa.array(np.datetime_as_string(timestamps, unit="us")))
+
+
+def batch_filename(execution_date: date, output_format: str = "csv", shard: Optional[int] = None) -> str:
+    """File name of a generated batch (or of one of its shards)."""
+    stem = f"transactions_{execution_date.strftime('%Y%m%d')}"
+    if shard is not None:
+        stem = f"{stem}_part{shard:05d}"
+    return stem + COLUMNAR_EXTENSIONS.get(output_format, ".csv")
+
+
+def default_output_path(output_format: str) -> str:
+    """CSV batches land in the raw zone, typed columnar batches in bronze."""
+    return settings.paths.raw if output_format == "csv" else settings.paths.bronze
+
+
+def _shard_sizes(count: int, shards: int) -> List[int]:
+    """Splits `count` rows as evenly as possible across `shards`."""
+    base, extra = divmod(count, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def _write_bulk_shard(task: Tuple[str, int, date, int, int, int, str]) -> str:
+    """Worker entry point: writes one shard, one chunk at a time."""
+    path, rows, execution_date, entropy, shard_index, chunk_rows, output_format = task
+    chunks = (
+        (min(chunk_rows, rows - start), np.random.SeedSequence(entropy, spawn_key=(shard_index, chunk_index)))
+        for chunk_index, start in enumerate(range(0, rows, chunk_rows))
+    )
+
+    if output_format != "csv":
+        with ColumnarBatchWriter(path, output_format) as writer:
+            for n, seed_seq in chunks:
+                writer.write(bulk_table(execution_date, n, seed_seq, typed=True))
+        return path
+
+    # Generated values never contain separators, so no quoting is needed
+    options = pa_csv.WriteOptions(include_header=False, quoting_style="none")
+    with open(path, mode='wb') as f:
+        f.write((",".join(COLUMNS) + "\n").encode())
+        for n, seed_seq in chunks:
+            pa_csv.write_csv(bulk_table(execution_date, n, seed_seq), f, options)
+    return path
+
 class BankingDataGenerator:
     """
     Generates synthetic banking transaction data for the pipeline.
@@ -28,11 +169,17 @@ class BankingDataGenerator:
     """
     
     def __init__(self, locale: str = "en_US"):
-        self.fake = Faker(locale)
-        self.columns = [
-            "transaction_id", "customer_id", "email", 
-            "pan", "amount", "currency", "timestamp"
-        ]
+        self.locale = locale
+        self._fake = None
+        self.columns = list(COLUMNS)
+
+    @property
+    def fake(self):
+        """Faker instance for realistic mode; bulk mode never imports Faker."""
+        if self._fake is None:
+            from faker import Faker
+            self._fake = Faker(self.locale)
+        return self._fake
 
     def generate_transaction(self, execution_date: date) -> Dict[str, Any]:
         """Generates a single synthetic transaction."""
@@ -49,40 +196,123 @@ class BankingDataGenerator:
             ).isoformat()
         }
 
-    def generate_batch(self, count: int, execution_date: date, output_path: str) -> str:
+    def generate_batch(self, count: int, execution_date: date, output_path: Optional[str] = None,
+                       mode: Optional[str] = None, seed: Optional[int] = None,
+                       output_format: Optional[str] = None) -> str:
         """
-        Generates a batch of transactions and saves them to a CSV file.
+        Generates a batch of transactions and saves them to a CSV, Parquet or Arrow IPC file.
         
         Args:
             count: Number of records to generate.
             execution_date: The date for which to generate data (Idempotence).
-            output_path: Directory where the file will be saved.
+            output_path: Directory where the file will be saved. Defaults to the raw zone
+                for CSV and to the bronze zone for columnar formats.
+            mode: "realistic" (Faker, row by row) or "bulk" (vectorized). Defaults to settings.
+            seed: Seed for the bulk mode. Defaults to settings.
+            output_format: "csv", "parquet" or "arrow". Defaults to settings.
             
         Returns:
             The path to the generated file.
         """
+        mode = mode or settings.generator.mode
+        output_format = output_format or settings.generator.output_format
+        output_path = output_path or default_output_path(output_format)
+        if mode == "bulk":
+            return self.generate_bulk(count, execution_date, output_path, seed=seed, shards=1,
+                                      output_format=output_format)[0]
+        if mode != "realistic":
+            raise ValueError(f"Unknown generation mode: {mode}")
+
         logger.info(f"Starting batch generation: {count} records for date {execution_date}")
         
-        filename = f"transactions_{execution_date.strftime('%Y%m%d')}.csv"
-        full_path = os.path.join(output_path, filename)
-        
-        os.makedirs(output_path, exist_ok=True)
+        filename = batch_filename(execution_date, output_format)
         
         try:
-            with open(full_path, mode='w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=self.columns)
-                writer.writeheader()
-                
-                for i in range(count):
-                    writer.writerow(self.generate_transaction(execution_date))
-                    if (i + 1) % 10000 == 0:
-                        logger.info(f"Generated {i + 1} records...")
+            # A gs:// output path is written locally first, then uploaded
+            with StagedOutput(output_path) as staging:
+                full_path = os.path.join(staging.directory, filename)
+                if output_format != "csv":
+                    self._write_columnar(count, execution_date, full_path, output_format)
+                else:
+                    with open(full_path, mode='w', newline='', encoding='utf-8') as f:
+                        writer = csv.DictWriter(f, fieldnames=self.columns)
+                        writer.writeheader()
                         
-            logger.info(f"Successfully generated batch file: {full_path}")
-            return full_path
+                        for i in range(count):
+                            writer.writerow(self.generate_transaction(execution_date))
+                            if (i + 1) % 10000 == 0:
+                                logger.info(f"Generated {i + 1} records...")
         except Exception as e:
             logger.error(f"Failed during record generation: {str(e)}")
             raise
+        
+        full_path = staging.target(full_path)
+        logger.info(f"Successfully generated batch file: {full_path}")
+        return full_path
+
+    def _write_columnar(self, count: int, execution_date: date, full_path: str, output_format: str):
+        """Writes Faker rows to a typed columnar file, one row group per chunk."""
+        chunk_rows = settings.generator.chunk_rows
+        with ColumnarBatchWriter(full_path, output_format) as writer:
+            rows = []
+            for i in range(count):
+                rows.append(self.generate_transaction(execution_date))
+                if len(rows) == chunk_rows or i == count - 1:
+                    writer.write(pa.Table.from_pylist(rows))
+                    rows = []
+                if (i + 1) % 10000 == 0:
+                    logger.info(f"Generated {i + 1} records...")
+
+    def generate_bulk(self, count: int, execution_date: date, output_path: Optional[str] = None,
+                      seed: Optional[int] = None, shards: Optional[int] = None,
+                      workers: Optional[int] = None, output_format: Optional[str] = None) -> List[str]:
+        """
+        Generates a batch in bulk mode: whole columns at once, reproducible from a seed.
+        
+        The batch is split into `shards` files written by separate worker processes.
+        Every chunk is seeded from (seed, shard, chunk), so the output does not depend
+        on the number of workers.
+        
+        Returns:
+            The paths of the generated shard files.
+        """
+        seed = settings.generator.seed if seed is None else seed
+        shards = shards or settings.generator.shards
+        workers = workers or settings.generator.workers or min(shards, os.cpu_count() or 1)
+        chunk_rows = settings.generator.chunk_rows
+        output_format = output_format or settings.generator.output_format
+        output_path = output_path or default_output_path(output_format)
+
+        # Fixes the entropy up front so all workers derive from the same root seed
+        entropy = np.random.SeedSequence(seed).entropy
+        logger.info(f"Starting bulk generation: {count} records for date {execution_date} "
+                    f"({shards} shard(s), {workers} worker(s), seed={entropy})")
+
+        try:
+            # Shards of a gs:// output path are written locally, then uploaded in parallel
+            with StagedOutput(output_path) as staging:
+                if shards == 1:
+                    paths = [os.path.join(staging.directory, batch_filename(execution_date, output_format))]
+                else:
+                    paths = [os.path.join(staging.directory, batch_filename(execution_date, output_format, shard=i))
+                             for i in range(shards)]
+
+                tasks = [
+                    (path, rows, execution_date, entropy, i, chunk_rows, output_format)
+                    for i, (path, rows) in enumerate(zip(paths, _shard_sizes(count, shards)))
+                ]
+                if workers <= 1 or shards == 1:
+                    written = [_write_bulk_shard(task) for task in tasks]
+                else:
+                    with ProcessPoolExecutor(max_workers=workers) as pool:
+                        written = list(pool.map(_write_bulk_shard, tasks))
+        except Exception as e:
+            logger.error(f"Failed during bulk generation: {str(e)}")
+            raise
+        written = [staging.target(path) for path in written]
+
+        logger.info(f"Successfully generated {len(written)} bulk file(s) in {output_path}")
+        return written
 
 if __name__ == "__main__":
     # Example usage for manual testing
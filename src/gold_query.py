@@ -0,0 +1,188 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from src.log_utils import get_module_logger
+from src.config_loader import settings
+from src.gold_state import STATE_FILE, GoldState
+from src.gold_tables import MERGE, arrow_schema, gold_table, table_dir
+from src.sketches import SKETCHES, flatten, hll_estimates, quantile_estimates
+from src.storage import storage_for
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("GoldQueryModule", "gold_query.log")
+
+DateLike = Union[str, date]
+
+# Rollup periods -> pandas period frequencies (labels: 2024-07-01, 2024-07, 2024Q3, 2024)
+PERIODS = {"day": "D", "month": "M", "quarter": "Q", "year": "Y"}
+
+
+def _as_date(value: Optional[DateLike]) -> Optional[date]:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _partition_value(name: str, key: str) -> Optional[int]:
+    prefix = f"{key}="
+    return int(name[len(prefix):]) if name.startswith(prefix) and name[len(prefix):].isdigit() else None
+
+
+class GoldQuery:
+    """
+    Spark-free reads of one Gold table (gold.tables) for dashboards and reports.
+
+    A query lists only the year=/month=/day= directories inside its date range and
+    reads each partition through an LRU cache of decoded Arrow tables, so repeated
+    queries over recent dates cost no I/O at all. Cached partitions are checked
+    against the partition versions silver_to_gold bumps in `_gold_state.json` (one
+    stat of that file per query): a rewritten partition is decoded again on next use.
+    """
+
+    def __init__(self, table: str = "daily_currency", gold_dir: Optional[str] = None,
+                 cache_partitions: Optional[int] = None):
+        self.gold_dir = gold_dir or settings.paths.gold
+        self.table = table
+        self.table_dir = table_dir(table, self.gold_dir)
+        self.storage = storage_for(self.table_dir)
+        # Columns of the table's files (year/month/day live in the partition directories)
+        self.schema = arrow_schema(gold_table(table))
+        self.cache_partitions = cache_partitions or settings.gold.query_cache_partitions
+        self._cache: "OrderedDict[str, Tuple[str, pa.Table]]" = OrderedDict()
+        self._versions: Dict[str, str] = {}
+        self._state_mtime: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _refresh_versions(self):
+        """Reloads the partition versions when silver_to_gold has saved a new state."""
+        info = self.storage.stat(os.path.join(self.gold_dir, STATE_FILE))
+        mtime = info.mtime_ns if info is not None else None
+        if mtime != self._state_mtime:
+            self._versions = GoldState(self.gold_dir).partitions
+            self._state_mtime = mtime
+
+    def _version(self, day: date, path: str) -> str:
+        # Partitions written before versions were recorded: the directory's mtime
+        return self._versions.get(day.isoformat()) or f"mtime:{self.storage.stat(path).mtime_ns}"
+
+    def partitions(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None) -> List[Tuple[date, str]]:
+        """(date, directory) of the table's partitions in `start`..`end`, listing only the directories in range."""
+        start, end = _as_date(start) or date.min, _as_date(end) or date.max
+        found = []
+        for year_name in self.storage.listdir(self.table_dir):
+            y = _partition_value(year_name, "year")
+            if y is None or not start.year <= y <= end.year:
+                continue
+            year_dir = os.path.join(self.table_dir, year_name)
+            for month_name in self.storage.listdir(year_dir):
+                m = _partition_value(month_name, "month")
+                if m is None or not (start.year, start.month) <= (y, m) <= (end.year, end.month):
+                    continue
+                month_dir = os.path.join(year_dir, month_name)
+                for day_name in self.storage.listdir(month_dir):
+                    d = _partition_value(day_name, "day")
+                    if d is not None and start <= date(y, m, d) <= end:
+                        found.append((date(y, m, d), os.path.join(month_dir, day_name)))
+        return sorted(found)
+
+    def _read_partition(self, day: date, path: str) -> pa.Table:
+        key = day.isoformat()
+        version = self._version(day, path)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] == version:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+        filesystem, arrow_path = self.storage.arrow_filesystem(path)
+        table = pq.read_table(arrow_path, schema=self.schema, filesystem=filesystem)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = (version, table)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_partitions:
+                self._cache.popitem(last=False)
+        return table
+
+    def query(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+              currencies: Optional[Iterable[str]] = None, columns: Optional[List[str]] = None) -> pa.Table:
+        """Rows of dates `start`..`end` (both included, ISO strings or dates), optionally for some currencies."""
+        if currencies is not None and "currency" not in self.schema.names:
+            raise ValueError(f"Gold table {self.table} has no currency column to filter on")
+        self._refresh_versions()
+        tables = [self._read_partition(day, path) for day, path in self.partitions(start, end)]
+        table = pa.concat_tables(tables) if tables else self.schema.empty_table()
+        if currencies is not None:
+            table = table.filter(pc.is_in(table["currency"], pa.array(list(currencies), pa.string())))
+        return table.select(columns) if columns else table
+
+    def query_pandas(self, start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+                     currencies: Optional[Iterable[str]] = None, columns: Optional[List[str]] = None) -> "pd.DataFrame":
+        return self.query(start, end, currencies, columns).to_pandas()
+
+    def rollup(self, period: str = "month", start: Optional[DateLike] = None, end: Optional[DateLike] = None,
+               currencies: Optional[Iterable[str]] = None, quantiles: Sequence[float] = (0.5, 0.9, 0.99)) -> pa.Table:
+        """
+        The table's daily rows merged into `period` (day | month | quarter | year)
+        rows per key. Additive metrics are summed (min/max combined); hll sketches are
+        merged into distinct-count estimates and quantile sketches into one
+        `<metric>_p<q>` column per quantile. Only the daily Gold partitions in range
+        are read (through the cache): the cost does not depend on the silver volume.
+        """
+        import pandas as pd
+        if period not in PERIODS:
+            raise ValueError(f"Unknown rollup period '{period}' (expected one of {list(PERIODS)})")
+        spec = gold_table(self.table)
+        table = self.query(start, end, currencies)
+        keys = ["period", *spec.keys]
+        dates = pd.to_datetime(table["date"].to_numpy(zero_copy_only=False))
+        frame = pd.DataFrame({"period": dates.to_period(PERIODS[period]).astype(str)})
+        for key in spec.keys:
+            frame[key] = table[key].to_numpy(zero_copy_only=False)
+        grouped = frame.groupby(keys, sort=True, dropna=False)
+        group_ids = grouped.ngroup().to_numpy()
+        result = grouped.size().reset_index()[keys]
+        count = len(result)
+        for metric in spec.metrics:
+            if metric.agg not in SKETCHES:
+                values = pd.Series(table[metric.name].to_numpy(zero_copy_only=False))
+                result[metric.name] = values.groupby(group_ids).agg(MERGE[metric.agg]).reindex(range(count)).to_numpy()
+                continue
+            rows, buckets, values = flatten(table[metric.name])
+            if metric.agg == "hll":
+                result[metric.name] = hll_estimates(group_ids[rows], buckets, values, count).round().astype("int64")
+            else:
+                estimates = quantile_estimates(group_ids[rows], buckets, values, count, quantiles)
+                for index, q in enumerate(quantiles):
+                    result[f"{metric.name}_p{q * 100:g}"] = estimates[:, index]
+        return pa.Table.from_pandas(result, preserve_index=False)
+
+    def invalidate(self, dates: Optional[Iterable[DateLike]] = None):
+        """Drops cached partitions (all, or those of `dates`)."""
+        with self._lock:
+            if dates is None:
+                self._cache.clear()
+            for day in dates or []:
+                self._cache.pop(_as_date(day).isoformat(), None)
+
+    def cache_info(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "partitions": len(self._cache),
+                "capacity": self.cache_partitions}
+
+
+_queries: Dict[Tuple[str, str], GoldQuery] = {}
+
+
+def gold_query(table: str = "daily_currency", gold_dir: Optional[str] = None) -> GoldQuery:
+    """Process-wide GoldQuery of a Gold table (under settings.paths.gold by default), so its cache is shared."""
+    key = (gold_dir or settings.paths.gold, table)
+    if key not in _queries:
+        _queries[key] = GoldQuery(table, key[0])
+    return _queries[key]
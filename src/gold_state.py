@@ -0,0 +1,91 @@
+import os
+import json
+import uuid
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional, Set
+from src.storage import storage_for
+
+STATE_FILE = "_gold_state.json"
+
+
+def silver_fingerprint(silver_path: str) -> str:
+    """
+    Cheap content fingerprint of a silver dataset (single file or Spark directory)
+    from file names, sizes and modification times; no data is read.
+    """
+    entries = []
+    storage = storage_for(silver_path)
+    if storage.isdir(silver_path):
+        base = len(silver_path.rstrip("/")) + 1
+        for info in storage.list_files(silver_path):
+            if os.path.basename(info.path).startswith((".", "_")):
+                continue
+            entries.append(f"{info.path[base:]}:{info.size}:{info.mtime_ns}")
+    else:
+        info = storage.stat(silver_path)
+        if info is not None:
+            entries.append(f"{info.size}:{info.mtime_ns}")
+    return hashlib.sha256("|".join(entries).encode()).hexdigest()
+
+
+class GoldState:
+    """
+    Small record, stored next to the Gold tier, of which silver inputs have already
+    been folded into Gold and which dates (Gold partitions) each one contributed to.
+    It lets silver_to_gold recompute only the partitions touched by new input.
+    Every rewrite of a partition also bumps its version, which readers caching
+    Gold partitions (src/gold_query.py) use for invalidation.
+
+    It also records the table layout Gold was written with (gold_tables.gold_layout).
+    A state from another layout, e.g. a changed gold.tables or one from before Gold
+    was split into per-table directories (it has no layout), has every folded date
+    rebuilt from silver on the next run (stale_dates).
+    """
+
+    def __init__(self, gold_dir: str):
+        self.path = os.path.join(gold_dir, STATE_FILE)
+        self.inputs: Dict[str, Dict[str, Any]] = {}
+        self.partitions: Dict[str, str] = {}
+        self.layout: Optional[str] = None
+        storage = storage_for(self.path)
+        if storage.isfile(self.path):
+            state = json.loads(storage.read_bytes(self.path))
+            self.inputs = state.get("inputs", {})
+            self.partitions = state.get("partitions", {})
+            self.layout = state.get("layout")
+
+    def is_folded(self, silver_path: str, fingerprint: str) -> bool:
+        """True if this exact version of the input is already part of Gold."""
+        entry = self.inputs.get(silver_path)
+        return entry is not None and entry["fingerprint"] == fingerprint
+
+    def dates_of(self, silver_path: str) -> Set[str]:
+        entry = self.inputs.get(silver_path)
+        return set(entry["dates"]) if entry else set()
+
+    def sources_for(self, dates: Iterable[str]) -> List[str]:
+        """Folded inputs that contributed to any of `dates`."""
+        dates = set(dates)
+        return sorted(path for path, entry in self.inputs.items() if dates & set(entry["dates"]))
+
+    def stale_dates(self, layout: str) -> Set[str]:
+        """Every folded date if Gold was written with another layout than `layout`, else none."""
+        if self.layout == layout:
+            return set()
+        return {date_str for entry in self.inputs.values() for date_str in entry["dates"]}
+
+    def record(self, silver_path: str, fingerprint: str, dates: Iterable[str]):
+        self.inputs[silver_path] = {"fingerprint": fingerprint, "dates": sorted(set(dates))}
+
+    def forget(self, silver_path: str):
+        self.inputs.pop(silver_path, None)
+
+    def touch(self, dates: Iterable[str]):
+        """Marks the Gold partitions of `dates` as rewritten (new versions)."""
+        for date_str in dates:
+            self.partitions[date_str] = uuid.uuid4().hex
+
+    def save(self):
+        """Atomically persists the state record."""
+        state = {"inputs": self.inputs, "partitions": self.partitions, "layout": self.layout}
+        storage_for(self.path).write_bytes(self.path, json.dumps(state, indent=2, sort_keys=True).encode())
@@ -0,0 +1,242 @@
+import os
+import json
+import hashlib
+from datetime import date
+from functools import reduce
+from operator import and_
+from typing import TYPE_CHECKING, Iterable, List, Optional
+import pyarrow as pa
+from src.config_loader import GoldMetric, GoldTable, settings, pipeline_config
+from src.sketches import SKETCH_ARROW_TYPE, SKETCH_MERGE, SKETCH_SPARK_TYPE, SKETCHES, polars_cells, spark_cells
+from src.storage import storage_for
+
+if TYPE_CHECKING:
+    import polars as pl
+    from pyspark.sql import Column, DataFrame
+
+# Keys derived from a silver row instead of read from a column
+DERIVED_KEYS = {"hour": "int", "amount_bucket": "double"}
+AGGREGATIONS = ("sum", "count", "min", "max", *SKETCHES)
+# How partial aggregates of one metric (per silver input) combine into the table's value
+# (sketches: src.sketches.SKETCH_MERGE, per bucket)
+MERGE = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+PARTITION_COLUMNS = ["year", "month", "day"]
+
+# Spark SQL type names of the Gold columns -> Arrow types
+ARROW_TYPES = {
+    "string": pa.string(),
+    "double": pa.float64(),
+    "bigint": pa.int64(),
+    "int": pa.int32(),
+    "date": pa.date32(),
+    SKETCH_SPARK_TYPE: SKETCH_ARROW_TYPE,
+}
+
+
+def _silver_type(column: str) -> str:
+    raw_types = {spec.name: spec.type for spec in pipeline_config.schema_.raw.columns}
+    return "double" if raw_types.get(column) == "double" else "string"
+
+
+def gold_tables() -> List[GoldTable]:
+    """The configured Gold tables (gold.tables), validated."""
+    tables = settings.gold.tables
+    names = [table.name for table in tables]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Gold table names must be unique, got {names}")
+    for table in tables:
+        for metric in table.metrics:
+            if metric.agg not in AGGREGATIONS:
+                raise ValueError(f"Gold table {table.name}: unknown aggregation '{metric.agg}' "
+                                 f"(expected one of {AGGREGATIONS})")
+            if metric.column is None and metric.agg != "count":
+                raise ValueError(f"Gold table {table.name}: metric {metric.name} needs a column")
+            if metric.agg in ("sum", "quantiles") and _silver_type(metric.column) != "double":
+                raise ValueError(f"Gold table {table.name}: {metric.agg} needs a numeric column, not {metric.column}")
+            if metric.agg == "hll" and _silver_type(metric.column) != "string":
+                raise ValueError(f"Gold table {table.name}: hll needs a string column, not {metric.column}")
+    return tables
+
+
+def gold_table(name: str) -> GoldTable:
+    for table in gold_tables():
+        if table.name == name:
+            return table
+    raise ValueError(f"Unknown Gold table '{name}' (configured: {[t.name for t in gold_tables()]})")
+
+
+def gold_layout() -> str:
+    """Fingerprint of the configured tables and buckets; Gold written with another one is rebuilt."""
+    spec = {"tables": [table.model_dump() for table in gold_tables()], "amount_buckets": settings.gold.amount_buckets,
+            "partitions": PARTITION_COLUMNS}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def drop_legacy_partitions(gold_dir: str, dates: Iterable[str]):
+    """
+    Removes the partitions of `dates` left from before Gold was split into tables
+    (gold/year=/month=/day=), once they are rebuilt in the tables; empty year=/month=
+    directories go with them.
+    """
+    storage = storage_for(gold_dir)
+    for date_str in dates:
+        partition = partition_dir(gold_dir, date.fromisoformat(date_str))
+        storage.rmtree(partition)
+        for parent in (os.path.dirname(partition), os.path.dirname(os.path.dirname(partition))):
+            if storage.isdir(parent) and not storage.listdir(parent):
+                storage.rmtree(parent)
+
+
+def table_dir(name: str, gold_dir: Optional[str] = None) -> str:
+    return os.path.join(gold_dir or settings.paths.gold, name)
+
+
+def partition_dir(directory: str, day: date) -> str:
+    return os.path.join(directory, f"year={day.year}", f"month={day.month}", f"day={day.day}")
+
+
+def silver_columns() -> List[str]:
+    """Silver columns read for Gold: the timestamp and whatever the tables group by or aggregate."""
+    columns = {"timestamp"}
+    for table in gold_tables():
+        columns.update(key for key in table.keys if key not in DERIVED_KEYS)
+        columns.update(metric.column for metric in table.metrics if metric.column)
+        if any(key == "amount_bucket" for key in table.keys):
+            columns.add("amount")
+    return sorted(columns)
+
+
+def _metric_type(metric: GoldMetric) -> str:
+    if metric.agg in SKETCHES:
+        return SKETCH_SPARK_TYPE
+    return "bigint" if metric.agg == "count" else _silver_type(metric.column)
+
+
+def column_types(table: GoldTable) -> List[tuple]:
+    """(column, Spark SQL type) of a table's files, in order: date, keys, metrics."""
+    keys = [(key, DERIVED_KEYS.get(key) or _silver_type(key)) for key in table.keys]
+    return [("date", "date"), *keys, *((metric.name, _metric_type(metric)) for metric in table.metrics)]
+
+
+def arrow_schema(table: GoldTable) -> pa.Schema:
+    return pa.schema([(name, ARROW_TYPES[kind]) for name, kind in column_types(table)])
+
+
+# --- Spark -------------------------------------------------------------------------
+
+def _spark_key(key: str) -> "Column":
+    from pyspark.sql.functions import col, hour, lit, when
+    if key == "hour":
+        return hour(col("timestamp"))
+    if key == "amount_bucket":
+        bucket = lit(None)
+        for edge in sorted(settings.gold.amount_buckets):
+            bucket = when(col("amount") >= edge, lit(float(edge))).otherwise(bucket)
+        return bucket
+    return col(key)
+
+
+def _spark_metric(metric: GoldMetric) -> "Column":
+    from pyspark.sql import functions as F
+    if metric.agg == "count":
+        return F.count(F.col(metric.column) if metric.column else F.lit(1))
+    return getattr(F, metric.agg)(F.col(metric.column))
+
+
+def _spark_sketch(keyed: "DataFrame", group: List[str], metric: GoldMetric) -> "DataFrame":
+    """A sketch metric per group: entries merged per bucket, then collected sorted by bucket."""
+    from pyspark.sql import functions as F
+    bucket, value = spark_cells(metric.agg, metric.column)
+    cells = keyed.select(*group, bucket.alias("bucket"), value.alias("value")).where(F.col("bucket").isNotNull())
+    merged = cells.groupBy(*group, "bucket").agg(getattr(F, SKETCH_MERGE[metric.agg])("value").alias("value"))
+    return merged.groupBy(*group).agg(F.array_sort(F.collect_list(F.struct("bucket", "value"))).alias(metric.name))
+
+
+def spark_aggregate(silver: "DataFrame", table: GoldTable) -> "DataFrame":
+    """
+    One Gold table from silver rows carrying `date`, `year`, `month`, `day` and the
+    silver columns: grouped by date and the table's keys, typed as column_types.
+    Sketch metrics are built per (group, bucket) first, so no group's values are
+    ever collected whole, and joined to the other metrics.
+    """
+    from pyspark.sql.functions import col
+    keyed = silver.select("date", *PARTITION_COLUMNS, *silver_columns(),
+                          *(_spark_key(key).alias(key) for key in table.keys if key in DERIVED_KEYS))
+    group = ["date", *table.keys, *PARTITION_COLUMNS]
+    plain = [metric for metric in table.metrics if metric.agg not in SKETCHES]
+    grouped = keyed.groupBy(*group).agg(*(_spark_metric(metric).alias(metric.name) for metric in plain)) \
+        if plain else keyed.select(*group).distinct()
+    for metric in (metric for metric in table.metrics if metric.agg in SKETCHES):
+        sketch = _spark_sketch(keyed, group, metric).alias("sketch")
+        matches = [col(f"rows.{name}").eqNullSafe(col(f"sketch.{name}")) for name in group]
+        grouped = grouped.alias("rows").join(sketch, reduce(and_, matches), "left") \
+                         .select("rows.*", col(f"sketch.{metric.name}"))
+    return grouped.select(*(col(name).cast(kind) for name, kind in column_types(table)), *PARTITION_COLUMNS)
+
+
+# --- Polars ------------------------------------------------------------------------
+
+def _polars_key(key: str) -> "pl.Expr":
+    import polars as pl
+    if key == "hour":
+        return pl.col("timestamp").dt.hour().cast(pl.Int32).alias(key)
+    if key == "amount_bucket":
+        bucket = pl.lit(None, dtype=pl.Float64)
+        for edge in sorted(settings.gold.amount_buckets):
+            bucket = pl.when(pl.col("amount") >= edge).then(pl.lit(float(edge))).otherwise(bucket)
+        return bucket.alias(key)
+    return pl.col(key)
+
+
+def _polars_metric(metric: GoldMetric) -> "pl.Expr":
+    import polars as pl
+    if metric.agg == "count":
+        counted = pl.col(metric.column).count() if metric.column else pl.len()
+        return counted.cast(pl.Int64).alias(metric.name)
+    return getattr(pl.col(metric.column), metric.agg)().alias(metric.name)
+
+
+def _polars_sketch(lf: "pl.LazyFrame", table: GoldTable, metric: GoldMetric) -> "pl.LazyFrame":
+    import polars as pl
+    keys = ["date", *table.keys]
+    rows = lf.select(pl.col("timestamp").dt.date().alias("date"), *(_polars_key(key) for key in table.keys),
+                     pl.col(metric.column))
+    if metric.agg == "hll":
+        # Repeats cannot raise a register: each distinct value is hashed once
+        rows = rows.unique()
+    bucket, value = polars_cells(metric.agg, metric.column)
+    cells = rows.select(*keys, bucket.alias("bucket"), value.alias("value")).drop_nulls("bucket")
+    return _collect_sketch(cells, keys, metric)
+
+
+def _collect_sketch(cells, keys: List[str], metric: GoldMetric):
+    """(keys, bucket, value) entries -> one sorted sketch list per group (lazy or eager frames)."""
+    import polars as pl
+    return (cells.group_by([*keys, "bucket"])
+                 .agg(getattr(pl.col("value"), SKETCH_MERGE[metric.agg])())
+                 .group_by(keys)
+                 .agg(pl.struct("bucket", "value").sort_by("bucket").alias(metric.name)))
+
+
+def polars_partials(lf: "pl.LazyFrame", table: GoldTable) -> "pl.LazyFrame":
+    """A Gold table's partial aggregates of one silver input, mergeable with merge_partials."""
+    import polars as pl
+    lf = lf.filter(pl.col("timestamp").is_not_null())
+    keys = ["date", *table.keys]
+    partials = (lf.group_by(pl.col("timestamp").dt.date().alias("date"), *(_polars_key(key) for key in table.keys))
+                  .agg(*(_polars_metric(metric) for metric in table.metrics if metric.agg not in SKETCHES)))
+    for metric in (metric for metric in table.metrics if metric.agg in SKETCHES):
+        partials = partials.join(_polars_sketch(lf, table, metric), on=keys, how="left", nulls_equal=True)
+    return partials
+
+
+def merge_partials(partials: "pl.DataFrame", table: GoldTable) -> "pl.DataFrame":
+    """Combines the partial aggregates of several inputs into the table's rows."""
+    import polars as pl
+    keys = ["date", *table.keys]
+    merged = partials.group_by(keys).agg(*(getattr(pl.col(metric.name), MERGE[metric.agg])()
+                                           for metric in table.metrics if metric.agg not in SKETCHES))
+    for metric in (metric for metric in table.metrics if metric.agg in SKETCHES):
+        entries = partials.select(*keys, metric.name).explode(metric.name).unnest(metric.name).drop_nulls("bucket")
+        merged = merged.join(_collect_sketch(entries, keys, metric), on=keys, how="left", nulls_equal=True)
+    return merged.select(name for name, _ in column_types(table)).sort(keys, nulls_last=True)
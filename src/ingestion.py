@@ -0,0 +1,221 @@
+import os
+import re
+import csv
+from typing import TYPE_CHECKING, Dict, Iterator, List
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from src.log_utils import get_module_logger
+from src.config_loader import settings, pipeline_config
+from src.storage import is_remote, local_file, storage_for
+
+if TYPE_CHECKING:
+    # pandas is imported by the readers that need it; writers (generator) stay pandas-free
+    import pandas as pd
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("IngestionModule", "ingestion.log")
+
+# Schema registry types (pipeline_config.yaml) -> Arrow types
+ARROW_TYPES = {
+    "uuid": pa.string(),
+    "string": pa.string(),
+    "double": pa.float64(),
+    "iso8601": pa.timestamp("us"),
+}
+
+# Types the CSV parser converts to itself: timestamps are parsed once the whole
+# batch is read, so one malformed value cannot fail the read
+CSV_TYPES = {**ARROW_TYPES, "iso8601": pa.string()}
+
+# Cells read as null, as pandas.read_csv does by default
+CSV_NULL_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+                   "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+# Bytes fetched from a remote CSV batch to read its header line
+HEADER_BYTES = 64 * 1024
+
+# File extension per columnar output format
+COLUMNAR_EXTENSIONS = {
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+
+def raw_arrow_schema() -> pa.Schema:
+    """Builds the typed Arrow schema of the raw layer from the schema registry."""
+    return pa.schema([
+        pa.field(column.name, ARROW_TYPES[column.type])
+        for column in pipeline_config.schema_.raw.columns
+    ])
+
+
+def csv_arrow_types() -> Dict[str, pa.DataType]:
+    """Arrow column types for parsing raw CSV; `dictionary` columns of the registry are dictionary-encoded."""
+    return {
+        column.name: pa.dictionary(pa.int32(), CSV_TYPES[column.type]) if column.dictionary else CSV_TYPES[column.type]
+        for column in pipeline_config.schema_.raw.columns
+    }
+
+
+def _csv_options(block_bytes: int):
+    return (pacsv.ReadOptions(use_threads=True, block_size=block_bytes),
+            pacsv.ConvertOptions(column_types=csv_arrow_types(), null_values=CSV_NULL_VALUES,
+                                 strings_can_be_null=True))
+
+
+def parse_timestamps(table: pa.Table) -> pa.Table:
+    """
+    Converts the ISO-8601 columns of a CSV batch to native timestamps. A column with
+    a value that does not parse keeps its strings, as they arrived, for the
+    timestamp rule and the DLQ.
+    """
+    for column in pipeline_config.schema_.raw.columns:
+        if column.type != "iso8601" or column.name not in table.column_names:
+            continue
+        try:
+            parsed = table[column.name].cast(ARROW_TYPES[column.type])
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            logger.warning(f"Column {column.name} has values that are not ISO-8601 timestamps; kept as strings")
+            continue
+        table = table.set_column(table.schema.get_field_index(column.name), column.name, parsed)
+    return table
+
+
+def read_csv_table(path: str) -> pa.Table:
+    """
+    Reads a raw CSV batch into a typed Arrow table with the multithreaded Arrow
+    parser (settings.ingestion.csv_block_mb per block): registry types, dictionary
+    columns encoded, timestamps native (see parse_timestamps).
+    """
+    read_options, convert_options = _csv_options(int(settings.ingestion.csv_block_mb * 2**20))
+    return parse_timestamps(pacsv.read_csv(path, read_options=read_options, convert_options=convert_options))
+
+
+def to_pandas(table: pa.Table) -> "pd.DataFrame":
+    """
+    pandas view of a typed batch without Python string objects: strings stay in
+    their Arrow buffers (string[pyarrow], zero-copy), dictionary columns become
+    categoricals, numbers and timestamps plain numpy columns.
+    """
+    import pandas as pd
+    string_dtype = pd.StringDtype("pyarrow")
+    return table.to_pandas(types_mapper={pa.string(): string_dtype, pa.large_string(): string_dtype}.get,
+                           split_blocks=True)
+
+
+def execution_date_from_path(path: str) -> str:
+    """Extracts the execution date (YYYY-MM-DD) from a `transactions_YYYYMMDD*` batch name."""
+    match = re.search(r"transactions_(\d{4})(\d{2})(\d{2})", os.path.basename(path.rstrip("/")))
+    if not match:
+        raise ValueError(f"Cannot infer the execution date from batch name: {path}")
+    return "-".join(match.groups())
+
+
+def batch_format(path: str) -> str:
+    """Returns the storage format of a batch file from its extension."""
+    for fmt, extension in COLUMNAR_EXTENSIONS.items():
+        if path.endswith(extension):
+            return fmt
+    return "csv"
+
+
+class ColumnarBatchWriter:
+    """
+    Incrementally writes typed record chunks to a Parquet or Arrow IPC file.
+    Every `write` call becomes its own row group (Parquet) or record batch (IPC),
+    so only one chunk is ever held in memory.
+    """
+
+    def __init__(self, path: str, fmt: str, schema: pa.Schema = None):
+        if fmt not in COLUMNAR_EXTENSIONS:
+            raise ValueError(f"Unsupported columnar format: {fmt}")
+        self.path = path
+        self.schema = schema or raw_arrow_schema()
+        if fmt == "parquet":
+            self._writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, table: pa.Table):
+        self._writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_header(path: str) -> List[str]:
+    """Returns the column names of a batch file without loading any rows."""
+    fmt = batch_format(path)
+    if is_remote(path) and fmt != "arrow":
+        # Only the footer (Parquet) or the first bytes (CSV) are fetched
+        storage = storage_for(path)
+        if fmt == "parquet":
+            filesystem, arrow_path = storage.arrow_filesystem(path)
+            return pq.read_schema(arrow_path, filesystem=filesystem).names
+        head = storage.read_range(path, 0, HEADER_BYTES).decode("utf-8", errors="replace")
+        return next(csv.reader(head.splitlines()), [])
+    with local_file(path) as path:
+        if fmt == "parquet":
+            return pq.read_schema(path).names
+        if fmt == "arrow":
+            return pa.ipc.open_file(pa.memory_map(path)).schema.names
+        with open(path, newline='', encoding='utf-8') as f:
+            return next(csv.reader(f), [])
+
+
+def _iter_csv_chunks(path: str, chunk_rows: int) -> Iterator[pa.Table]:
+    # Blocks sized to hold about chunk_rows rows (~128 bytes each), regrouped to exactly chunk_rows
+    read_options, convert_options = _csv_options(max(chunk_rows * 128, 2**20))
+    pending, pending_rows = [], 0
+    with pacsv.open_csv(path, read_options=read_options, convert_options=convert_options) as reader:
+        for record_batch in reader:
+            pending.append(record_batch)
+            pending_rows += record_batch.num_rows
+            while pending_rows >= chunk_rows:
+                table = pa.Table.from_batches(pending)
+                yield table.slice(0, chunk_rows)
+                pending = table.slice(chunk_rows).to_batches()
+                pending_rows -= chunk_rows
+    if pending_rows:
+        yield pa.Table.from_batches(pending)
+
+
+def iter_batch_chunks(path: str, chunk_rows: int) -> Iterator["pd.DataFrame"]:
+    """Yields a batch file as pandas chunks of at most `chunk_rows` rows (a gs:// batch is downloaded first)."""
+    fmt = batch_format(path)
+    logger.info(f"Streaming {fmt} batch in chunks of {chunk_rows} rows: {path}")
+    with local_file(path) as path:
+        if fmt == "parquet":
+            for record_batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+                yield to_pandas(pa.Table.from_batches([record_batch]))
+        elif fmt == "arrow":
+            reader = pa.ipc.open_file(pa.memory_map(path))
+            for i in range(reader.num_record_batches):
+                record_batch = reader.get_batch(i)
+                for offset in range(0, record_batch.num_rows, chunk_rows):
+                    yield to_pandas(pa.Table.from_batches([record_batch.slice(offset, chunk_rows)]))
+        else:
+            for table in _iter_csv_chunks(path, chunk_rows):
+                yield to_pandas(parse_timestamps(table))
+
+
+def read_batch(path: str) -> "pd.DataFrame":
+    """
+    Loads a raw (CSV) or bronze (Parquet / Arrow IPC) batch file into pandas, typed
+    and without Python string objects (see to_pandas). A gs:// batch is downloaded first.
+    """
+    fmt = batch_format(path)
+    logger.info(f"Reading {fmt} batch: {path}")
+    with local_file(path) as path:
+        if fmt == "parquet":
+            return to_pandas(pq.read_table(path))
+        if fmt == "arrow":
+            return to_pandas(pa.ipc.open_file(pa.memory_map(path)).read_all())
+        return to_pandas(read_csv_table(path))
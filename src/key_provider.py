@@ -0,0 +1,240 @@
+import os
+import re
+import time
+import threading
+import importlib.util
+from typing import Any, Callable, Dict, Hashable, Optional
+from src.log_utils import get_module_logger
+from src.config_loader import settings
+
+try:
+    # Only probe for the client here; it is imported when a key is actually fetched
+    GCP_SECRET_MANAGER_AVAILABLE = importlib.util.find_spec("google.cloud.secretmanager") is not None
+except ImportError:
+    GCP_SECRET_MANAGER_AVAILABLE = False
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("KeyProviderModule", "security.log")
+
+_SECRET_NAME = re.compile(r"^projects/(?P<project>[^/]+)/secrets/(?P<secret>[^/]+)(?:/versions/(?P<version>[^/]+))?$")
+
+
+class FileSecretManager:
+    """
+    File-backed stand-in for GCP Secret Manager, for offline runs and tests. A
+    secret version lives in `<root>/<project>/<secret>/<version>`; versions are
+    numbered from 1 and "latest" is the highest one.
+
+        manager = FileSecretManager("/tmp/secrets")
+        name = manager.add_secret_version("projects/p/secrets/banking-key", key)
+        manager.access_secret_version("projects/p/secrets/banking-key/versions/latest")
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _secret_dir(self, name: str):
+        match = _SECRET_NAME.match(name)
+        if match is None:
+            raise ValueError(f"Not a Secret Manager resource name: {name}")
+        return os.path.join(self.root, match["project"], match["secret"]), match["version"] or "latest"
+
+    def _versions(self, directory: str):
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(entry) for entry in os.listdir(directory) if entry.isdigit())
+
+    def add_secret_version(self, secret: str, payload: str) -> str:
+        """Stores a new version of `secret` (projects/<p>/secrets/<s>) and returns its version name."""
+        directory, _ = self._secret_dir(secret)
+        os.makedirs(directory, exist_ok=True)
+        version = max(self._versions(directory), default=0) + 1
+        tmp_path = os.path.join(directory, f".{version}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(payload)
+        os.replace(tmp_path, os.path.join(directory, str(version)))
+        return f"{secret.rstrip('/')}/versions/{version}"
+
+    def access_secret_version(self, name: str) -> str:
+        """The payload of a secret version; KeyError if it does not exist (NotFound in GCP)."""
+        directory, version = self._secret_dir(name)
+        if version == "latest":
+            versions = self._versions(directory)
+            if not versions:
+                raise KeyError(f"Secret {name} has no versions")
+            version = str(versions[-1])
+        path = os.path.join(directory, version)
+        if not os.path.isfile(path):
+            raise KeyError(f"Secret version {name} not found")
+        with open(path) as f:
+            return f.read()
+
+
+class _Entry:
+    __slots__ = ("value", "loaded_at", "refreshing")
+
+    def __init__(self, value: Any, loaded_at: float):
+        self.value = value
+        self.loaded_at = loaded_at
+        self.refreshing: Optional[threading.Thread] = None
+
+
+class KeyCache:
+    """
+    Process-wide cache of resolved key material, so building a SecurityManager
+    (driver, DAG task or Spark executor worker) does not go back to the Secret
+    Manager or re-parse secrets.env every time.
+
+    - An entry is fresh for `ttl` seconds (security.key_cache_ttl_seconds); an
+      expired entry is loaded again on access.
+    - Refresh-ahead: a hit after `refresh_ahead * ttl` seconds returns the cached
+      value and reloads it in a background thread, so steady traffic never waits
+      on the remote call.
+    - A failed reload keeps serving the previous value (logged); a failed first
+      load raises.
+    - `stats()` reports hits, misses, background refreshes, errors, loads per
+      source and load latency.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, refresh_ahead: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self._ttl = ttl
+        self._refresh_ahead = refresh_ahead
+        self.clock = clock
+        self._entries: Dict[Hashable, _Entry] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.refreshes = self.errors = self.loads = 0
+        self.load_seconds_total = self.load_seconds_max = 0.0
+        self.loads_by_source: Dict[str, int] = {}
+
+    @property
+    def ttl(self) -> float:
+        return settings.security.key_cache_ttl_seconds if self._ttl is None else self._ttl
+
+    @property
+    def refresh_ahead(self) -> float:
+        return settings.security.key_refresh_ahead if self._refresh_ahead is None else self._refresh_ahead
+
+    def _load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.loads += 1
+            self.loads_by_source[key[0]] = self.loads_by_source.get(key[0], 0) + 1
+            self.load_seconds_total += elapsed
+            self.load_seconds_max = max(self.load_seconds_max, elapsed)
+            self._entries[key] = _Entry(value, self.clock())
+        logger.info(f"Loaded key material {key[0]} in {elapsed * 1000:.1f} ms")
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]):
+        try:
+            self._load(key, loader)
+        except Exception as e:
+            logger.warning(f"Background refresh of {key[0]} failed, serving the cached value: {e}")
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refreshing = None
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """The cached value of `key` (a tuple whose first item names the source), loaded with `loader` when missing or expired."""
+        now = self.clock()
+        ttl = self.ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            age = None if entry is None else now - entry.loaded_at
+            if age is not None and age < ttl:
+                self.hits += 1
+                if age >= self.refresh_ahead * ttl and entry.refreshing is None:
+                    self.refreshes += 1
+                    entry.refreshing = threading.Thread(target=self._refresh, args=(key, loader), daemon=True)
+                    entry.refreshing.start()
+                return entry.value
+            self.misses += 1
+        try:
+            return self._load(key, loader)
+        except Exception as e:
+            if entry is None:
+                raise
+            logger.warning(f"Reload of expired {key[0]} failed, serving the cached value: {e}")
+            return entry.value
+
+    def join(self, timeout: Optional[float] = None):
+        """Waits for background refreshes in flight."""
+        with self._lock:
+            threads = [entry.refreshing for entry in self._entries.values() if entry.refreshing is not None]
+        for thread in threads:
+            thread.join(timeout)
+
+    def clear(self):
+        """Drops every entry (e.g. right after a key rotation); the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "refreshes": self.refreshes,
+                    "errors": self.errors, "loads": self.loads, "loads_by_source": dict(self.loads_by_source),
+                    "entries": len(self._entries),
+                    "load_seconds_total": round(self.load_seconds_total, 6),
+                    "load_seconds_max": round(self.load_seconds_max, 6)}
+
+
+_KEY_CACHE = KeyCache()
+
+
+def key_cache() -> KeyCache:
+    return _KEY_CACHE
+
+
+def secret_manager_enabled() -> bool:
+    """True when secrets can be fetched: the file-backed stand-in or the GCP client."""
+    return bool(settings.security.secret_manager_dir) or GCP_SECRET_MANAGER_AVAILABLE
+
+
+def _access_secret(name: str) -> str:
+    if settings.security.secret_manager_dir:
+        return FileSecretManager(settings.security.secret_manager_dir).access_secret_version(name)
+    from google.cloud import secretmanager
+    client = secretmanager.SecretManagerServiceClient()
+    response = client.access_secret_version(request={"name": name})
+    return response.payload.data.decode("UTF-8")
+
+
+def fetch_secret(name: str) -> str:
+    """The payload of a Secret Manager version (security.secret_manager_dir: the file-backed stand-in), cached."""
+    backend = settings.security.secret_manager_dir or "gcp"
+    return key_cache().get(("secret_manager", backend, name), lambda: _access_secret(name))
+
+
+def _parse_secrets_env(path: str) -> Dict[str, str]:
+    values: Dict[str, str] = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if "=" in line and not line.lstrip().startswith("#"):
+                    # Split once: base64 keys end with '=' padding
+                    name, value = line.split("=", 1)
+                    values.setdefault(name.strip(), value.strip())
+    return values
+
+
+def read_secrets_env(name: str, path: Optional[str] = None) -> Optional[str]:
+    """
+    The value of `name` in ./secrets.env, if present. The file is parsed once per
+    TTL; a change to the file (mtime/size) is picked up immediately.
+    """
+    path = path or os.path.join(os.getcwd(), "secrets.env")
+    try:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        version = None
+    return key_cache().get(("secrets.env", path, version), lambda: _parse_secrets_env(path)).get(name)
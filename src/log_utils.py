@@ -0,0 +1,32 @@
+import os
+import logging
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class LazyFileHandler(logging.FileHandler):
+    """
+    File handler for `<settings.paths.logs>/<filename>` that resolves the log
+    directory, creates it and opens the file only when the first record is emitted.
+    """
+
+    def __init__(self, filename: str):
+        self.log_filename = filename
+        super().__init__(filename, delay=True)
+
+    def _open(self):
+        from src.config_loader import settings
+        os.makedirs(settings.paths.logs, exist_ok=True)
+        self.baseFilename = os.path.abspath(os.path.join(settings.paths.logs, self.log_filename))
+        return super()._open()
+
+
+def get_module_logger(name: str, filename: str) -> logging.Logger:
+    """Returns the named module logger writing to `filename` in the logs directory."""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = LazyFileHandler(filename)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    return logger
@@ -0,0 +1,326 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+import contextlib
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+from src.log_utils import get_module_logger
+from src.config_loader import settings, pipeline_config
+from src.key_provider import key_cache
+from src.storage import storage_for
+
+if TYPE_CHECKING:
+    from pyspark.sql import SparkSession
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("MetricsModule", "metrics.log")
+
+# Spark stage metrics summed per phase (StageData accessor -> metric name)
+SPARK_STAGE_METRICS = {
+    "numTasks": "tasks",
+    "executorRunTime": "executor_run_ms",
+    "executorCpuTime": "executor_cpu_ns",
+    "inputBytes": "input_bytes",
+    "outputBytes": "output_bytes",
+    "shuffleReadBytes": "shuffle_read_bytes",
+    "shuffleWriteBytes": "shuffle_write_bytes",
+    "memoryBytesSpilled": "memory_spilled_bytes",
+    "diskBytesSpilled": "disk_spilled_bytes",
+}
+
+PROMETHEUS_PREFIX = "banking_pipeline"
+
+
+def new_run_id() -> str:
+    """Run ids sort by start time (UTC, microseconds), so the latest run of a batch is the max."""
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')}-{uuid.uuid4().hex[:6]}"
+
+
+class SlaBreachError(RuntimeError):
+    """Raised when a run exceeds its latency budget and `metrics.sla_action` is "fail"."""
+
+
+def _process_tree_rss(pid: int) -> int:
+    """RSS in bytes of `pid` and all its descendants, e.g. a local Spark JVM (Linux /proc)."""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                total += sum(_process_tree_rss(int(child)) for child in f.read().split())
+    except (FileNotFoundError, ProcessLookupError):
+        pass
+    return total
+
+
+class PeakRssSampler:
+    """
+    Samples the RSS of this process tree in a background thread; `peak` is the
+    maximum seen since the last reset(). Without /proc, falls back to the process's
+    own high-water mark (which cannot be reset per phase).
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.use_proc = os.path.exists(f"/proc/{os.getpid()}/statm")
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self) -> int:
+        if self.use_proc:
+            return _process_tree_rss(os.getpid())
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.sample())
+
+    def reset(self):
+        self.peak = self.sample()
+
+    def __enter__(self) -> "PeakRssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def path_size(path: Optional[str]) -> int:
+    """Bytes of a file, or of every file under a directory (0 if it does not exist)."""
+    if not path:
+        return 0
+    storage = storage_for(path)
+    if storage.isfile(path):
+        return storage.stat(path).size
+    return sum(info.size for info in storage.list_files(path)) if storage.isdir(path) else 0
+
+
+def parquet_rows(path: Optional[str]) -> int:
+    """Row count of a Parquet file or dataset directory, from the file footers only."""
+    if not path or not storage_for(path).exists(path):
+        return 0
+    import pyarrow.dataset as ds
+    filesystem, path = storage_for(path).arrow_filesystem(path)
+    return sum(fragment.metadata.num_rows
+               for fragment in ds.dataset(path, filesystem=filesystem, format="parquet",
+                                          exclude_invalid_files=True).get_fragments())
+
+
+def spark_stage_metrics(spark: "SparkSession", job_group: str) -> Dict[str, int]:
+    """Sums the stage metrics of every job run under `job_group` (skipped stages count as 0)."""
+    sc = spark.sparkContext
+    tracker = sc.statusTracker()
+    store = sc._jsc.sc().statusStore()
+    totals = dict.fromkeys(SPARK_STAGE_METRICS.values(), 0)
+    totals["jobs"] = totals["stages"] = 0
+    for job_id in tracker.getJobIdsForGroup(job_group):
+        job = tracker.getJobInfo(job_id)
+        if job is None:
+            continue
+        totals["jobs"] += 1
+        for stage_id in job.stageIds:
+            try:
+                stage = store.lastStageAttempt(stage_id)
+            except Exception:  # skipped (reused shuffle output) or evicted from the status store
+                continue
+            totals["stages"] += 1
+            for accessor, name in SPARK_STAGE_METRICS.items():
+                totals[name] += int(getattr(stage, accessor)())
+    return totals
+
+
+class Phase:
+    """Measurements of one pipeline phase; the phase body fills in rows and bytes."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows_in: Optional[int] = None
+        self.rows_out: Optional[int] = None
+        self.bytes_read: Optional[int] = None
+        self.bytes_written: Optional[int] = None
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_bytes = 0
+        self.spark: Optional[Dict[str, int]] = None
+        self.status = "success"
+
+    def as_dict(self) -> Dict[str, Any]:
+        record = {
+            "phase": self.name,
+            "status": self.status,
+            "wall_seconds": round(self.wall_seconds, 4),
+            "cpu_seconds": round(self.cpu_seconds, 4),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            "peak_rss_mb": round(self.peak_rss_bytes / 2**20, 1),
+        }
+        if self.spark is not None:
+            record["spark"] = self.spark
+        return record
+
+
+class RunMetrics:
+    """
+    Collects per-phase metrics of one pipeline run and publishes them when the run
+    ends: one JSON line per run in `metrics.run_log` and the latest run as a
+    Prometheus text file (`metrics.prometheus_file`, for a node-exporter textfile
+    collector). The run's wall time is checked against
+    `sla.latency_threshold_minutes` of pipeline_config.yaml; a breach is logged and
+    flagged, and raises SlaBreachError when `metrics.sla_action` is "fail".
+
+        with RunMetrics(engine="spark") as run:
+            with run.phase("generate") as phase:
+                ...
+                phase.rows_out = n
+    """
+
+    def __init__(self, **labels: Any):
+        self.run_id = new_run_id()
+        self.labels = labels
+        self.phases: List[Phase] = []
+        self.record: Dict[str, Any] = {}
+        # Outcome other than success/failed, set by the pipeline (e.g. "schema_rejected")
+        self.status: Optional[str] = None
+        self._sampler = PeakRssSampler()
+
+    def __enter__(self) -> "RunMetrics":
+        self.started_at = datetime.now(timezone.utc)
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._sampler.__enter__()
+        return self
+
+    @contextlib.contextmanager
+    def phase(self, name: str, spark: Optional["SparkSession"] = None) -> Iterator[Phase]:
+        """
+        Measures the enclosed block. With `spark`, its jobs run in a job group of
+        their own and their stage metrics (executor time, I/O, shuffle, spill) are
+        attached to the phase.
+        """
+        phase = Phase(name)
+        self.phases.append(phase)
+        job_group = f"{self.run_id}:{name}"
+        if spark is not None:
+            spark.sparkContext.setJobGroup(job_group, f"{self.labels.get('pipeline', 'pipeline')} {name}")
+        self._sampler.reset()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield phase
+        except BaseException:
+            phase.status = "failed"
+            raise
+        finally:
+            phase.wall_seconds = time.perf_counter() - wall
+            phase.cpu_seconds = time.process_time() - cpu
+            phase.peak_rss_bytes = max(self._sampler.peak, self._sampler.sample())
+            if spark is not None:
+                spark.sparkContext.setLocalProperty("spark.jobGroup.id", None)
+                try:
+                    phase.spark = spark_stage_metrics(spark, job_group)
+                except Exception as e:
+                    logger.warning(f"Spark stage metrics unavailable for phase {name}: {e}")
+            logger.info(f"Phase {name}: {phase.wall_seconds:.3f}s wall, {phase.cpu_seconds:.3f}s CPU, "
+                        f"rows {phase.rows_in} -> {phase.rows_out}, peak RSS {phase.peak_rss_bytes / 2**20:.0f} MB")
+
+    def __exit__(self, exc_type, exc, tb):
+        self._sampler.__exit__(exc_type, exc, tb)
+        wall = time.perf_counter() - self._wall
+        budget = pipeline_config.sla.latency_threshold_minutes * 60
+        breached = wall > budget
+        self.record = {
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat(),
+            **self.labels,
+            "status": "failed" if exc_type else self.status or "success",
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(time.process_time() - self._cpu, 4),
+            "peak_rss_mb": max((p.as_dict()["peak_rss_mb"] for p in self.phases), default=0.0),
+            "sla": {"budget_seconds": budget, "breached": breached,
+                    "action": settings.metrics.sla_action},
+            "phases": [p.as_dict() for p in self.phases],
+            "key_cache": key_cache().stats(),
+        }
+        try:
+            self._write_run_log()
+            self._write_prometheus()
+        except OSError as e:
+            logger.error(f"Could not publish run metrics: {e}")
+
+        if breached:
+            slowest = max(self.phases, key=lambda p: p.wall_seconds, default=None)
+            message = (f"SLA BREACH: run {self.run_id} took {wall:.1f}s, budget {budget:.0f}s"
+                       + (f" (slowest phase: {slowest.name}, {slowest.wall_seconds:.1f}s)" if slowest else ""))
+            logger.error(message)
+            if settings.metrics.sla_action == "fail" and exc_type is None:
+                raise SlaBreachError(message)
+        return False
+
+    def _write_run_log(self):
+        path = settings.metrics.run_log or os.path.join(settings.paths.logs, "pipeline_metrics.jsonl")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps(self.record) + "\n")
+
+    def _write_prometheus(self):
+        path = settings.metrics.prometheus_file or os.path.join(settings.paths.logs, "pipeline_metrics.prom")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Replaced atomically so a scraper never reads a half-written file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(format_prometheus(self.record))
+        os.replace(tmp_path, path)
+
+
+def _label_string(labels: Dict[str, Any]) -> str:
+    return ",".join(f'{key}="{str(value)}"' for key, value in labels.items() if value is not None)
+
+
+def format_prometheus(record: Dict[str, Any]) -> str:
+    """Prometheus text exposition of a run record (gauges of the latest run)."""
+    run_labels = {key: record.get(key) for key in ("pipeline", "engine", "mode")}
+    families: Dict[str, List[str]] = {}
+
+    def gauge(name: str, help_text: str, value: Any, **labels: Any):
+        if value is None:
+            return
+        metric = f"{PROMETHEUS_PREFIX}_{name}"
+        lines = families.setdefault(metric, [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"])
+        lines.append(f"{metric}{{{_label_string({**run_labels, **labels})}}} {float(value):g}")
+
+    gauge("last_run_timestamp_seconds", "Start time of the last run.",
+          datetime.fromisoformat(record["started_at"]).timestamp())
+    gauge("run_success", "1 if the last run succeeded.", record["status"] == "success")
+    gauge("run_wall_seconds", "Wall time of the last run.", record["wall_seconds"])
+    gauge("run_cpu_seconds", "Driver CPU time of the last run.", record["cpu_seconds"])
+    gauge("sla_budget_seconds", "Latency budget of a run.", record["sla"]["budget_seconds"])
+    gauge("sla_breached", "1 if the last run exceeded its latency budget.", record["sla"]["breached"])
+    key_stats = record.get("key_cache") or {}
+    for name in ("hits", "misses", "refreshes", "errors"):
+        gauge(f"key_cache_{name}", f"Key cache {name} since the process started.", key_stats.get(name))
+    gauge("key_load_seconds_max", "Slowest key load (Secret Manager / secrets.env) of the process.",
+          key_stats.get("load_seconds_max"))
+    for phase in record["phases"]:
+        name = phase["phase"]
+        gauge("phase_wall_seconds", "Wall time of a phase.", phase["wall_seconds"], phase=name)
+        gauge("phase_cpu_seconds", "Driver CPU time of a phase.", phase["cpu_seconds"], phase=name)
+        gauge("phase_rows_in", "Rows entering a phase.", phase["rows_in"], phase=name)
+        gauge("phase_rows_out", "Rows leaving a phase.", phase["rows_out"], phase=name)
+        gauge("phase_bytes_read", "Bytes read by a phase.", phase["bytes_read"], phase=name)
+        gauge("phase_bytes_written", "Bytes written by a phase.", phase["bytes_written"], phase=name)
+        gauge("phase_peak_rss_bytes", "Peak RSS of the process tree (driver + local JVM) during a phase.",
+              phase["peak_rss_mb"] * 2**20, phase=name)
+        for metric, value in (phase.get("spark") or {}).items():
+            gauge(f"phase_spark_{metric}", f"Spark {metric.replace('_', ' ')} summed over a phase's stages.",
+                  value, phase=name)
+    return "\n".join(line for lines in families.values() for line in lines) + "\n"
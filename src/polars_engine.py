@@ -0,0 +1,274 @@
+import os
+import uuid
+import shutil
+from datetime import date
+from itertools import chain
+from typing import Dict, List, Optional, Union
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.log_utils import get_module_logger
+from src.config_loader import settings, pipeline_config
+from src.dlq import dlq_root, record_clean_runs, write_dlq
+from src.gold_state import GoldState, silver_fingerprint
+from src.gold_tables import arrow_schema, drop_legacy_partitions, gold_layout, gold_tables, merge_partials, \
+    partition_dir, polars_partials, silver_columns, table_dir
+from src.ingestion import batch_format
+from src.metrics import new_run_id
+from src.quality_rules import MASK_COLUMN, REASON_COLUMN, compile_rules, polars_timestamp
+from src.security import SecurityManager, get_keyring
+from src.silver_table import batch_stem, file_layout, partition_batches, publish_batch, table_root
+from src.storage import local_file, storage_for
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("PolarsEngineModule", "polars_engine.log")
+
+# Schema registry types (pipeline_config.yaml) -> Polars types of the raw CSV scan.
+# Timestamps are scanned as strings so malformed values reach the quality rules.
+POLARS_RAW_TYPES = {
+    "uuid": pl.String,
+    "string": pl.String,
+    "double": pl.Float64,
+    "iso8601": pl.String,
+}
+
+
+def raw_polars_schema() -> Dict[str, pl.DataType]:
+    """Polars schema of the raw CSV layer, built from the schema registry."""
+    return {column.name: POLARS_RAW_TYPES[column.type] for column in pipeline_config.schema_.raw.columns}
+
+
+def scan_raw(path: str) -> pl.LazyFrame:
+    """Lazily scans a raw (CSV) or bronze (Parquet / Arrow IPC) batch file."""
+    fmt = batch_format(path)
+    if fmt == "parquet":
+        return pl.scan_parquet(path)
+    if fmt == "arrow":
+        return pl.scan_ipc(path)
+    return pl.scan_csv(path, schema=raw_polars_schema())
+
+
+def _dataset_files(path: str) -> List[str]:
+    """Data files of a silver dataset (a Spark-style directory or a single file)."""
+    if not os.path.isdir(path):
+        return [path]
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if name.endswith(".parquet") and not name.startswith((".", "_"))
+    )
+
+
+def gold_partials(lf: pl.LazyFrame) -> List[pl.LazyFrame]:
+    """Partial aggregates of every Gold table (gold.tables order), all from the same scan."""
+    return [polars_partials(lf, table) for table in gold_tables()]
+
+
+class PolarsEngine:
+    """
+    Single-node engine on Polars lazy queries, an alternative to BankingTransformer
+    without JVM startup or pandas -> Spark conversion.
+
+    A batch is scanned once: quarantine, hashing, encryption, the silver sink, the
+    DLQ rows and the batch's Gold partial aggregates are one lazy plan, collected with
+    the streaming engine. Silver and Gold use the same Parquet layouts (and the same
+    incremental Gold state) as the Spark engine, so both can work on the same tables.
+    """
+
+    def __init__(self, security: Optional[SecurityManager] = None):
+        self.security = security or SecurityManager()
+        self.rules = compile_rules()
+
+    def _secure(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """Hashes the email, encrypts the PAN and drops the raw PII columns."""
+        keyring = get_keyring([self.security.key])
+        return lf.with_columns(
+            self.security.pseudonymizer.polars_expr("email").alias("email_hashed"),
+            pl.col("pan").map_batches(lambda pans: pl.Series(keyring.encrypt(pans.to_list()), dtype=pl.String),
+                                      return_dtype=pl.String, is_elementwise=True)
+              .alias("pan_encrypted"),
+        ).drop("email", "pan")
+
+    def ingest_to_silver(self, batch_path: str, execution_date: str, run_id: Optional[str] = None) -> Optional[str]:
+        """
+        Validates and secures a batch and writes silver and the DLQ. Returns the silver
+        path, or None if the batch had no valid records.
+        """
+        silver_path, _ = self._ingest(batch_path, execution_date, run_id)
+        return silver_path
+
+    def run_batch(self, batch_path: str, execution_date: str, run_id: Optional[str] = None) -> Optional[str]:
+        """
+        Runs a batch end to end (silver, DLQ and Gold) from a single scan of the raw
+        file. Returns the silver path, or None if the batch had no valid records.
+        """
+        silver_path, partials = self._ingest(batch_path, execution_date, run_id)
+        if silver_path and partition_batches(silver_path) != [batch_stem(batch_path)]:
+            # Other batches share the date partition: Gold needs all of it, not this batch's partials
+            self.silver_to_gold(silver_path)
+        elif silver_path:
+            self._fold_into_gold({silver_path: partials})
+        else:
+            logger.warning("No valid records found in this batch. Gold tier not updated.")
+        return silver_path
+
+    def _ingest(self, batch_path: str, execution_date: str, run_id: Optional[str]):
+        logger.info(f"Polars: Lazy ingestion of {batch_path}")
+        # A gs:// batch is downloaded (in parallel ranges) for the scan; it keeps its file name
+        with local_file(batch_path) as local_path:
+            return self._ingest_file(local_path, execution_date, run_id)
+
+    def _ingest_file(self, batch_path: str, execution_date: str, run_id: Optional[str]):
+        batch_key = os.path.basename(batch_path)
+        raw = scan_raw(batch_path)
+        flagged = raw.with_columns(self.rules.polars_failure_mask(raw.collect_schema(), batch_key).alias(MASK_COLUMN))
+
+        valid = flagged.filter(pl.col(MASK_COLUMN) == 0).drop(MASK_COLUMN)
+        if raw.collect_schema()["timestamp"] == pl.String:
+            valid = valid.with_columns(polars_timestamp(pl.col("timestamp")))
+        invalid = flagged.filter(pl.col(MASK_COLUMN) != 0) \
+            .with_columns(self.rules.polars_reason_codes(pl.col(MASK_COLUMN)).alias(REASON_COLUMN))
+
+        staging_dir = os.path.join(table_root(), f"_staging-{uuid.uuid4().hex[:8]}")
+        os.makedirs(staging_dir)
+        _, row_group_rows = file_layout()
+
+        try:
+            # Quarantined rows are few: collected, then appended to the DLQ partitions
+            # Gold partials come from the secured rows, so tables can group by silver columns (email_hashed)
+            secured = self._secure(valid)
+            _, quarantined, counts, accepted_ids, *partials = pl.collect_all([
+                secured.sort(settings.silver.cluster_by)
+                    .sink_parquet(os.path.join(staging_dir, "part-00000.parquet"), row_group_size=row_group_rows, lazy=True),
+                invalid,
+                flagged.select((pl.col(MASK_COLUMN) == 0).sum().alias("valid"), pl.len().alias("total")),
+                valid.select(self.rules.unique_columns),
+                *gold_partials(secured),
+            ], engine="streaming")
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        valid_count, total = counts.row(0)
+        invalid_count = total - valid_count
+        if invalid_count:
+            write_dlq(quarantined.to_arrow(), execution_date, batch_key, run_id or new_run_id())
+            logger.warning(f"DLQ: Saved {invalid_count} invalid records of {batch_key} to {dlq_root()}")
+        else:
+            record_clean_runs({batch_key: execution_date}, run_id or new_run_id())
+
+        if not valid_count:
+            shutil.rmtree(staging_dir)
+            return None, partials
+
+        # Publish silver: the fully written file replaces the batch's previous files
+        silver_path = publish_batch(staging_dir, execution_date, batch_stem(batch_key))
+        shutil.rmtree(staging_dir)
+        logger.info(f"Silver layer published: {silver_path} ({valid_count} records of {batch_key})")
+        if self.rules.unique_columns:
+            self.rules.record({column: accepted_ids[column].to_numpy() for column in self.rules.unique_columns}, batch_key)
+        return silver_path, partials
+
+    def _scan_silver(self, silver_path: str) -> pl.LazyFrame:
+        """
+        Scans the columns Gold needs from a silver input written by either engine
+        (the pandas -> Spark path stores the timestamp as an ISO string).
+        """
+        lf = pl.scan_parquet(_dataset_files(silver_path))
+        timestamp = pl.col("timestamp")
+        if lf.collect_schema()["timestamp"] == pl.String:
+            timestamp = polars_timestamp(timestamp)
+        else:
+            timestamp = timestamp.cast(pl.Datetime("us"))
+        return lf.select(*(name for name in silver_columns() if name != "timestamp"), timestamp.alias("timestamp"))
+
+    def silver_to_gold(self, silver_paths: Union[str, List[str]]) -> str:
+        """
+        Incremental, partition-scoped aggregation to the Gold layer, with the same
+        state record and year/month/day layout as BankingTransformer.silver_to_gold.
+        """
+        if isinstance(silver_paths, str):
+            silver_paths = [silver_paths]
+        state = GoldState(settings.paths.gold)
+        new_inputs = [p for p in silver_paths if not state.is_folded(p, silver_fingerprint(p))]
+        if not new_inputs and not state.stale_dates(gold_layout()):
+            logger.info("Gold: silver input already folded in, nothing to do.")
+            return settings.paths.gold
+        tables = len(gold_tables())
+        partials = pl.collect_all([lf for p in new_inputs for lf in gold_partials(self._scan_silver(p))],
+                                  engine="streaming")
+        return self._fold_into_gold({p: partials[i * tables:(i + 1) * tables] for i, p in enumerate(new_inputs)})
+
+    def _fold_into_gold(self, new_partials: Dict[str, List[pl.DataFrame]]) -> str:
+        """
+        Merges the partial aggregates (one frame per Gold table) of new silver inputs
+        with those of the inputs already folded into the affected dates, and rewrites
+        only those partitions of every table. Gold written with another table layout
+        has every folded date rebuilt.
+        """
+        gold_dir = settings.paths.gold
+        state = GoldState(gold_dir)
+        tables = gold_tables()
+        layout = gold_layout()
+        stale = state.stale_dates(layout)
+        if stale:
+            logger.warning(f"Gold: table layout changed; rebuilding {len(stale)} folded date(s) from silver.")
+        new_dates = {path: {d.isoformat() for df in frames for d in df["date"].to_list()}
+                     for path, frames in new_partials.items()}
+        affected = set().union(stale, *new_dates.values(), *(state.dates_of(path) for path in new_partials))
+
+        sources = [p for p in state.sources_for(affected) if p not in new_partials]
+        for path in [p for p in sources if not os.path.exists(p)]:
+            logger.warning(f"Gold: silver input {path} no longer exists; dropping it from the state.")
+            state.forget(path)
+            sources.remove(path)
+        if stale:
+            drop_legacy_partitions(gold_dir, state.stale_dates(layout))
+        logger.info(f"Gold: recomputing {len(affected)} partition(s) from {len(sources) + len(new_partials)} silver input(s).")
+
+        affected_dates = [date.fromisoformat(d) for d in sorted(affected)]
+        in_affected = pl.col("date").is_in(pl.Series(affected_dates).implode())
+        # Each source is scanned once for all tables (common subplans are shared by collect_all)
+        previous = pl.collect_all([
+            lf for path in sources
+            for lf in gold_partials(self._scan_silver(path).filter(pl.col("timestamp").dt.date().is_in(pl.Series(affected_dates).implode())))
+        ], engine="streaming") if sources else []
+        frames = [*chain.from_iterable(new_partials.values()), *previous]
+
+        for index, table in enumerate(tables if frames else []):
+            # Frames are in gold.tables order, per input
+            gold = merge_partials(pl.concat(frames[index::len(tables)]).filter(in_affected), table)
+            directory = table_dir(table.name, gold_dir)
+            for day in affected_dates:
+                self._write_gold_partition(directory, day, gold.filter(pl.col("date") == day), arrow_schema(table))
+
+        for path, dates in new_dates.items():
+            state.record(path, silver_fingerprint(path), dates)
+        state.touch(affected)
+        state.layout = layout
+        state.save()
+        logger.info(f"Gold Tier updated at: {gold_dir}")
+        return gold_dir
+
+    @staticmethod
+    def _write_gold_partition(table_path: str, day: date, rows: pl.DataFrame, schema: pa.Schema):
+        """
+        Replaces one year=/month=/day= partition of a Gold table (removed if it has no
+        rows left). The new file is written under a hidden name and renamed into place
+        before the previous files are removed, so readers never find the day missing.
+        """
+        partition = partition_dir(table_path, day)
+        storage = storage_for(partition)
+        if rows.is_empty():
+            storage.rmtree(partition)
+            return
+        previous = storage.listdir(partition)
+        storage.makedirs(partition)
+        name = f"part-00000-{uuid.uuid4()}.parquet"
+        filesystem, path = storage.arrow_filesystem(os.path.join(partition, f".{name}.tmp"))
+        pq.write_table(rows.to_arrow().select(schema.names).cast(schema), path, filesystem=filesystem)
+        storage.replace(os.path.join(partition, f".{name}.tmp"), os.path.join(partition, name))
+        for old in previous:
+            storage.remove(os.path.join(partition, old))
+
+    def close(self):
+        """Nothing to release; kept for interface parity with BankingTransformer."""
@@ -0,0 +1,95 @@
+import hmac
+import string
+import hashlib
+from typing import TYPE_CHECKING, Iterator, Optional, Union
+import pyarrow as pa
+import pyarrow.compute as pc
+import pandas as pd
+
+if TYPE_CHECKING:
+    import polars as pl
+    from pyspark import Broadcast
+    from pyspark.sql import Column
+
+HASH_MODES = ("sha256", "hmac")
+# Normalization: ASCII whitespace trimmed at both ends, ASCII letters lower-cased. Other
+# characters are left alone, so every engine applies exactly the same rule.
+WHITESPACE = " \t\n\r\f\v"
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+class Pseudonymizer:
+    """
+    One keyed-hash rule for every engine: normalize, then SHA-256 (or HMAC-SHA256 with
+    `key`), as a lowercase hex digest. Nulls stay null.
+
+    - `hash_value`: one value (Python)
+    - `hash_arrow` / `hash_series`: a batch; each distinct value of the batch is
+      hashed once (the batch's dictionary is the memo)
+    - `spark_column`: native Spark SQL sha2; HMAC is a pandas UDF over a broadcast key,
+      so the key never appears in the query plan
+    - `polars_expr`: a Polars expression over `hash_arrow`
+    """
+
+    def __init__(self, key: Optional[bytes] = None):
+        self.keyed = key is not None
+        self.key = key
+        if self.keyed:
+            if not key:
+                raise ValueError("An HMAC pseudonymization key cannot be empty")
+            # The keyed state is computed once; every digest starts from a copy of it
+            self._hmac = hmac.new(key, digestmod=hashlib.sha256)
+
+    @staticmethod
+    def normalize(value: str) -> str:
+        return value.strip(WHITESPACE).translate(_ASCII_LOWER)
+
+    def _digest(self, normalized: str) -> str:
+        if not self.keyed:
+            return hashlib.sha256(normalized.encode()).hexdigest()
+        mac = self._hmac.copy()
+        mac.update(normalized.encode())
+        return mac.hexdigest()
+
+    def hash_value(self, value: Optional[str]) -> Optional[str]:
+        return None if value is None else self._digest(self.normalize(value))
+
+    def hash_arrow(self, values: Union[pa.Array, pa.ChunkedArray]) -> pa.Array:
+        """Hashes a string array; repeated values (after normalization) are hashed once."""
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+        normalized = pc.ascii_lower(pc.utf8_trim(values.cast(pa.string()), characters=WHITESPACE))
+        encoded = normalized.dictionary_encode()
+        digests = pa.array([self._digest(value) for value in encoded.dictionary.to_pylist()], pa.string())
+        return digests.take(encoded.indices)
+
+    def hash_series(self, values: pd.Series) -> pd.Series:
+        hashed = self.hash_arrow(pa.array(values.astype(object).where(values.notna(), None), pa.string()))
+        return pd.Series(hashed.to_pylist(), index=values.index, dtype=object)
+
+    def spark_column(self, column: Union[str, "Column"], key_broadcast: Optional["Broadcast"] = None) -> "Column":
+        """
+        The same hash as a Spark column: native sha2, or in hmac mode a pandas UDF that
+        reads the key from `key_broadcast` (a broadcast of `self.key`) on the executors.
+        """
+        from pyspark.sql.functions import btrim, col, lit, pandas_udf, sha2, translate
+        column = col(column) if isinstance(column, str) else column
+        if not self.keyed:
+            normalized = translate(btrim(column, lit(WHITESPACE)), string.ascii_uppercase, string.ascii_lowercase)
+            return sha2(normalized, 256)
+        if key_broadcast is None:
+            raise ValueError("HMAC pseudonymization in Spark needs the key as a broadcast")
+
+        # Only the broadcast travels with the UDF; a literal key would be visible in the plan
+        @pandas_udf("string")
+        def hmac_hex(batches: Iterator[pd.Series]) -> Iterator[pd.Series]:
+            pseudonymizer = Pseudonymizer(key_broadcast.value)
+            for values in batches:
+                yield pseudonymizer.hash_series(values)
+
+        return hmac_hex(column)
+
+    def polars_expr(self, column: str) -> "pl.Expr":
+        import polars as pl
+        return pl.col(column).map_batches(lambda values: pl.from_arrow(self.hash_arrow(values.to_arrow())),
+                                          return_dtype=pl.String, is_elementwise=True)
@@ -1,21 +1,13 @@
 import os
-import logging
-from src.patches import apply_spark_patches
-apply_spark_patches()
 import pandas as pd
-import great_expectations as gx
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Union
+from src.log_utils import get_module_logger
 from src.config_loader import settings
+from src.ingestion import iter_batch_chunks, read_header
+from src.quality_rules import MASK_COLUMN, REASON_COLUMN, compile_rules
 
-# Configure logging
-LOG_DIR = settings.paths.logs
-os.makedirs(LOG_DIR, exist_ok=True)
-logger = logging.getLogger("QualityModule")
-if not logger.handlers:
-    handler = logging.FileHandler(os.path.join(LOG_DIR, "quality.log"))
-    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("QualityModule", "quality.log")
 
 class DataQualityManager:
     """
@@ -24,53 +16,97 @@ class DataQualityManager:
     """
     
     def __init__(self):
-        self.context = gx.get_context()
+        self._context = None
         self.expected_columns = settings.quality.expected_columns
+        # Rule registry (settings.quality.rules) compiled once, evaluated in one pass per batch
+        self.rules = compile_rules()
 
-    def validate_schema(self, df: pd.DataFrame) -> bool:
-        """Validates that the input DataFrame matches the expected column schema."""
-        current_columns = list(df.columns)
+    @property
+    def context(self):
+        """Great Expectations data context, created (and GX imported) on first use."""
+        if self._context is None:
+            import great_expectations as gx
+            self._context = gx.get_context()
+        return self._context
+
+    def validate_schema(self, source: Union[pd.DataFrame, str]) -> bool:
+        """
+        Validates that the input matches the expected column schema.
+        Accepts a DataFrame or a batch file path; for a path only the header is read.
+        """
+        if isinstance(source, str):
+            current_columns = read_header(source)
+        else:
+            current_columns = list(source.columns)
         if set(current_columns) != set(self.expected_columns):
             logger.error(f"Schema Mismatch! Expected: {self.expected_columns}, Got: {current_columns}")
             return False
         logger.info("Schema validation passed.")
         return True
 
-    def run_quarantine_check(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    def run_quarantine_check(self, df: pd.DataFrame, batch_key: Optional[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Runs quality checks and splits the data into Valid and Quarantine (Invalid).
-        Implements the Dead Letter Queue (DLQ) pattern.
+        Implements the Dead Letter Queue (DLQ) pattern: quarantined rows carry the
+        bit-packed failure mask and the pipe-separated reason codes of the failed rules.
+        With a `batch_key` (the batch file name), `unique` rules ignore the batch's own
+        ids in the duplicate index. The accepted ids are added to the index by
+        record_accepted, once the caller has published the valid rows.
         """
-        logger.info(f"Starting Quarantine validation on {len(df)} records...")
-        
-        # 1. Basic type/null checks (Vectorized using Pandas for performance)
-        is_valid = pd.Series(True, index=df.index)
-        
-        # Check non-nulls for critical fields
-        is_valid &= df["transaction_id"].notnull()
-        is_valid &= df["amount"].notnull()
-        
-        # Threshold checks (from config)
-        is_valid &= df["amount"] >= settings.quality.min_amount
+        logger.info(f"Starting Quarantine validation on {len(df)} records ({len(self.rules.rules)} rules)...")
         
-        # Currency length check
-        is_valid &= df["currency"].str.len() == settings.quality.currency_len
+        # All rules in one vectorized evaluation; bit i of the mask = rule i failed
+        mask = self.rules.failure_mask(df, batch_key)
+        is_valid = mask == 0
         
-        # Split Data
-        df_valid = df[is_valid].copy()
-        df_invalid = df[~is_valid].copy()
+        # Split Data (boolean indexing already returns new frames; no extra copies)
+        df_valid = df[is_valid]
+        invalid_mask = mask[~is_valid]
+        df_invalid = df[~is_valid].assign(**{
+            MASK_COLUMN: invalid_mask.astype("int64"),
+            REASON_COLUMN: self.rules.reason_codes(invalid_mask),
+        })
         
         # Log results
         valid_count = len(df_valid)
         invalid_count = len(df_invalid)
         
         if invalid_count > 0:
-            logger.warning(f"Quarantine Alert: Found {invalid_count} invalid records. Redirecting to DLQ.")
+            logger.warning(f"Quarantine Alert: Found {invalid_count} invalid records. Redirecting to DLQ. "
+                           f"Reasons: {df_invalid[REASON_COLUMN].value_counts().to_dict()}")
         else:
             logger.info("All records passed quality checks.")
             
         return df_valid, df_invalid
 
+    def record_accepted(self, df_valid: pd.DataFrame, batch_key: str):
+        """
+        Adds the ids of published valid rows to the duplicate index, so later batches
+        repeating them are quarantined. Called after silver is written: a batch that
+        fails before publishing leaves no ids behind to reject its retry against.
+        """
+        if self.rules.unique_columns and not df_valid.empty:
+            self.rules.record(df_valid, batch_key)
+
+    def stream_quarantine_check(self, path: str, chunk_rows: Optional[int] = None) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """
+        Streaming variant of run_quarantine_check: reads the batch file in fixed-size
+        chunks and yields (valid, invalid) per chunk, so peak memory depends on the
+        chunk size rather than on the file size. Each chunk is recorded in the duplicate
+        index under its own key once the caller has processed it (asks for the next
+        chunk), so repeats across chunks of the file are caught too.
+        """
+        chunk_rows = chunk_rows or settings.ingestion.chunk_rows
+        total_valid = total_invalid = 0
+        for number, chunk in enumerate(iter_batch_chunks(path, chunk_rows)):
+            chunk_key = f"{os.path.basename(path)}#{number}"
+            df_valid, df_invalid = self.run_quarantine_check(chunk, chunk_key)
+            total_valid += len(df_valid)
+            total_invalid += len(df_invalid)
+            yield df_valid, df_invalid
+            self.record_accepted(df_valid, chunk_key)
+        logger.info(f"Streaming quarantine finished: {total_valid} valid, {total_invalid} invalid records.")
+
 if __name__ == "__main__":
     # Test with mockup data
     dq = DataQualityManager()
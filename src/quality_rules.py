@@ -0,0 +1,395 @@
+import os
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Union
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from src.config_loader import DedupConfig, QualityConfig, QualityRule, settings
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import polars as pl
+    from pyspark.sql import Column
+    from src.dedup_index import TransactionIdIndex
+
+CHECKS = ("not_null", "range", "length", "regex", "parse", "in_set", "unique")
+MAX_RULES = 63  # one bit per rule; masks must also fit Spark's signed long
+
+MASK_COLUMN = "dq_failure_mask"
+REASON_COLUMN = "dq_reason_codes"
+REASON_SEPARATOR = "|"
+# Spark frames may carry the raw text of a typed column as <prefix><column> (DLQ, parse rules)
+RAW_TEXT_PREFIX = "_raw_"
+
+# ISO-8601 layouts the Polars engine parses, the values pandas' format="ISO8601" and Spark's
+# cast both accept: minutes or seconds with an optional fraction, an optional UTC offset
+# (converted to UTC), or a date alone. A space between date and time is read as the T.
+POLARS_TIMESTAMP_FORMATS = ("%Y-%m-%dT%H:%M:%S%.f", "%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S%.f%#z",
+                            "%Y-%m-%dT%H:%M%#z", "%Y-%m-%d")
+
+UUID_PATTERN = r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
+
+# Active ISO 4217 currency codes (precious metals, fund and testing codes excluded)
+ISO_4217 = [
+    "AED", "AFN", "ALL", "AMD", "ANG", "AOA", "ARS", "AUD", "AWG", "AZN", "BAM", "BBD", "BDT", "BGN",
+    "BHD", "BIF", "BMD", "BND", "BOB", "BRL", "BSD", "BTN", "BWP", "BYN", "BZD", "CAD", "CDF", "CHF",
+    "CLP", "CNY", "COP", "CRC", "CUP", "CVE", "CZK", "DJF", "DKK", "DOP", "DZD", "EGP", "ERN", "ETB",
+    "EUR", "FJD", "FKP", "GBP", "GEL", "GHS", "GIP", "GMD", "GNF", "GTQ", "GYD", "HKD", "HNL", "HTG",
+    "HUF", "IDR", "ILS", "INR", "IQD", "IRR", "ISK", "JMD", "JOD", "JPY", "KES", "KGS", "KHR", "KMF",
+    "KPW", "KRW", "KWD", "KYD", "KZT", "LAK", "LBP", "LKR", "LRD", "LSL", "LYD", "MAD", "MDL", "MGA",
+    "MKD", "MMK", "MNT", "MOP", "MRU", "MUR", "MVR", "MWK", "MXN", "MYR", "MZN", "NAD", "NGN", "NIO",
+    "NOK", "NPR", "NZD", "OMR", "PAB", "PEN", "PGK", "PHP", "PKR", "PLN", "PYG", "QAR", "RON", "RSD",
+    "RUB", "RWF", "SAR", "SBD", "SCR", "SDG", "SEK", "SGD", "SHP", "SLE", "SOS", "SRD", "SSP", "STN",
+    "SVC", "SYP", "SZL", "THB", "TJS", "TMT", "TND", "TOP", "TRY", "TTD", "TWD", "TZS", "UAH", "UGX",
+    "USD", "UYU", "UZS", "VES", "VND", "VUV", "WST", "XAF", "XCD", "XOF", "XPF", "YER", "ZAR", "ZMW",
+    "ZWL",
+]
+
+ENUMERATIONS: Dict[str, List[str]] = {"iso4217": ISO_4217}
+
+
+def default_rules(quality: QualityConfig) -> List[QualityRule]:
+    """The original hard-coded quarantine checks, used when no rules are configured."""
+    return [
+        QualityRule(name="transaction_id_not_null", column="transaction_id", check="not_null"),
+        QualityRule(name="amount_not_null", column="amount", check="not_null"),
+        QualityRule(name="amount_min", column="amount", check="range", min=quality.min_amount),
+        QualityRule(name="currency_not_null", column="currency", check="not_null"),
+        QualityRule(name="currency_length", column="currency", check="length",
+                    min=quality.currency_len, max=quality.currency_len),
+    ]
+
+
+class _ColumnViews:
+    """
+    Per-batch cache of the derived arrays rules are evaluated on (null mask, Arrow
+    strings, lengths, numbers, parsed timestamps). Each view is built once per
+    column, however many rules read it; a rule itself is one vectorized comparison.
+    """
+
+    def __init__(self, df: "pd.DataFrame", rule_set: "CompiledRuleSet", batch_key: Optional[str]):
+        self.df = df
+        self.rule_set = rule_set
+        self.batch_key = batch_key
+        self._cache: Dict[tuple, np.ndarray] = {}
+
+    def _get(self, kind: str, column: str, build: Callable):
+        key = (kind, column)
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def nulls(self, column: str) -> np.ndarray:
+        return self._get("nulls", column, lambda: self.df[column].isna().to_numpy())
+
+    def strings(self, column: str) -> pa.Array:
+        def build():
+            array = pa.array(self.df[column], from_pandas=True)
+            return array if pa.types.is_string(array.type) else pc.cast(array, pa.string())
+        return self._get("strings", column, build)
+
+    def lengths(self, column: str) -> np.ndarray:
+        return self._get("lengths", column, lambda: _to_numpy(pc.utf8_length(self.strings(column)), -1))
+
+    def numbers(self, column: str) -> np.ndarray:
+        import pandas as pd
+        return self._get("numbers", column,
+                         lambda: pd.to_numeric(self.df[column], errors="coerce").to_numpy(dtype="float64", na_value=np.nan))
+
+    def timestamps_missing(self, column: str) -> np.ndarray:
+        """True where the value does not parse as an ISO-8601 timestamp (nulls included)."""
+        import pandas as pd
+        def build():
+            series = self.df[column]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                return series.isna().to_numpy()
+            return pd.to_datetime(series, errors="coerce", format="ISO8601").isna().to_numpy()
+        return self._get("timestamps", column, build)
+
+    def duplicates(self, column: str) -> np.ndarray:
+        return self._get("duplicates", column,
+                         lambda: self.rule_set.duplicate_flags(column, self.df[column], self.batch_key))
+
+
+def polars_timestamp(text: "pl.Expr") -> "pl.Expr":
+    """ISO-8601 text as naive UTC datetimes (us); null where no POLARS_TIMESTAMP_FORMATS layout matches."""
+    import polars as pl
+    text = text.str.replace(" ", "T", literal=True)
+    parsed = [text.str.to_datetime(fmt, time_unit="us", strict=False) for fmt in POLARS_TIMESTAMP_FORMATS]
+    return pl.coalesce([value.dt.replace_time_zone(None) if fmt.endswith("%#z") else value
+                        for fmt, value in zip(POLARS_TIMESTAMP_FORMATS, parsed)])
+
+
+def _to_numpy(array: pa.Array, fill) -> np.ndarray:
+    return array.fill_null(fill).to_numpy(zero_copy_only=False)
+
+
+class CompiledRuleSet:
+    """
+    Quality rules compiled once into vectorized predicates. `failure_mask` evaluates
+    every rule over a batch and packs the results into one uint64 per row (bit i set
+    = rule i failed). Value checks ignore nulls; only `not_null` rules reject them.
+    """
+
+    def __init__(self, rules: Sequence[QualityRule], enumerations: Optional[Dict[str, List[str]]] = None,
+                 dedup: Optional[DedupConfig] = None):
+        if len(rules) > MAX_RULES:
+            raise ValueError(f"At most {MAX_RULES} quality rules are supported, got {len(rules)}")
+        self.rules = list(rules)
+        self.codes = [rule.code or rule.name.upper() for rule in self.rules]
+        self.enumerations = {**ENUMERATIONS, **(enumerations or {})}
+        self._predicates = [self._compile(rule) for rule in self.rules]
+        self.dedup = dedup or settings.quality.dedup
+        self._indexes: Dict[str, "TransactionIdIndex"] = {}
+
+    @property
+    def columns(self) -> List[str]:
+        return sorted({rule.column for rule in self.rules})
+
+    @property
+    def unique_columns(self) -> List[str]:
+        """Columns checked against the cross-batch duplicate index."""
+        return sorted({rule.column for rule in self.rules if rule.check == "unique"})
+
+    def index_root(self, column: str) -> str:
+        base = self.dedup.path or os.path.join(settings.paths.silver, "_dedup_index")
+        return os.path.join(base, column)
+
+    def index(self, column: str) -> "TransactionIdIndex":
+        """Persisted id index of a `unique` column (opened on first use)."""
+        from src.dedup_index import TransactionIdIndex
+        root = self.index_root(column)
+        if root not in self._indexes:
+            self._indexes[root] = TransactionIdIndex(root, self.dedup.max_segments, self.dedup.merge_chunk_rows)
+        return self._indexes[root]
+
+    def duplicate_flags(self, column: str, values, batch_key: Optional[str], in_batch: bool = True) -> np.ndarray:
+        """
+        True for ids already recorded by another batch and, with `in_batch`, for
+        repeats of an id earlier in the same values. One hash + lookup per value.
+        """
+        from src.dedup_index import hash_ids
+        hashes = hash_ids(values)
+        flags = self.index(column).lookup(hashes, batch_key)
+        if in_batch and len(hashes):
+            # Stable sort: within a run of equal hashes, the first row keeps its place
+            order = np.argsort(hashes, kind="stable")
+            ranked = hashes[order]
+            flags[order[1:][ranked[1:] == ranked[:-1]]] = True
+        return flags
+
+    def record(self, columns: Dict[str, Sequence], batch_key: str):
+        """Adds the ids of accepted rows ({column: values}) to the duplicate indexes."""
+        from src.dedup_index import hash_ids
+        self.record_hashes({column: hash_ids(columns[column]) for column in self.unique_columns}, batch_key)
+
+    def record_hashes(self, hashes: Dict[str, np.ndarray], batch_key: str):
+        """record() with the ids already hashed ({column: hash_ids(values)}), e.g. on Spark executors."""
+        for column in self.unique_columns:
+            self.index(column).add(hashes[column], batch_key)
+
+    def spark_id_hashes(self) -> List["Column"]:
+        """
+        hash_ids of every `unique` column as Spark columns (the uint64 hashes as signed
+        longs), computed on the executors so accepted ids never reach the driver.
+        """
+        import pandas as pd
+        from pyspark.sql.functions import col, pandas_udf
+        from src.dedup_index import hash_ids
+        hashed = pandas_udf(lambda ids: pd.Series(hash_ids(ids).view(np.int64)), "long")
+        return [hashed(col(column)).alias(column) for column in self.unique_columns]
+
+    def _values(self, rule: QualityRule) -> List[str]:
+        if rule.values is not None:
+            return list(rule.values)
+        if rule.enumeration in self.enumerations:
+            return list(self.enumerations[rule.enumeration])
+        raise ValueError(f"Rule {rule.name}: in_set needs `values` or a known `enumeration`")
+
+    def _compile(self, rule: QualityRule) -> Callable[[_ColumnViews], np.ndarray]:
+        """Returns a function computing the rule's failure flags from shared column views."""
+        column = rule.column
+        if rule.check not in CHECKS:
+            raise ValueError(f"Rule {rule.name}: unknown check '{rule.check}' (expected one of {CHECKS})")
+
+        if rule.check == "not_null":
+            return lambda v: v.nulls(column)
+
+        if rule.check == "unique":
+            return lambda v: ~v.nulls(column) & v.duplicates(column)
+
+        if rule.check in ("range", "length"):
+            low = -np.inf if rule.min is None else rule.min
+            high = np.inf if rule.max is None else rule.max
+            if rule.check == "range":
+                return lambda v: ~v.nulls(column) & ~((v.numbers(column) >= low) & (v.numbers(column) <= high))
+            return lambda v: ~v.nulls(column) & ((v.lengths(column) < low) | (v.lengths(column) > high))
+
+        if rule.check == "parse":
+            if rule.parse_as == "timestamp":
+                return lambda v: ~v.nulls(column) & v.timestamps_missing(column)
+            if rule.parse_as != "uuid":
+                raise ValueError(f"Rule {rule.name}: parse_as must be 'timestamp' or 'uuid'")
+            pattern = UUID_PATTERN
+        elif rule.check == "regex":
+            if not rule.pattern:
+                raise ValueError(f"Rule {rule.name}: regex needs a `pattern`")
+            pattern = f"^(?:{rule.pattern})$"
+        else:
+            value_set = pa.array(self._values(rule), type=pa.string())
+            return lambda v: ~v.nulls(column) & ~_to_numpy(pc.is_in(v.strings(column), value_set=value_set), False)
+
+        return lambda v: ~v.nulls(column) & ~_to_numpy(pc.match_substring_regex(v.strings(column), pattern), False)
+
+    def failure_mask(self, df: "pd.DataFrame", batch_key: Optional[str] = None) -> np.ndarray:
+        """
+        Bit-packed failures (uint64 per row) of every rule over `df`. `batch_key`
+        identifies the batch for `unique` rules, so a re-run does not match itself.
+        """
+        views = _ColumnViews(df, self, batch_key)
+        mask = np.zeros(len(df), dtype=np.uint64)
+        for bit, predicate in enumerate(self._predicates):
+            failed = predicate(views)
+            mask |= failed.astype(np.uint64) << np.uint64(bit)
+        return mask
+
+    def reason_codes(self, mask: np.ndarray) -> np.ndarray:
+        """Decodes failure masks into `CODE_A|CODE_B` strings; distinct masks are decoded once."""
+        distinct, inverse = np.unique(mask, return_inverse=True)
+        labels = np.array([
+            REASON_SEPARATOR.join(code for bit, code in enumerate(self.codes) if int(value) >> bit & 1)
+            for value in distinct
+        ], dtype=object)
+        return labels[inverse.reshape(-1)]
+
+    def _index_lookup(self, column: str, batch_key: Optional[str]) -> Callable[..., np.ndarray]:
+        """
+        A picklable lookup against the persisted index of `column` (for Spark and
+        Polars UDFs): it captures only the index location, not the rule set. Per-row
+        batch keys (`keys`) take precedence over `batch_key`.
+        """
+        from src.dedup_index import TransactionIdIndex, hash_ids
+        root, max_segments, merge_chunk_rows = self.index_root(column), self.dedup.max_segments, self.dedup.merge_chunk_rows
+
+        def lookup(values: Sequence, keys: Optional[Sequence] = None) -> np.ndarray:
+            index = TransactionIdIndex(root, max_segments, merge_chunk_rows)
+            hashes = hash_ids(values)
+            if keys is None:
+                return index.lookup(hashes, batch_key)
+            keys = np.asarray(keys, dtype=object)
+            found = np.zeros(len(hashes), dtype=bool)
+            for key in set(keys):
+                rows = keys == key
+                found[rows] = index.lookup(hashes[rows], key)
+            return found
+        return lookup
+
+    def spark_failure_mask(self, batch_key: Union[str, "Column", None] = None,
+                           columns: Sequence[str] = ()) -> "Column":
+        """
+        The same rules as one Spark expression producing the bit-packed failure mask.
+        `unique` rules look ids up in the index on the executors and rank repeats
+        within the batch with a window (first occurrence in file order wins).
+        `batch_key` may be a column when several batch files are read together; it
+        also orders them, so a repeat is charged to the later batch.
+        `columns` are the frame's columns: a typed timestamp with its raw text
+        alongside (RAW_TEXT_PREFIX) fails `parse` when the text did not cast, and
+        `not_null` only when the text itself is null, as in the other engines.
+        """
+        import pandas as pd
+        from pyspark.sql import Window
+        from pyspark.sql.functions import col, length, lit, monotonically_increasing_id, pandas_udf, row_number, when
+        from pyspark.sql.types import StringType
+
+        mask = lit(0).cast("long")
+        for bit, rule in enumerate(self.rules):
+            c = col(rule.column)
+            raw_text = col(RAW_TEXT_PREFIX + rule.column) if RAW_TEXT_PREFIX + rule.column in columns else None
+            if rule.check == "not_null":
+                failed = (raw_text if raw_text is not None else c).isNull()
+            elif rule.check == "range":
+                failed = ~(((c >= rule.min) if rule.min is not None else lit(True))
+                           & ((c <= rule.max) if rule.max is not None else lit(True)))
+            elif rule.check == "length":
+                failed = ~(((length(c) >= rule.min) if rule.min is not None else lit(True))
+                           & ((length(c) <= rule.max) if rule.max is not None else lit(True)))
+            elif rule.check == "parse" and rule.parse_as == "uuid":
+                failed = ~c.cast(StringType()).rlike(UUID_PATTERN)
+            elif rule.check == "parse":
+                # Typed reader without the raw text (parquet): the timestamps were already typed
+                failed = raw_text.isNotNull() & c.isNull() if raw_text is not None else lit(False)
+            elif rule.check == "regex":
+                failed = ~c.cast(StringType()).rlike(f"^(?:{rule.pattern})$")
+            elif rule.check == "unique":
+                if isinstance(batch_key, str) or batch_key is None:
+                    lookup = self._index_lookup(rule.column, batch_key)
+                    seen = pandas_udf(lambda ids, lookup=lookup: pd.Series(lookup(ids)), "boolean")(c)
+                    order = [monotonically_increasing_id()]
+                else:
+                    lookup = self._index_lookup(rule.column, None)
+                    seen = pandas_udf(lambda ids, keys, lookup=lookup: pd.Series(lookup(ids, keys)), "boolean")(c, batch_key)
+                    order = [batch_key, monotonically_increasing_id()]
+                repeated = row_number().over(Window.partitionBy(c).orderBy(*order)) > 1
+                failed = c.isNotNull() & (repeated | seen)
+            else:
+                failed = ~c.isin(self._values(rule))
+            # Null comparisons leave the bit unset, as in the pandas evaluation
+            mask = mask + when(failed, lit(1 << bit).cast("long")).otherwise(lit(0).cast("long"))
+        return mask
+
+    def spark_reason_codes(self, mask: "Column") -> "Column":
+        """Spark expression decoding a failure mask column into `CODE_A|CODE_B`."""
+        from pyspark.sql.functions import concat_ws, lit, when
+        return concat_ws(REASON_SEPARATOR, *[
+            when((mask.bitwiseAND(lit(1 << bit).cast("long"))) != 0, lit(code))
+            for bit, code in enumerate(self.codes)
+        ])
+
+    def polars_failure_mask(self, schema: Dict[str, Any], batch_key: Optional[str] = None) -> "pl.Expr":
+        """
+        The same rules as one Polars expression producing the bit-packed failure mask.
+        `schema` (column -> dtype) tells whether timestamps still need parsing.
+        """
+        import polars as pl
+
+        mask = pl.lit(0, dtype=pl.Int64)
+        for bit, rule in enumerate(self.rules):
+            c = pl.col(rule.column)
+            if rule.check == "not_null":
+                failed = c.is_null()
+            elif rule.check in ("range", "length"):
+                value = c if rule.check == "range" else c.cast(pl.String).str.len_chars()
+                failed = ~(((value >= rule.min) if rule.min is not None else pl.lit(True))
+                           & ((value <= rule.max) if rule.max is not None else pl.lit(True)))
+            elif rule.check == "parse" and rule.parse_as == "uuid":
+                failed = ~c.cast(pl.String).str.contains(UUID_PATTERN)
+            elif rule.check == "parse":
+                if schema.get(rule.column) == pl.String:
+                    failed = c.is_not_null() & polars_timestamp(c).is_null()
+                else:
+                    failed = pl.lit(False)
+            elif rule.check == "regex":
+                failed = ~c.cast(pl.String).str.contains(f"^(?:{rule.pattern})$")
+            elif rule.check == "unique":
+                lookup = self._index_lookup(rule.column, batch_key)
+                seen = c.map_batches(lambda ids, lookup=lookup: pl.Series(lookup(ids.to_numpy())),
+                                     return_dtype=pl.Boolean, is_elementwise=True)
+                failed = c.is_not_null() & (~c.is_first_distinct() | seen)
+            else:
+                failed = ~c.is_in(pl.Series(self._values(rule), dtype=pl.String).implode())
+            # Null comparisons leave the bit unset, as in the pandas evaluation
+            mask = mask + pl.when(failed).then(pl.lit(1 << bit, dtype=pl.Int64)).otherwise(pl.lit(0, dtype=pl.Int64))
+        return mask
+
+    def polars_reason_codes(self, mask: "pl.Expr") -> "pl.Expr":
+        """Polars expression decoding a failure mask into `CODE_A|CODE_B`."""
+        import polars as pl
+        return pl.concat_str([
+            pl.when((mask & (1 << bit)) != 0).then(pl.lit(code))
+            for bit, code in enumerate(self.codes)
+        ], separator=REASON_SEPARATOR, ignore_nulls=True)
+
+
+def compile_rules(quality: Optional[QualityConfig] = None) -> CompiledRuleSet:
+    """Compiles the configured rule registry (settings.quality.rules, or the legacy defaults)."""
+    quality = quality or settings.quality
+    return CompiledRuleSet(quality.rules or default_rules(quality), quality.enumerations, quality.dedup)
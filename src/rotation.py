@@ -0,0 +1,189 @@
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.log_utils import get_module_logger
+from src.config_loader import settings
+from src.security import SecurityManager, key_fingerprint, rotate_pan_batch
+from src.silver_table import file_layout, partition_lock
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("KeyRotationModule", "rotation.log")
+
+STATE_FILE = "_key_rotation_state.json"
+ENCRYPTED_COLUMN = "pan_encrypted"
+
+
+def discover_silver_files(silver_root: str) -> List[str]:
+    """
+    Lists the Parquet files of the silver table (settings.silver.table, every date
+    partition) and of any legacy per-batch `*_silver.parquet` dataset.
+    """
+    files = []
+    if not os.path.isdir(silver_root):
+        return files
+    for name in sorted(os.listdir(silver_root)):
+        path = os.path.join(silver_root, name)
+        if not (name.endswith("_silver.parquet") or name == settings.silver.table):
+            continue
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, dirs, filenames in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith((".", "_")))  # in-flight staging writes
+            files.extend(
+                os.path.join(root, f) for f in sorted(filenames)
+                if f.endswith(".parquet") and not f.startswith((".", "_"))
+            )
+    return files
+
+
+def rotate_parquet_file(path: str, keys: Sequence[bytes], batch_rows: int, row_group_rows: Optional[int] = None) -> int:
+    """
+    Re-encrypts the `pan_encrypted` column of one Parquet file under the primary key,
+    batch by batch (MultiFernet.rotate, which keeps each token's timestamp), then
+    atomically replaces the original. Rows keep their order and the schema its
+    metadata; row groups are `row_group_rows` (silver.row_group_mb, default: the
+    file's own), so min/max pruning on silver.cluster_by still works. Runs under
+    the partition's lock, so a batch re-published meanwhile is not overwritten by
+    its old rows; a file replaced since it was listed is skipped. Returns the row
+    count.
+    """
+    with partition_lock(os.path.dirname(path)):
+        if not os.path.exists(path):
+            logger.info(f"Skipped {path}: replaced since it was listed")
+            return 0
+        return _rotate_file(path, keys, batch_rows, row_group_rows)
+
+
+def _rotate_file(path: str, keys: Sequence[bytes], batch_rows: int, row_group_rows: Optional[int]) -> int:
+    parquet_file = pq.ParquetFile(path)
+    schema = parquet_file.schema_arrow
+    column_index = schema.get_field_index(ENCRYPTED_COLUMN)
+    if column_index < 0:
+        raise ValueError(f"{path} has no {ENCRYPTED_COLUMN} column")
+
+    tmp_path = path + ".rotating"
+    rows = 0
+    try:
+        if not row_group_rows:
+            # The file's own row group size
+            metadata = parquet_file.metadata
+            row_group_rows = max(1, metadata.row_group(0).num_rows) if metadata.num_row_groups else batch_rows
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            # One read per output row group, re-encrypted in batches of `batch_rows`
+            for batch in parquet_file.iter_batches(batch_size=row_group_rows):
+                tokens = batch.column(column_index).to_pylist()
+                present = [t for t in tokens if t is not None]
+                rotated = iter([token for start in range(0, len(present), batch_rows)
+                                for token in rotate_pan_batch(present[start:start + batch_rows], keys)])
+                column = pa.array([next(rotated) if t is not None else None for t in tokens],
+                                  type=schema.field(column_index).type)
+                table = pa.Table.from_batches([batch], schema=schema) \
+                    .set_column(column_index, schema.field(column_index), column)
+                writer.write_table(table, row_group_size=row_group_rows)
+                rows += batch.num_rows
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # Hadoop checksum of the replaced file would no longer match
+    crc_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.crc")
+    if os.path.exists(crc_path):
+        os.remove(crc_path)
+    return rows
+
+
+def _rotate_task(task: Tuple[str, Tuple[bytes, ...], int, int]) -> Tuple[str, int, float]:
+    """Worker entry point: rotates one file and reports (path, rows, seconds)."""
+    path, keys, batch_rows, row_group_rows = task
+    started = time.perf_counter()
+    rows = rotate_parquet_file(path, keys, batch_rows, row_group_rows)
+    return path, rows, time.perf_counter() - started
+
+
+class SilverKeyRotationJob:
+    """
+    Re-encrypts every silver dataset under the current primary key.
+
+    Files are rotated in parallel worker processes and replaced atomically. Progress is
+    persisted after each file in a state record next to silver, so an interrupted job
+    resumes where it stopped; a new primary key starts a new rotation.
+    """
+
+    def __init__(self, security: Optional[SecurityManager] = None, silver_root: Optional[str] = None,
+                 workers: Optional[int] = None, batch_rows: int = 65536):
+        self.security = security or SecurityManager()
+        self.silver_root = silver_root or settings.paths.silver
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_rows = batch_rows
+        self.state_path = os.path.join(self.silver_root, STATE_FILE)
+
+    def _load_state(self, target_key: str) -> Dict[str, Any]:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+            if state.get("target_key") == target_key:
+                return state
+            logger.info("New primary key detected: starting a fresh rotation.")
+        return {"target_key": target_key, "completed": {}}
+
+    def _save_state(self, state: Dict[str, Any]):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def run(self) -> Dict[str, Any]:
+        """Runs (or resumes) the rotation and returns a throughput report."""
+        target_key = key_fingerprint(self.security.key)
+        state = self._load_state(target_key)
+        files = discover_silver_files(self.silver_root)
+        pending = [path for path in files if path not in state["completed"]]
+        logger.info(f"Key rotation to {target_key}: {len(pending)} of {len(files)} file(s) pending, "
+                    f"{len(self.security.keyring.keys)} key version(s), {self.workers} worker(s).")
+
+        keys = tuple(self.security.keyring.keys)
+        # Row groups of the silver table's layout, measured before any file is rewritten
+        _, row_group_rows = file_layout(os.path.join(self.silver_root, settings.silver.table))
+        tasks = [(path, keys, self.batch_rows, row_group_rows) for path in pending]
+        started = time.perf_counter()
+        rows = 0
+
+        def record(result: Tuple[str, int, float]):
+            nonlocal rows
+            path, file_rows, seconds = result
+            rows += file_rows
+            state["completed"][path] = file_rows
+            self._save_state(state)
+            logger.info(f"Rotated {path}: {file_rows} rows in {seconds:.2f}s")
+
+        if self.workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                record(_rotate_task(task))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                for future in as_completed([pool.submit(_rotate_task, task) for task in tasks]):
+                    record(future.result())
+
+        elapsed = time.perf_counter() - started
+        report = {
+            "target_key": target_key,
+            "files_total": len(files),
+            "files_rotated": len(pending),
+            "files_skipped": len(files) - len(pending),
+            "rows": rows,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        logger.info(f"Key rotation finished: {report}")
+        return report
+
+
+if __name__ == "__main__":
+    # Rotates silver to BANKING_ENCRYPTION_KEY, decrypting with BANKING_ENCRYPTION_KEYS_PREVIOUS
+    print(SilverKeyRotationJob().run())
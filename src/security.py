@@ -1,107 +1,240 @@
 import os
-import logging
+import atexit
 import hashlib
-from cryptography.fernet import Fernet
-from typing import Optional
-
-try:
-    from google.cloud import secretmanager
-    GCP_SECRET_MANAGER_AVAILABLE = True
-except ImportError:
-    GCP_SECRET_MANAGER_AVAILABLE = False
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from cryptography.fernet import Fernet, MultiFernet
+from typing import Dict, List, Optional, Sequence, Tuple
 
+from src.log_utils import get_module_logger
 from src.config_loader import settings
+from src.key_provider import fetch_secret, read_secrets_env, secret_manager_enabled
+from src.pseudonymize import HASH_MODES, Pseudonymizer
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("SecurityModule", "security.log")
+
+class BatchKeyRing:
+    """
+    Key versions over one MultiFernet, ordered newest first: the primary (first) key
+    encrypts, any key may decrypt, and `rotate` re-encrypts tokens under the primary
+    key while preserving their original timestamps (MultiFernet.rotate).
+    """
+
+    def __init__(self, keys: Sequence[bytes]):
+        if not keys:
+            raise ValueError("BatchKeyRing requires at least one key.")
+        self.keys = list(keys)
+        self.fernet = MultiFernet([Fernet(key) for key in self.keys])
+
+    def encrypt(self, values: Sequence[str]) -> List[str]:
+        encrypt = self.fernet.encrypt
+        return [encrypt(value.encode()).decode() for value in values]
+
+    def decrypt(self, tokens: Sequence[str]) -> List[str]:
+        """Decrypts tokens made with any key of the ring. Raises InvalidToken if any token is invalid."""
+        decrypt = self.fernet.decrypt
+        return [decrypt(token).decode() for token in tokens]
+
+    def rotate(self, tokens: Sequence[str]) -> List[str]:
+        """Re-encrypts tokens made with any key of the ring under the primary key."""
+        rotate = self.fernet.rotate
+        return [rotate(token).decode() for token in tokens]
+
+
+_KEYRINGS: Dict[Tuple[bytes, ...], BatchKeyRing] = {}
+
+
+def get_keyring(keys: Sequence[bytes]) -> BatchKeyRing:
+    """
+    Process-wide cache of key rings: each process (driver, Spark executor worker or
+    batch worker) builds the Fernet instances for a given set of key versions once.
+    """
+    keys = tuple(keys)
+    keyring = _KEYRINGS.get(keys)
+    if keyring is None:
+        keyring = _KEYRINGS[keys] = BatchKeyRing(keys)
+    return keyring
+
+
+_BATCH_POOLS: Dict[int, ProcessPoolExecutor] = {}
+_BATCH_POOLS_LOCK = threading.Lock()
+
+
+def _batch_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide pool of `workers` processes, started on first use and reused by every batch."""
+    with _BATCH_POOLS_LOCK:
+        pool = _BATCH_POOLS.get(workers)
+        if pool is None:
+            pool = _BATCH_POOLS[workers] = ProcessPoolExecutor(max_workers=workers)
+            atexit.register(pool.shutdown)
+        return pool
+
+
+def _encrypt_chunk(keys: Tuple[bytes, ...], values: List[str]) -> List[str]:
+    return get_keyring(keys).encrypt(values)
+
+
+def _decrypt_chunk(keys: Tuple[bytes, ...], tokens: List[str]) -> List[str]:
+    return get_keyring(keys).decrypt(tokens)
+
+
+def _rotate_chunk(keys: Tuple[bytes, ...], tokens: List[str]) -> List[str]:
+    return get_keyring(keys).rotate(tokens)
+
+
+def _run_batch(func, keys: Tuple[bytes, ...], values: List[str], workers: int) -> List[str]:
+    """Runs a batch function in-process, or split across the long-lived pool of `workers` processes."""
+    if workers <= 1 or len(values) < 2 * workers:
+        return func(keys, values)
+    step = -(-len(values) // workers)
+    chunks = [values[i:i + step] for i in range(0, len(values), step)]
+    results = _batch_pool(workers).map(func, [keys] * len(chunks), chunks)
+    return [value for chunk in results for value in chunk]
+
+
+def encrypt_pan_batch(pans: pd.Series, key: bytes, workers: int = 1) -> pd.Series:
+    """Encrypts a Series of PANs with the cached Fernet for `key`."""
+    values = pans.tolist()
+    if not all(isinstance(pan, str) and pan for pan in values):
+        logger.error("Falla en el cifrado: El lote contiene PANs no válidos o vacíos.")
+        raise ValueError("Invalid PAN for encryption")
+    return pd.Series(_run_batch(_encrypt_chunk, (key,), values, workers), index=pans.index, dtype=object)
+
+
+def decrypt_pan_batch(tokens: pd.Series, keys: Sequence[bytes], workers: int = 1) -> pd.Series:
+    """Decrypts a Series of encrypted PANs made with any of `keys` (newest first)."""
+    values = _run_batch(_decrypt_chunk, tuple(keys), tokens.tolist(), workers)
+    return pd.Series(values, index=tokens.index, dtype=object)
+
+
+def rotate_pan_batch(tokens: Sequence[str], keys: Sequence[bytes], workers: int = 1) -> List[str]:
+    """Re-encrypts tokens made with any of `keys` under the primary (first) key."""
+    return _run_batch(_rotate_chunk, tuple(keys), list(tokens), workers)
+
+
+def key_fingerprint(key: bytes) -> str:
+    """Non-reversible short identifier of a key, safe to log and persist."""
+    return hashlib.sha256(key).hexdigest()[:16]
 
-# Configure logging
-LOG_DIR = settings.paths.logs
-os.makedirs(LOG_DIR, exist_ok=True)
-logger = logging.getLogger("SecurityModule")
-if not logger.handlers:
-    handler = logging.FileHandler(os.path.join(LOG_DIR, "security.log"))
-    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
 
 class SecurityManager:
     """
-    Handles PII security via hashing (SHA256) and encryption (Fernet/AES).
-    Complies with GDPR requirements for data protection.
+    Handles PII security via hashing (SHA256 / HMAC-SHA256, see src/pseudonymize.py)
+    and encryption (Fernet/AES). Complies with GDPR requirements for data protection.
     """
     
-    def __init__(self, key: Optional[bytes] = None):
+    def __init__(self, key: Optional[bytes] = None, previous_keys: Optional[Sequence[bytes]] = None):
         """
         Initializes the security manager. Prioritizes:
         1. Explicit key
-        2. GCP Secret Manager (if configured)
+        2. GCP Secret Manager (if configured; or its file-backed stand-in, security.secret_manager_dir)
         3. secrets.env file
         4. Environment variable
         5. New generation (fallback)
+
+        Secret Manager payloads and secrets.env are cached process-wide with a TTL
+        (src/key_provider.py), so building many managers costs one fetch.
+        
+        Older key versions, kept for decryption and rotation, come from `previous_keys`
+        or from the comma-separated `security.previous_keys_env` variable (newest first).
         """
+        self.key = self._resolve_key(key)
+        if previous_keys is None:
+            previous_keys = self._load_previous_keys()
+        self.previous_keys = [k for k in previous_keys if k != self.key]
+
+        # MultiFernet semantics: encrypt with the primary key, decrypt with any version
+        self.keyring = get_keyring([self.key] + self.previous_keys)
+        self.cipher_suite = self.keyring.fernet
+        self.pseudonymizer = Pseudonymizer(self._resolve_hash_key())
+
+    def _resolve_hash_key(self) -> Optional[bytes]:
+        """The HMAC key of security.email_hash = "hmac" (env or secrets.env); None for plain SHA-256."""
+        mode = settings.security.email_hash
+        if mode not in HASH_MODES:
+            raise ValueError(f"Unknown security.email_hash '{mode}' (expected one of {HASH_MODES})")
+        if mode == "sha256":
+            return None
+        env_name = settings.security.hash_key_env
+        raw_key = os.environ.get(env_name) or self._read_secrets_env(env_name)
+        if not raw_key:
+            # A temporary key would make the hashes of this run unjoinable with every other run
+            raise ValueError(f"security.email_hash is 'hmac' but no key was found in {env_name} or secrets.env")
+        return raw_key.strip().encode()
+
+    def _resolve_key(self, key: Optional[bytes]) -> bytes:
+        """Resolves the primary key through the source chain described in __init__."""
         env_key_name = settings.security.encryption_key_env
         raw_key = os.environ.get(env_key_name)
         
         # 1. Explicit key
         if key:
-            self.key = key
-            self.cipher_suite = Fernet(self.key)
-            return
+            return key
 
         # 2. Try GCP Secret Manager
         gcp_secret_id = os.environ.get("GCP_SECRET_ID")
-        if gcp_secret_id and GCP_SECRET_MANAGER_AVAILABLE:
+        if gcp_secret_id and secret_manager_enabled():
             try:
                 gcp_key = self._fetch_from_gcp_secret_manager(gcp_secret_id)
                 if gcp_key:
-                    self.key = gcp_key.strip().encode()
-                    self.cipher_suite = Fernet(self.key)
                     logger.info(f"Loaded key from GCP Secret Manager: {gcp_secret_id}")
-                    return
+                    return gcp_key.strip().encode()
             except Exception as e:
                 logger.warning(f"Failed to fetch key from GCP Secret Manager: {e}")
 
         # 3. Try to load from secrets.env if it exists
-        secrets_path = os.path.join(os.getcwd(), 'secrets.env')
-        if not raw_key and os.path.exists(secrets_path):
-            try:
-                with open(secrets_path, 'r') as f:
-                    for line in f:
-                        if line.startswith(f"{env_key_name}="):
-                            raw_key = line.split('=')[1].strip()
-                            logger.info(f"Loaded key from secrets.env")
-                            break
-            except Exception as e:
-                logger.warning(f"Error reading secrets.env: {e}")
+        if not raw_key:
+            raw_key = self._read_secrets_env(env_key_name)
+            if raw_key:
+                logger.info(f"Loaded key from secrets.env")
 
         # 4 & 5. Env or Fallback
         if raw_key:
-            self.key = raw_key.strip().encode()
-        else:
-            self.key = Fernet.generate_key()
-            logger.warning(f"No encryption key found in any source. Using a temporary key.")
-            
-        self.cipher_suite = Fernet(self.key)
+            return raw_key.strip().encode()
+        logger.warning(f"No encryption key found in any source. Using a temporary key.")
+        return Fernet.generate_key()
+
+    def _load_previous_keys(self) -> List[bytes]:
+        """Reads retired key versions from the environment or secrets.env."""
+        env_name = settings.security.previous_keys_env
+        raw_keys = os.environ.get(env_name) or self._read_secrets_env(env_name) or ""
+        return [k.strip().encode() for k in raw_keys.split(",") if k.strip()]
+
+    @staticmethod
+    def _read_secrets_env(name: str) -> Optional[str]:
+        """Returns the value of `name` from ./secrets.env, if present."""
+        try:
+            return read_secrets_env(name)
+        except Exception as e:
+            logger.warning(f"Error reading secrets.env: {e}")
+        return None
 
     def _fetch_from_gcp_secret_manager(self, secret_id: str) -> Optional[str]:
-        """Fetches the secret payload from GCP Secret Manager."""
-        if not GCP_SECRET_MANAGER_AVAILABLE:
+        """Fetches the secret payload from GCP Secret Manager (cached, see src/key_provider.py)."""
+        if not secret_manager_enabled():
             return None
         try:
-            client = secretmanager.SecretManagerServiceClient()
-            response = client.access_secret_version(request={"name": secret_id})
-            return response.payload.data.decode("UTF-8")
+            return fetch_secret(secret_id)
         except Exception as e:
             logger.error(f"Error accessing Secret Manager: {e}")
             return None
 
     def hash_email(self, email: str) -> str:
         """
-        Hashes email using SHA256 for anonymized analytics.
+        Hashes email using SHA256 (or HMAC-SHA256) for anonymized analytics, with the
+        same normalization and digest as the Spark and Polars paths.
         """
         if not email:
             logger.error("Attempted to hash null email.")
             return ""
         
-        return hashlib.sha256(email.lower().strip().encode()).hexdigest()
+        return self.pseudonymizer.hash_value(email)
+
+    def hash_emails(self, emails: pd.Series) -> pd.Series:
+        """Batch variant of hash_email (nulls stay null); each distinct email is hashed once."""
+        return self.pseudonymizer.hash_series(emails)
 
     def encrypt_pan(self, pan: str) -> str:
         """
@@ -119,6 +252,23 @@ class SecurityManager:
             logger.error(f"Error encrypting PAN: {str(e)}")
             raise
 
+    def encrypt_pans(self, pans: pd.Series, workers: Optional[int] = None) -> pd.Series:
+        """
+        Batch variant of encrypt_pan: validates the whole Series once and encrypts it
+        with the process-wide cached Fernet, optionally across `workers` processes.
+        """
+        workers = workers or settings.security.batch_workers
+        return encrypt_pan_batch(pans, self.key, workers)
+
+    def decrypt_pans(self, encrypted_pans: pd.Series, workers: Optional[int] = None) -> pd.Series:
+        """Batch variant of decrypt_pan."""
+        workers = workers or settings.security.batch_workers
+        try:
+            return decrypt_pan_batch(encrypted_pans, self.keyring.keys, workers)
+        except Exception as e:
+            logger.error(f"Error decrypting PAN batch: {str(e)}")
+            raise
+
     def decrypt_pan(self, encrypted_pan: str) -> str:
         """
         Decrypts credit card number (PAN).
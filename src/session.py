@@ -0,0 +1,151 @@
+import time
+import atexit
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from pyspark.sql import SparkSession
+from src.log_utils import get_module_logger
+from src.ingestion import execution_date_from_path
+from src.transformer import BankingTransformer, build_spark_session
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("SparkSessionModule", "session.log")
+
+# A batch is a path, or a (path, spark conf overrides for that batch) pair
+Batch = Union[str, Tuple[str, Dict[str, str]]]
+
+
+class SparkSessionManager:
+    """
+    Keeps one warm SparkSession alive for the whole process, so small and frequent
+    batches do not pay JVM and session startup each time.
+
+    Runtime (SQL) settings are applied to the live session between batches; static
+    settings (memory, cores, ...) can only change by restarting the session.
+    """
+
+    _instance: Optional["SparkSessionManager"] = None
+    _lock = threading.Lock()
+
+    def __init__(self, conf: Optional[Dict[str, str]] = None):
+        self.conf: Dict[str, str] = dict(conf or {})
+        self._spark: Optional[SparkSession] = None
+        self._session_lock = threading.Lock()
+        self.sessions_started = 0
+
+    @classmethod
+    def get(cls) -> "SparkSessionManager":
+        """Process-wide manager; the session is stopped at interpreter exit."""
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                atexit.register(cls._instance.stop)
+            return cls._instance
+
+    def session(self) -> SparkSession:
+        """Returns the live session, starting it on first use."""
+        with self._session_lock:
+            if self._spark is None:
+                started = time.perf_counter()
+                self._spark = build_spark_session(self.conf)
+                self.sessions_started += 1
+                logger.info(f"SparkSession started in {time.perf_counter() - started:.2f}s.")
+            return self._spark
+
+    def transformer(self) -> BankingTransformer:
+        """A BankingTransformer bound to the shared session (its close() keeps the session)."""
+        return BankingTransformer(self.session())
+
+    def apply_conf(self, conf: Dict[str, str], restart_if_needed: bool = False) -> Dict[str, List[str]]:
+        """
+        Applies `conf` to the live session. Runtime settings take effect immediately;
+        static ones are reported in `requires_restart` and only applied if
+        `restart_if_needed` is set (the session is then rebuilt with them).
+        """
+        spark = self.session()
+        applied, requires_restart = [], []
+        for key, value in conf.items():
+            value = str(value)
+            if spark.conf.get(key, None) == value:
+                continue
+            if spark.conf.isModifiable(key):
+                spark.conf.set(key, value)
+                applied.append(key)
+            else:
+                requires_restart.append(key)
+
+        if requires_restart:
+            if restart_if_needed:
+                self.restart({key: str(conf[key]) for key in requires_restart})
+                applied.extend(requires_restart)
+                requires_restart = []
+            else:
+                logger.warning(f"Static Spark settings need a session restart and were not applied: {requires_restart}")
+        return {"applied": applied, "requires_restart": requires_restart}
+
+    def restart(self, conf: Optional[Dict[str, str]] = None):
+        """Stops the session and starts a new one with `conf` merged into the manager's settings."""
+        self.conf.update(conf or {})
+        self.stop()
+        self.session()
+
+    def stop(self):
+        with self._session_lock:
+            if self._spark is not None:
+                self._spark.stop()
+                self._spark = None
+                logger.info("SparkSession stopped.")
+
+    def _scoped_conf(self, conf: Dict[str, str]) -> Dict[str, Optional[str]]:
+        """Current values of the runtime settings in `conf`, to restore after a batch."""
+        spark = self.session()
+        return {key: spark.conf.get(key, None) for key in conf if spark.conf.isModifiable(key)}
+
+    def _restore_conf(self, previous: Dict[str, Optional[str]]):
+        spark = self.session()
+        for key, value in previous.items():
+            if value is None:
+                spark.conf.unset(key)
+            else:
+                spark.conf.set(key, value)
+
+    def run_batches(self, batches: Sequence[Batch], restart_if_needed: bool = False) -> Dict[str, Any]:
+        """
+        Runs raw batch files through silver (Spark-native ingestion) one after the
+        other on the shared session, then folds all new silver outputs into Gold in
+        one incremental pass. Per-batch conf overrides only apply to their own batch.
+        """
+        transformer = self.transformer()
+        report: Dict[str, Any] = {"batches": [], "silver_paths": []}
+        started = time.perf_counter()
+        for batch in batches:
+            path, conf = (batch, {}) if isinstance(batch, str) else batch
+            batch_started = time.perf_counter()
+            previous = self._scoped_conf(conf)
+            applied = self.apply_conf(conf, restart_if_needed)
+            if self._spark is not transformer.spark:
+                # A static setting restarted the session
+                transformer = self.transformer()
+            try:
+                silver_path = transformer.ingest_to_silver(path, execution_date_from_path(path))
+            finally:
+                self._restore_conf(previous)
+            if silver_path:
+                report["silver_paths"].append(silver_path)
+            report["batches"].append({
+                "path": path,
+                "silver": silver_path,
+                "conf": applied,
+                "seconds": round(time.perf_counter() - batch_started, 3),
+            })
+            logger.info(f"Batch {path} -> {silver_path} in {report['batches'][-1]['seconds']}s")
+
+        gold_started = time.perf_counter()
+        if report["silver_paths"]:
+            transformer.silver_to_gold(report["silver_paths"])
+        else:
+            logger.warning("No valid records found in these batches. Gold tier not updated.")
+        report["gold_seconds"] = round(time.perf_counter() - gold_started, 3)
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        report["sessions_started"] = self.sessions_started
+        logger.info(f"Processed {len(batches)} batch(es) on one session in {report['seconds']}s.")
+        return report
@@ -0,0 +1,291 @@
+import os
+import json
+import math
+import uuid
+import argparse
+import contextlib
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from src.log_utils import get_module_logger
+from src.config_loader import settings
+from src.storage import require_local
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer deployments only
+    fcntl = None
+
+if TYPE_CHECKING:
+    from pyspark.sql import DataFrame
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("SilverTableModule", "silver_table.log")
+
+# Compressed size of a silver row until the table has files to measure it from
+DEFAULT_ROW_BYTES = 256
+# Files an optimize rewrote (Parquet footer metadata of its output), for crash recovery
+REPLACED_KEY = b"silver.replaced"
+# Written once every output file of an optimize is in place: from then on its sources may go
+OPTIMIZE_MANIFEST = "_optimize-{stem}.{token}.json"
+# Held by whatever replaces files of a partition: publish_batch, optimize and key rotation
+LOCK_FILE = ".lock"
+
+
+def table_root() -> str:
+    """Root of the silver table: <silver>/<silver.table>, partitioned by date=<execution date>."""
+    # Batches are published and optimized by renames, which object storage does not have
+    return require_local(os.path.join(settings.paths.silver, settings.silver.table), "The silver table")
+
+
+def partition_path(execution_date: str, root: Optional[str] = None) -> str:
+    return os.path.join(root or table_root(), f"date={execution_date}")
+
+
+@contextlib.contextmanager
+def partition_lock(partition: str):
+    """
+    Exclusive lock on a partition across processes, so a batch re-published during
+    an optimize or a key rotation is not brought back by their rewrite of its old files.
+    """
+    os.makedirs(partition, exist_ok=True)
+    with open(os.path.join(partition, LOCK_FILE), "a") as lock:
+        if fcntl:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def batch_stem(batch_key: str) -> str:
+    """`transactions_20240101.csv` -> `transactions_20240101`: the prefix of that batch's files."""
+    return os.path.splitext(os.path.basename(batch_key))[0]
+
+
+def _data_files(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory)
+                  if name.endswith(".parquet") and not name.startswith((".", "_")))
+
+
+def batch_files(partition: str, stem: str) -> List[str]:
+    """Data files of one batch in a partition (named `<stem>.<token>.<n>.parquet`)."""
+    return [name for name in _data_files(partition) if name.startswith(f"{stem}.")]
+
+
+def partition_batches(partition: str) -> List[str]:
+    """Stems of the batches with files in a partition."""
+    return sorted({name.split(".", 1)[0] for name in _data_files(partition)})
+
+
+def estimate_row_bytes(root: Optional[str] = None, sample_files: int = 8) -> float:
+    """Average compressed row size, from the footers of up to `sample_files` files of the table."""
+    root = root or table_root()
+    rows = size = 0
+    if os.path.isdir(root):
+        partitions = sorted(name for name in os.listdir(root) if name.startswith("date="))
+        for partition in reversed(partitions):
+            for name in _data_files(os.path.join(root, partition)):
+                path = os.path.join(root, partition, name)
+                rows += pq.ParquetFile(path).metadata.num_rows
+                size += os.path.getsize(path)
+                sample_files -= 1
+                if not sample_files:
+                    break
+            if not sample_files:
+                break
+    return size / rows if rows else DEFAULT_ROW_BYTES
+
+
+def file_layout(root: Optional[str] = None) -> Tuple[int, int]:
+    """Rows per file and per row group that hit silver.target_file_mb / silver.row_group_mb."""
+    row_bytes = estimate_row_bytes(root)
+    target_rows = max(1, int(settings.silver.target_file_mb * 2**20 / row_bytes))
+    row_group_rows = max(1, min(target_rows, int(settings.silver.row_group_mb * 2**20 / row_bytes)))
+    return target_rows, row_group_rows
+
+
+def cluster_spark(df: "DataFrame", rows: int, keys: Sequence[str] = ()) -> Tuple["DataFrame", Dict[str, str]]:
+    """
+    Range-partitions a secured Spark DataFrame on `keys` + silver.cluster_by into as
+    many tasks as target-size files are needed for `rows`, sorted within each, so
+    every file (and row group) covers a narrow customer range. Returns the frame and
+    the writer options (file and row group size caps).
+    """
+    target_rows, row_group_rows = file_layout()
+    order = [*keys, *settings.silver.cluster_by]
+    files = max(1, math.ceil(rows / target_rows))
+    clustered = df.repartitionByRange(files, *order).sortWithinPartitions(*order)
+    options = {
+        "maxRecordsPerFile": str(target_rows),
+        "parquet.block.size": str(int(row_group_rows * estimate_row_bytes())),
+    }
+    return clustered, options
+
+
+def publish_batch(staging_dir: str, execution_date: str, stem: str, replace: bool = True,
+                  root: Optional[str] = None) -> str:
+    """
+    Moves the data files of a finished write into the batch's date partition,
+    renamed `<stem>.<token>.<n>.parquet`. With `replace`, the batch's previous files
+    are removed (idempotent re-runs); other batches of the same date are untouched.
+    Returns the partition path (the silver input of Gold).
+    """
+    partition = partition_path(execution_date, root)
+    with partition_lock(partition):
+        previous = batch_files(partition, stem) if replace else []
+        token = uuid.uuid4().hex[:8]
+        for number, name in enumerate(_data_files(staging_dir)):
+            os.replace(os.path.join(staging_dir, name), os.path.join(partition, f"{stem}.{token}.{number:05d}.parquet"))
+        for name in previous:
+            os.remove(os.path.join(partition, name))
+    return partition
+
+
+def _file_token(name: str) -> str:
+    """`<stem>.<token>.<n>.parquet`, or its hidden `.<...>.tmp` while written -> `<stem>.<token>`."""
+    return name.lstrip(".").removesuffix(".tmp").rsplit(".", 2)[0]
+
+
+def _recover(partition: str):
+    """
+    Repairs an interrupted optimize. With its manifest (every output file was in
+    place), the sources it did not get to remove are deleted. Without one, the
+    output is incomplete: its renamed and unrenamed files are deleted and the
+    sources, all still there, stay the batch's data.
+    """
+    for name in sorted(os.listdir(partition)):
+        if not name.startswith("_optimize-"):
+            continue
+        if name.endswith(".json"):
+            with open(os.path.join(partition, name)) as f:
+                for source in json.load(f)["replaced"]:
+                    if os.path.exists(os.path.join(partition, source)):
+                        os.remove(os.path.join(partition, source))
+        os.remove(os.path.join(partition, name))   # or a manifest that was never completed
+    incomplete = {_file_token(name) for name in os.listdir(partition)
+                  if name.startswith(".") and name.endswith(".parquet.tmp")}
+    for name in _data_files(partition):
+        replaced = json.loads((pq.read_schema(os.path.join(partition, name)).metadata or {}).get(REPLACED_KEY, b"[]"))
+        # Output of an optimize that never released its sources: they are still there
+        if any(os.path.exists(os.path.join(partition, source)) for source in replaced):
+            incomplete.add(_file_token(name))
+    for name in sorted(os.listdir(partition)):
+        if _file_token(name) in incomplete and (name.endswith(".parquet") or name.endswith(".parquet.tmp")):
+            os.remove(os.path.join(partition, name))
+
+
+def optimize(dates: Optional[Iterable[str]] = None, root: Optional[str] = None) -> Dict[str, int]:
+    """
+    OPTIMIZE for the silver table: in every partition (or only `dates`), a batch
+    stored in more files than its size needs (streamed chunks, small appends) is
+    rewritten as one sorted run on silver.cluster_by, split into target-size files
+    of row_group_mb row groups. Each batch is rewritten on its own, so it can still
+    be replaced by a re-run. The old files are deleted only once every new file is
+    in place and a manifest records it; an interrupted optimize is repaired by the
+    next one (rolled forward with its manifest, back without). Each partition is
+    optimized under partition_lock, so publish_batch (ingestion) and other optimizes
+    wait for it instead of racing the rewrite.
+    """
+    root = root or table_root()
+    target_rows, row_group_rows = file_layout(root)
+    wanted = set(dates) if dates is not None else None
+    stats = {"batches": 0, "files_in": 0, "files_out": 0, "rows": 0}
+    partitions = sorted(name for name in os.listdir(root) if name.startswith("date=")) if os.path.isdir(root) else []
+    for name in partitions:
+        if wanted is not None and name[len("date="):] not in wanted:
+            continue
+        partition = os.path.join(root, name)
+        with partition_lock(partition):
+            _recover(partition)
+            for stem in partition_batches(partition):
+                files = batch_files(partition, stem)
+                rows = sum(pq.ParquetFile(os.path.join(partition, f)).metadata.num_rows for f in files)
+                if len(files) <= max(1, math.ceil(rows / target_rows)):
+                    continue
+                table = pa.concat_tables([pq.read_table(os.path.join(partition, f)) for f in files],
+                                         promote_options="permissive")
+                table = table.sort_by([(column, "ascending") for column in settings.silver.cluster_by])
+                table = table.replace_schema_metadata({**(table.schema.metadata or {}), REPLACED_KEY: json.dumps(files).encode()})
+                token = uuid.uuid4().hex[:8]
+                written = []
+                for number, offset in enumerate(range(0, table.num_rows, target_rows)):
+                    target = f"{stem}.{token}.{number:05d}.parquet"
+                    pq.write_table(table.slice(offset, target_rows), os.path.join(partition, f".{target}.tmp"),
+                                   row_group_size=row_group_rows)
+                    written.append(target)
+                for target in written:
+                    os.replace(os.path.join(partition, f".{target}.tmp"), os.path.join(partition, target))
+                manifest = os.path.join(partition, OPTIMIZE_MANIFEST.format(stem=stem, token=token))
+                with open(f"{manifest}.tmp", "w") as f:
+                    json.dump({"stem": stem, "token": token, "written": written, "replaced": files}, f)
+                os.replace(f"{manifest}.tmp", manifest)
+                for file_name in files:
+                    os.remove(os.path.join(partition, file_name))
+                os.remove(manifest)
+                stats["batches"] += 1
+                stats["files_in"] += len(files)
+                stats["files_out"] += len(written)
+                stats["rows"] += rows
+    logger.info(f"Silver optimize: {stats['batches']} batch(es), {stats['files_in']} file(s) rewritten "
+                f"into {stats['files_out']} ({stats['rows']} rows) under {root}")
+    return stats
+
+
+def silver_dataset(root: Optional[str] = None) -> ds.Dataset:
+    """The whole silver table as a pyarrow dataset (`date` from the partition directories)."""
+    partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+    return ds.dataset(root or table_root(), format="parquet", partitioning=partitioning)
+
+
+def scan_plan(dataset: ds.Dataset, row_filter: Optional[ds.Expression]) -> Dict[str, int]:
+    """Files and row groups a filtered read touches (min/max statistics pruning) versus the table."""
+    plan = {"files": 0, "row_groups": 0, "row_groups_total": 0}
+    for fragment in dataset.get_fragments():
+        plan["row_groups_total"] += fragment.num_row_groups
+    for fragment in dataset.get_fragments(filter=row_filter):
+        row_groups = len(fragment.subset(row_filter, schema=dataset.schema).row_groups) if row_filter is not None else fragment.num_row_groups
+        plan["files"] += bool(row_groups)
+        plan["row_groups"] += row_groups
+    return plan
+
+
+def lookup_customer(customer_id: Optional[str] = None, email_hashed: Optional[str] = None,
+                    start: Optional[str] = None, end: Optional[str] = None,
+                    columns: Optional[List[str]] = None, root: Optional[str] = None) -> pa.Table:
+    """
+    Silver rows of one customer (by id and/or hashed email), optionally limited to
+    execution dates `start`..`end`. Only the date partitions in range are listed,
+    and within them only the row groups whose min/max statistics can match are read.
+    """
+    conditions = []
+    if customer_id is not None:
+        conditions.append(ds.field("customer_id") == customer_id)
+    if email_hashed is not None:
+        conditions.append(ds.field("email_hashed") == email_hashed)
+    if start:
+        conditions.append(ds.field("date") >= start)
+    if end:
+        conditions.append(ds.field("date") <= end)
+    if not conditions:
+        raise ValueError("A customer lookup needs a customer_id or an email_hashed")
+    row_filter = conditions[0]
+    for condition in conditions[1:]:
+        row_filter = row_filter & condition
+    dataset = silver_dataset(root)
+    plan = scan_plan(dataset, row_filter)
+    logger.info(f"Customer lookup: {plan['row_groups']} of {plan['row_groups_total']} row group(s) "
+                f"in {plan['files']} file(s)")
+    return dataset.to_table(columns=columns, filter=row_filter)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Silver table maintenance")
+    parser.add_argument("command", choices=["optimize"])
+    parser.add_argument("--date", action="append", help="execution date partition to optimize (repeatable)")
+    args = parser.parse_args()
+    print(optimize(args.date))
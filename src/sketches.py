@@ -0,0 +1,113 @@
+import math
+import hashlib
+from typing import TYPE_CHECKING, Sequence, Tuple
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+if TYPE_CHECKING:
+    import polars as pl
+    from pyspark.sql import Column
+
+# Mergeable sketches stored in Gold tables, computed identically by Spark and Polars.
+# Both kinds are stored sparse, as a sorted list of (bucket, value) structs:
+# - hll: HyperLogLog of a string column (distinct counts). bucket = register (first
+#   HLL_PRECISION bits of the value's SHA-256), value = rank (leading zeros of the next
+#   52 bits + 1). Merged with max per bucket; standard error 1.04/sqrt(4096) = 1.6%.
+# - quantiles: DDSketch of a numeric column. bucket = ceil(log_gamma(x)) (values at or
+#   below MIN_QUANTILE_VALUE share ZERO_BUCKET), value = count. Merged by summing per
+#   bucket; every quantile is within QUANTILE_ACCURACY relative error.
+# The parameters are part of the stored format (sketches written with other values
+# cannot be merged), so they are constants rather than settings.
+HLL_PRECISION = 12
+HLL_REGISTERS = 1 << HLL_PRECISION
+QUANTILE_ACCURACY = 0.01
+GAMMA = (1 + QUANTILE_ACCURACY) / (1 - QUANTILE_ACCURACY)
+MIN_QUANTILE_VALUE = 1e-9
+ZERO_BUCKET = -(2 ** 31)
+
+SKETCHES = ("hll", "quantiles")
+# How the buckets of two sketches of the same kind combine
+SKETCH_MERGE = {"hll": "max", "quantiles": "sum"}
+SKETCH_SPARK_TYPE = "array<struct<bucket:int,value:bigint>>"
+SKETCH_ARROW_TYPE = pa.list_(pa.struct([("bucket", pa.int32()), ("value", pa.int64())]))
+
+
+def _sha256_hex(values: "pl.Series") -> "pl.Series":
+    """Hex SHA-256 of a string column (Spark's sha2); repeated values are hashed once."""
+    import polars as pl
+    encoded = values.rechunk().to_arrow().cast(pa.large_string()).dictionary_encode()
+    digests = pa.array([hashlib.sha256(value.encode()).hexdigest() for value in encoded.dictionary.to_pylist()],
+                       pa.large_string())
+    return pl.from_arrow(digests.take(encoded.indices)).alias(values.name)
+
+
+def spark_cells(kind: str, column: str) -> Tuple["Column", "Column"]:
+    """(bucket, value) of one row's contribution to a sketch of `column` (null bucket: no contribution)."""
+    from pyspark.sql.functions import bin, ceil, col, conv, length, lit, log, sha2, substring, when
+    if kind == "hll":
+        digest = sha2(col(column).cast("string"), 256)
+        rest = conv(substring(digest, HLL_PRECISION // 4 + 1, 13), 16, 10).cast("bigint")
+        bucket = conv(substring(digest, 1, HLL_PRECISION // 4), 16, 10).cast("int")
+        return bucket, when(rest == 0, lit(53)).otherwise(lit(53) - length(bin(rest))).cast("bigint")
+    value = col(column).cast("double")
+    bucket = when(value <= MIN_QUANTILE_VALUE, lit(ZERO_BUCKET)) \
+        .otherwise(ceil(log(value) / lit(math.log(GAMMA))).cast("int"))
+    return bucket.cast("int"), lit(1).cast("bigint")
+
+
+def polars_cells(kind: str, column: str) -> Tuple["pl.Expr", "pl.Expr"]:
+    """Polars counterpart of spark_cells (same buckets and values for the same rows)."""
+    import polars as pl
+    if kind == "hll":
+        digest = pl.col(column).cast(pl.String).map_batches(_sha256_hex, return_dtype=pl.String, is_elementwise=True)
+        bucket = digest.str.slice(0, HLL_PRECISION // 4).str.to_integer(base=16).cast(pl.Int32)
+        rest = digest.str.slice(HLL_PRECISION // 4, 13).str.to_integer(base=16).cast(pl.UInt64)
+        # 52-bit remainder in a 64-bit word: leading zeros - 11 = 53 - bit length (53 for zero)
+        return bucket, (rest.bitwise_leading_zeros().cast(pl.Int64) - 11)
+    value = pl.col(column).cast(pl.Float64)
+    bucket = pl.when(value <= MIN_QUANTILE_VALUE).then(pl.lit(ZERO_BUCKET)) \
+        .otherwise((value.log() / math.log(GAMMA)).ceil()).cast(pl.Int32)
+    return bucket, pl.when(value.is_not_null()).then(pl.lit(1, dtype=pl.Int64))
+
+
+def flatten(sketches: pa.ChunkedArray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(row index, bucket, value) of every entry of a column of sketches."""
+    array = sketches.combine_chunks() if isinstance(sketches, pa.ChunkedArray) else sketches
+    entries = pc.list_flatten(array)
+    rows = pc.list_parent_indices(array).to_numpy()
+    return rows, entries.field("bucket").to_numpy(zero_copy_only=False), entries.field("value").to_numpy(zero_copy_only=False)
+
+
+def hll_estimates(groups: np.ndarray, buckets: np.ndarray, ranks: np.ndarray, count: int) -> np.ndarray:
+    """Distinct-count estimate of each of `count` groups, merging all entries of a group."""
+    registers = np.zeros((count, HLL_REGISTERS), dtype=np.uint8)
+    np.maximum.at(registers, (groups, buckets), ranks.astype(np.uint8))
+    alpha = 0.7213 / (1 + 1.079 / HLL_REGISTERS)
+    raw = alpha * HLL_REGISTERS ** 2 / np.sum(np.exp2(-registers.astype(np.float64)), axis=1)
+    zeros = np.count_nonzero(registers == 0, axis=1)
+    # Small cardinalities: linear counting over the empty registers
+    small = (raw <= 2.5 * HLL_REGISTERS) & (zeros > 0)
+    linear = HLL_REGISTERS * np.log(HLL_REGISTERS / np.maximum(zeros, 1))
+    return np.where(small, linear, raw)
+
+
+def _bucket_value(bucket: np.ndarray) -> np.ndarray:
+    return np.where(bucket == ZERO_BUCKET, 0.0, 2 * np.power(GAMMA, bucket.astype(np.float64)) / (GAMMA + 1))
+
+
+def quantile_estimates(groups: np.ndarray, buckets: np.ndarray, counts: np.ndarray, count: int,
+                       quantiles: Sequence[float]) -> np.ndarray:
+    """(count, len(quantiles)) estimates, merging all entries of a group (NaN for empty groups)."""
+    result = np.full((count, len(quantiles)), np.nan)
+    order = np.lexsort((buckets, groups))
+    groups, buckets, counts = groups[order], buckets[order], counts[order]
+    bounds = np.searchsorted(groups, np.arange(count + 1))
+    for group in range(count):
+        start, end = bounds[group], bounds[group + 1]
+        if start == end:
+            continue
+        cumulative = np.cumsum(counts[start:end])
+        ranks = np.asarray(quantiles) * (cumulative[-1] - 1)
+        result[group] = _bucket_value(buckets[start:end][np.searchsorted(cumulative, ranks, side="right")])
+    return result
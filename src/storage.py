@@ -0,0 +1,638 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
+from src.log_utils import get_module_logger
+from src.config_loader import settings
+
+if TYPE_CHECKING:
+    import pyarrow.fs as pafs
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("StorageModule", "storage.log")
+
+GCS_SCHEME = "gs://"
+# Written last into a directory copied by transfer(): the copy is complete once the
+# marker exists (see committed_files)
+COMMIT_MARKER = "_COMMITTED"
+# Parts of multipart uploads live under this bucket prefix until they are composed
+UPLOADS_PREFIX = "_uploads"
+# GCS composes at most 32 source objects per request
+COMPOSE_LIMIT = 32
+
+
+def is_remote(path: str) -> bool:
+    return path.startswith(GCS_SCHEME)
+
+
+class FileInfo:
+    __slots__ = ("path", "size", "mtime_ns")
+
+    def __init__(self, path: str, size: int, mtime_ns: int):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def __repr__(self):
+        return f"FileInfo({self.path!r}, size={self.size}, mtime_ns={self.mtime_ns})"
+
+
+_PART_POOL: Optional[ThreadPoolExecutor] = None
+_PART_POOL_LOCK = threading.Lock()
+
+
+def _part_pool() -> ThreadPoolExecutor:
+    """Process-wide pool for the parts of multipart transfers (file-level work runs on its own pool)."""
+    global _PART_POOL
+    with _PART_POOL_LOCK:
+        if _PART_POOL is None:
+            _PART_POOL = ThreadPoolExecutor(max_workers=settings.storage.max_workers, thread_name_prefix="storage-part")
+        return _PART_POOL
+
+
+def _part_bytes() -> int:
+    return max(1, int(settings.storage.part_size_mb * 2**20))
+
+
+class LocalStorage:
+    """Local (or mounted) POSIX paths."""
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def isdir(self, path: str) -> bool:
+        return os.path.isdir(path)
+
+    def isfile(self, path: str) -> bool:
+        return os.path.isfile(path)
+
+    def stat(self, path: str) -> Optional[FileInfo]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return FileInfo(path, stat.st_size, stat.st_mtime_ns)
+
+    def listdir(self, path: str) -> List[str]:
+        return sorted(os.listdir(path)) if os.path.isdir(path) else []
+
+    def list_files(self, path: str) -> Iterator[FileInfo]:
+        """Every file under `path`, in path order."""
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            for name in sorted(names):
+                info = self.stat(os.path.join(root, name))
+                if info is not None:
+                    yield info
+
+    def makedirs(self, path: str):
+        os.makedirs(path, exist_ok=True)
+
+    def read_bytes(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def read_range(self, path: str, start: int, length: int) -> bytes:
+        with open(path, "rb") as f:
+            f.seek(start)
+            return f.read(length)
+
+    def write_bytes(self, path: str, data: bytes):
+        """Atomically replaces `path` with `data`."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def remove(self, path: str):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def rmtree(self, path: str):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+
+    def replace(self, source: str, destination: str):
+        os.replace(source, destination)
+
+    def copy(self, source: str, destination: str):
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        tmp_path = f"{destination}.{uuid.uuid4().hex[:8]}.tmp"
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+
+    upload = download = copy
+
+    def arrow_filesystem(self, path: str) -> Tuple[Optional["pafs.FileSystem"], str]:
+        """(pyarrow filesystem, path) for pyarrow readers and writers; None keeps pyarrow's local default."""
+        return None, path
+
+
+class ObjectStorage:
+    """
+    gs://<bucket>/<name> objects through a bucket client (GcsClient, or GcsEmulator
+    in tests and benchmarks). Objects have no directories and no rename: a
+    "directory" is a name prefix, an object appears atomically once fully written.
+
+    - Uploads above storage.part_size_mb go up as parallel parts composed into the
+      object; downloads are parallel ranged reads into a local temporary file.
+    - Listings are paged (storage.list_page_size); the next page is fetched while
+      the current one is being consumed.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _split(path: str) -> Tuple[str, str]:
+        bucket, _, name = path[len(GCS_SCHEME):].partition("/")
+        return bucket, name.strip("/")
+
+    def _pages(self, bucket: str, prefix: str, delimiter: Optional[str] = None) -> Iterator[Tuple[list, list]]:
+        page_size = settings.storage.list_page_size
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-list") as prefetch:
+            page = prefetch.submit(self.client.list, bucket, prefix, delimiter, None, page_size)
+            while page is not None:
+                blobs, prefixes, token = page.result()
+                page = prefetch.submit(self.client.list, bucket, prefix, delimiter, token, page_size) if token else None
+                yield blobs, prefixes
+
+    def stat(self, path: str) -> Optional[FileInfo]:
+        """An object's size and update time; for a prefix ("directory"), its newest object."""
+        bucket, name = self._split(path)
+        found = self.client.stat(bucket, name) if name else None
+        if found is not None:
+            return FileInfo(path, *found)
+        newest = max((info.mtime_ns for info in self.list_files(path)), default=None)
+        return None if newest is None else FileInfo(path, 0, newest)
+
+    def isfile(self, path: str) -> bool:
+        bucket, name = self._split(path)
+        return bool(name) and self.client.stat(bucket, name) is not None
+
+    def isdir(self, path: str) -> bool:
+        bucket, name = self._split(path)
+        blobs, prefixes, _ = self.client.list(bucket, f"{name}/" if name else "", "/", None, 1)
+        return bool(blobs or prefixes)
+
+    def exists(self, path: str) -> bool:
+        return self.isfile(path) or self.isdir(path)
+
+    def listdir(self, path: str) -> List[str]:
+        bucket, name = self._split(path)
+        prefix = f"{name}/" if name else ""
+        entries = []
+        for blobs, prefixes in self._pages(bucket, prefix, "/"):
+            entries.extend(blob[0][len(prefix):] for blob in blobs)
+            entries.extend(sub[len(prefix):].rstrip("/") for sub in prefixes)
+        return sorted(entry for entry in entries if entry)
+
+    def list_files(self, path: str) -> Iterator[FileInfo]:
+        """Every object under `path`, in name order."""
+        bucket, name = self._split(path)
+        for blobs, _ in self._pages(bucket, f"{name}/" if name else ""):
+            for blob_name, size, mtime_ns in blobs:
+                yield FileInfo(f"{GCS_SCHEME}{bucket}/{blob_name}", size, mtime_ns)
+
+    def makedirs(self, path: str):
+        """Prefixes exist through their objects; only a client that keeps directories needs one."""
+        self.client.makedirs(*self._split(path))
+
+    def read_bytes(self, path: str) -> bytes:
+        return self.client.get(*self._split(path))
+
+    def read_range(self, path: str, start: int, length: int) -> bytes:
+        bucket, name = self._split(path)
+        size = self.client.stat(bucket, name)[0]
+        return self.client.get(bucket, name, start, min(size, start + length)) if start < size else b""
+
+    def write_bytes(self, path: str, data: bytes):
+        self.client.put(*self._split(path), data)
+
+    def remove(self, path: str):
+        self.client.delete(*self._split(path))
+
+    def rmtree(self, path: str):
+        bucket, _ = self._split(path)
+        names = [self._split(info.path)[1] for info in self.list_files(path)]
+        list(_part_pool().map(lambda name: self.client.delete(bucket, name), names))
+
+    def copy(self, source: str, destination: str):
+        """Server-side copy."""
+        self.client.copy(*self._split(source), *self._split(destination))
+
+    def replace(self, source: str, destination: str):
+        self.copy(source, destination)
+        self.remove(source)
+
+    def _compose(self, bucket: str, name: str, parts: List[str]) -> List[str]:
+        """Composes `parts` into `name`, in rounds of COMPOSE_LIMIT; returns the intermediate objects made."""
+        intermediates = []
+        while len(parts) > COMPOSE_LIMIT:
+            groups = [parts[i:i + COMPOSE_LIMIT] for i in range(0, len(parts), COMPOSE_LIMIT)]
+            parts = [f"{group[0]}.c{len(intermediates) + i}" for i, group in enumerate(groups)]
+            list(_part_pool().map(self.client.compose, [bucket] * len(groups), parts, groups))
+            intermediates.extend(parts)
+        self.client.compose(bucket, name, parts)
+        return intermediates
+
+    def upload(self, local_path: str, path: str):
+        """Uploads a local file; large files go up as parallel parts composed into the object."""
+        bucket, name = self._split(path)
+        size = os.path.getsize(local_path)
+        part_bytes = _part_bytes()
+        if size <= part_bytes:
+            with open(local_path, "rb") as f:
+                self.client.put(bucket, name, f.read())
+            return
+        token = uuid.uuid4().hex
+        offsets = range(0, size, part_bytes)
+        parts = [f"{UPLOADS_PREFIX}/{token}/{i:05d}" for i in range(len(offsets))]
+
+        def put_part(part: str, offset: int):
+            with open(local_path, "rb") as f:
+                f.seek(offset)
+                self.client.put(bucket, part, f.read(part_bytes))
+
+        created = list(parts)
+        try:
+            list(_part_pool().map(put_part, parts, offsets))
+            created += self._compose(bucket, name, parts)
+        finally:
+            list(_part_pool().map(lambda part: self.client.delete(bucket, part), created))
+
+    def download(self, path: str, local_path: str):
+        """Downloads an object with parallel ranged reads; the local file appears once complete."""
+        bucket, name = self._split(path)
+        found = self.client.stat(bucket, name)
+        if found is None:
+            raise FileNotFoundError(path)
+        size = found[0]
+        os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+        tmp_path = f"{local_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.truncate(size)
+        part_bytes = _part_bytes()
+
+        def get_part(offset: int):
+            data = self.client.get(bucket, name, offset, min(size, offset + part_bytes))
+            with open(tmp_path, "r+b") as f:
+                f.seek(offset)
+                f.write(data)
+
+        try:
+            list(_part_pool().map(get_part, range(0, size, part_bytes)))
+            os.replace(tmp_path, local_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def arrow_filesystem(self, path: str) -> Tuple["pafs.FileSystem", str]:
+        """(pyarrow filesystem, path) for pyarrow readers and writers."""
+        bucket, name = self._split(path)
+        return self.client.arrow_filesystem(), f"{bucket}/{name}".rstrip("/")
+
+
+class GcsClient:
+    """Bucket client on google-cloud-storage (imported on first use)."""
+
+    def __init__(self):
+        from google.cloud import storage
+        self._client = storage.Client()
+        self._buckets = {}
+
+    def _bucket(self, bucket: str):
+        if bucket not in self._buckets:
+            self._buckets[bucket] = self._client.bucket(bucket)
+        return self._buckets[bucket]
+
+    def list(self, bucket: str, prefix: str, delimiter: Optional[str], token: Optional[str], page_size: int):
+        blobs = self._client.list_blobs(bucket, prefix=prefix, delimiter=delimiter, page_token=token,
+                                        page_size=page_size)
+        page = next(blobs.pages, None)
+        if page is None:
+            return [], [], None
+        entries = [(blob.name, blob.size, int(blob.updated.timestamp() * 1e9)) for blob in page]
+        return entries, sorted(page.prefixes), blobs.next_page_token
+
+    def stat(self, bucket: str, name: str) -> Optional[Tuple[int, int]]:
+        blob = self._bucket(bucket).get_blob(name)
+        return None if blob is None else (blob.size, int(blob.updated.timestamp() * 1e9))
+
+    def get(self, bucket: str, name: str, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        # end is exclusive here, inclusive in the GCS API
+        return self._bucket(bucket).blob(name).download_as_bytes(
+            start=start, end=None if end is None else end - 1)
+
+    def put(self, bucket: str, name: str, data: bytes):
+        self._bucket(bucket).blob(name).upload_from_string(data)
+
+    def compose(self, bucket: str, name: str, sources: List[str]):
+        target = self._bucket(bucket)
+        target.blob(name).compose([target.blob(source) for source in sources])
+
+    def copy(self, bucket: str, name: str, dst_bucket: str, dst_name: str):
+        source = self._bucket(bucket)
+        source.copy_blob(source.blob(name), self._bucket(dst_bucket), dst_name)
+
+    def makedirs(self, bucket: str, name: str):
+        """GCS has no directories."""
+
+    def delete(self, bucket: str, name: str):
+        from google.api_core.exceptions import NotFound
+        try:
+            self._bucket(bucket).delete_blob(name)
+        except NotFound:
+            pass
+
+    def arrow_filesystem(self) -> "pafs.FileSystem":
+        import pyarrow.fs as pafs
+        return pafs.GcsFileSystem()
+
+
+class GcsEmulator:
+    """
+    Directory-backed stand-in for GCS (storage.gcs_emulator_dir), for tests and
+    benchmarks: the object gs://<bucket>/<name> is the file <root>/<bucket>/<name>.
+    It keeps the object semantics the pipeline relies on: objects appear atomically
+    once written, listings are paged by name prefix (with a delimiter for one level),
+    and emptied "directories" disappear. `latency` seconds are added to every request
+    to model a remote store; `requests` counts them per kind.
+    """
+
+    def __init__(self, root: str, latency: float = 0.0):
+        self.root = root
+        self.latency = latency
+        self.requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _request(self, kind: str):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _path(self, bucket: str, name: str) -> str:
+        return os.path.join(self.root, bucket, *name.split("/"))
+
+    def _publish(self, bucket: str, name: str, write):
+        """Writes through a temporary file outside the bucket, then moves it into place."""
+        staging = os.path.join(self.root, ".staging")
+        os.makedirs(staging, exist_ok=True)
+        tmp_path = os.path.join(staging, uuid.uuid4().hex)
+        with open(tmp_path, "wb") as f:
+            write(f)
+        path = self._path(bucket, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+
+    def _names(self, bucket: str, prefix: str) -> List[str]:
+        root = os.path.join(self.root, bucket)
+        names = []
+        for directory, dirs, files in os.walk(root):
+            relative = os.path.relpath(directory, root).replace(os.sep, "/")
+            base = "" if relative == "." else f"{relative}/"
+            names.extend(base + name for name in files if (base + name).startswith(prefix))
+        return sorted(names)
+
+    def list(self, bucket: str, prefix: str, delimiter: Optional[str], token: Optional[str], page_size: int):
+        self._request("list")
+        blobs, prefixes = [], []
+        for name in self._names(bucket, prefix):
+            if token is not None and name <= token:
+                continue
+            rest = name[len(prefix):]
+            if delimiter and delimiter in rest:
+                sub = prefix + rest.split(delimiter, 1)[0] + delimiter
+                if prefixes and prefixes[-1] == sub:
+                    continue
+                prefixes.append(sub)
+                last = sub + "\U0010ffff"          # resume after every name under the prefix
+            else:
+                stat = os.stat(self._path(bucket, name))
+                blobs.append((name, stat.st_size, stat.st_mtime_ns))
+                last = name
+            if len(blobs) + len(prefixes) == page_size:
+                return blobs, prefixes, last
+        return blobs, prefixes, None
+
+    def stat(self, bucket: str, name: str) -> Optional[Tuple[int, int]]:
+        self._request("stat")
+        path = self._path(bucket, name)
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, bucket: str, name: str, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        self._request("get")
+        with open(self._path(bucket, name), "rb") as f:
+            f.seek(start or 0)
+            return f.read() if end is None else f.read(end - (start or 0))
+
+    def put(self, bucket: str, name: str, data: bytes):
+        self._request("put")
+        self._publish(bucket, name, lambda f: f.write(data))
+
+    def compose(self, bucket: str, name: str, sources: List[str]):
+        self._request("compose")
+        if len(sources) > COMPOSE_LIMIT:
+            raise ValueError(f"compose takes at most {COMPOSE_LIMIT} sources, got {len(sources)}")
+
+        def write(f):
+            for source in sources:
+                with open(self._path(bucket, source), "rb") as part:
+                    shutil.copyfileobj(part, f)
+        self._publish(bucket, name, write)
+
+    def copy(self, bucket: str, name: str, dst_bucket: str, dst_name: str):
+        self._request("copy")
+        with open(self._path(bucket, name), "rb") as source:
+            self._publish(dst_bucket, dst_name, lambda f: shutil.copyfileobj(source, f))
+
+    def makedirs(self, bucket: str, name: str):
+        """Parent directories for writers that go through `arrow_filesystem` (no object until a file lands)."""
+        os.makedirs(self._path(bucket, name), exist_ok=True)
+
+    def delete(self, bucket: str, name: str):
+        self._request("delete")
+        path = self._path(bucket, name)
+        if os.path.isfile(path):
+            os.remove(path)
+        # No empty "directories" in an object store
+        directory, bucket_root = os.path.dirname(path), os.path.join(self.root, bucket)
+        while directory != bucket_root:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+    def arrow_filesystem(self) -> "pafs.FileSystem":
+        import pyarrow.fs as pafs
+        return pafs.SubTreeFileSystem(os.path.abspath(self.root), pafs.LocalFileSystem())
+
+
+_STORAGES: Dict[str, Union[LocalStorage, ObjectStorage]] = {}
+_STORAGES_LOCK = threading.Lock()
+
+
+def storage_for(path: str) -> Union[LocalStorage, ObjectStorage]:
+    """The storage of a path: gs:// paths go to GCS (or to storage.gcs_emulator_dir), others are local."""
+    key = "local" if not is_remote(path) else settings.storage.gcs_emulator_dir or GCS_SCHEME
+    with _STORAGES_LOCK:
+        if key not in _STORAGES:
+            if key == "local":
+                _STORAGES[key] = LocalStorage()
+            elif settings.storage.gcs_emulator_dir:
+                _STORAGES[key] = ObjectStorage(GcsEmulator(settings.storage.gcs_emulator_dir,
+                                                           settings.storage.gcs_emulator_latency_ms / 1000))
+            else:
+                _STORAGES[key] = ObjectStorage(GcsClient())
+        return _STORAGES[key]
+
+
+def require_local(path: str, what: str) -> str:
+    """Fails early for data kept with renames or memory maps, which object storage does not offer."""
+    if is_remote(path):
+        raise ValueError(f"{what} must be on a local or mounted filesystem, not {path}")
+    return path
+
+
+def commit(directory: str, files: Dict[str, int]):
+    """Marks `directory` complete: COMMIT_MARKER lists its files (relative path -> bytes), written atomically."""
+    marker = {"committed_at": datetime.now(timezone.utc).isoformat(), "files": files}
+    storage_for(directory).write_bytes(os.path.join(directory, COMMIT_MARKER),
+                                       json.dumps(marker, sort_keys=True).encode())
+
+
+def committed_files(directory: str) -> Optional[Dict[str, int]]:
+    """Files of a committed directory, or None while it has no COMMIT_MARKER."""
+    storage = storage_for(directory)
+    marker = os.path.join(directory, COMMIT_MARKER)
+    if not storage.isfile(marker):
+        return None
+    return json.loads(storage.read_bytes(marker))["files"]
+
+
+def _copy_file(source: str, destination: str):
+    src, dst = storage_for(source), storage_for(destination)
+    if src is dst:
+        src.copy(source, destination)
+    elif is_remote(destination):
+        dst.upload(source, destination)
+    else:
+        src.download(source, destination)
+
+
+def transfer(source: str, destination: str, workers: Optional[int] = None, commit_marker: bool = True) -> Dict[str, int]:
+    """
+    Copies a file, or a directory tree, between local paths and gs:// (either way,
+    or within one store), with storage.max_workers files in flight and large files
+    split into parallel parts. A copied directory gets a COMMIT_MARKER listing its
+    files, written last. Returns the number of files and bytes copied.
+    """
+    started = time.perf_counter()
+    src = storage_for(source)
+    single = src.isfile(source)
+    base = len(source.rstrip("/")) + 1
+    if single:
+        files = [(source, destination, src.stat(source).size)]
+    else:
+        files = [(info.path, os.path.join(destination, info.path[base:]), info.size)
+                 for info in src.list_files(source) if os.path.basename(info.path) != COMMIT_MARKER]
+    with ThreadPoolExecutor(max_workers=workers or settings.storage.max_workers,
+                            thread_name_prefix="storage-file") as pool:
+        list(pool.map(lambda item: _copy_file(item[0], item[1]), files))
+    if commit_marker and not single:
+        commit(destination, {path[base:]: size for path, _, size in files})
+
+    total = sum(size for _, _, size in files)
+    elapsed = time.perf_counter() - started
+    logger.info(f"Transferred {len(files)} file(s), {total / 2**20:.1f} MB, {source} -> {destination} "
+                f"in {elapsed:.2f}s ({total / 2**20 / max(elapsed, 1e-9):.1f} MB/s)")
+    return {"files": len(files), "bytes": total}
+
+
+@contextlib.contextmanager
+def local_file(path: str) -> Iterator[str]:
+    """
+    A local path to read `path` from: the path itself, or a parallel download to a
+    temporary file that is removed when the block exits.
+
+        with local_file("gs://bucket/raw/transactions_20240101.csv") as path:
+            pd.read_csv(path)
+    """
+    if not is_remote(path):
+        yield path
+        return
+    directory = tempfile.mkdtemp(prefix="storage-")
+    try:
+        local_path = os.path.join(directory, os.path.basename(path))
+        storage_for(path).download(path, local_path)
+        yield local_path
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class StagedOutput:
+    """
+    A local directory to write output files into, published to `destination` when
+    the block exits without error, so readers (e.g. a stream watching the landing
+    zone) never see a partly written file: a hidden directory inside a local
+    `destination` whose files are renamed into place, or a temporary directory whose
+    files are uploaded in parallel to a gs:// `destination`. It is removed after.
+
+        with StagedOutput("gs://bucket/raw") as staging:
+            write(os.path.join(staging.directory, name))
+        published = staging.target(os.path.join(staging.directory, name))
+    """
+
+    def __init__(self, destination: str):
+        self.destination = destination
+        self.directory = destination
+
+    def target(self, local_path: str) -> str:
+        """Where a file written under `directory` is published."""
+        return os.path.join(self.destination, os.path.relpath(local_path, self.directory))
+
+    def __enter__(self) -> "StagedOutput":
+        if is_remote(self.destination):
+            self.directory = tempfile.mkdtemp(prefix="storage-staged-")
+        else:
+            # Same filesystem as the destination, so publishing is a rename
+            os.makedirs(self.destination, exist_ok=True)
+            self.directory = tempfile.mkdtemp(prefix=".staging-", dir=self.destination)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None and is_remote(self.destination):
+                transfer(self.directory, self.destination, commit_marker=False)
+            elif exc_type is None:
+                for info in list(LocalStorage().list_files(self.directory)):
+                    target = self.target(info.path)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(info.path, target)
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel copies between local paths and gs://")
+    parser.add_argument("source")
+    parser.add_argument("destination")
+    parser.add_argument("--workers", type=int, help="files in flight (default: storage.max_workers)")
+    parser.add_argument("--no-commit", action="store_true", help="do not write the commit marker")
+    args = parser.parse_args()
+    print(transfer(args.source, args.destination, args.workers, commit_marker=not args.no_commit))
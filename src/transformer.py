@@ -1,23 +1,97 @@
 import os
-import logging
+import uuid
+import shutil
+from datetime import date, datetime, time, timedelta
+from urllib.parse import unquote
+from functools import reduce
+from itertools import chain
 from src.patches import apply_spark_patches
 apply_spark_patches()
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, to_date, year, month, dayofmonth, sha2, pandas_udf
-from pyspark.sql.types import StringType
+from typing import Dict, Iterator, List, Optional, Union
+from pyspark import StorageLevel
+from pyspark.sql import Column, DataFrame, SparkSession
+from pyspark.sql.functions import col, to_date, year, month, dayofmonth, pandas_udf, \
+    create_map, element_at, input_file_name, lit, split
+from pyspark.sql.types import StringType, DoubleType, TimestampType, StructType, StructField
+import numpy as np
 import pandas as pd
-from src.config_loader import settings
-from src.security import SecurityManager
-
-# Configure logging
-LOG_DIR = settings.paths.logs
-os.makedirs(LOG_DIR, exist_ok=True)
-logger = logging.getLogger("TransformerModule")
-if not logger.handlers:
-    handler = logging.FileHandler(os.path.join(LOG_DIR, "transformer.log"))
-    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-    logger.addHandler(handler)
-    logger.setLevel(logging.INFO)
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from src.log_utils import get_module_logger
+from src.config_loader import settings, pipeline_config
+from src.dlq import PARTITION_COLUMNS, RAW_TEXT_PREFIX, dlq_root, record_clean_runs, spark_dlq_frame, write_dlq
+from src.gold_state import GoldState, silver_fingerprint
+from src.gold_tables import drop_legacy_partitions, gold_layout, gold_tables, partition_dir, silver_columns, \
+    spark_aggregate, table_dir
+from src.ingestion import batch_format, execution_date_from_path
+from src.metrics import new_run_id
+from src.quality_rules import MASK_COLUMN, REASON_COLUMN, compile_rules
+from src.security import SecurityManager, encrypt_pan_batch
+from src.silver_table import batch_stem, cluster_spark, publish_batch, table_root
+from src.storage import storage_for
+
+# Configure logging (the log file is created on first write)
+logger = get_module_logger("TransformerModule", "transformer.log")
+
+# Schema registry types (pipeline_config.yaml) -> Spark SQL types
+SPARK_TYPES = {
+    "uuid": StringType(),
+    "string": StringType(),
+    "double": DoubleType(),
+    "iso8601": TimestampType(),
+}
+
+# Source batch file of each row when several batches are ingested together
+BATCH_COLUMN = "_batch"
+
+def raw_spark_schema(typed_timestamps: bool = True) -> StructType:
+    """
+    Builds the explicit Spark schema of the raw layer from the schema registry. With
+    `typed_timestamps=False` timestamps are read as text (see with_typed_timestamps).
+    """
+    return StructType([
+        StructField(column.name,
+                    StringType() if column.type == "iso8601" and not typed_timestamps else SPARK_TYPES[column.type],
+                    nullable=True)
+        for column in pipeline_config.schema_.raw.columns
+    ])
+
+def with_typed_timestamps(raw: DataFrame) -> DataFrame:
+    """
+    Types the timestamp columns of raw rows read as text, keeping each value as it
+    arrived in RAW_TEXT_PREFIX + column: a malformed timestamp becomes null, fails
+    its parse rule (spark_failure_mask) and is quarantined with its original text.
+    """
+    for column in pipeline_config.schema_.raw.columns:
+        if column.type == "iso8601":
+            raw = raw.withColumn(RAW_TEXT_PREFIX + column.name, col(column.name)) \
+                     .withColumn(column.name, col(column.name).cast(TimestampType()))
+    return raw
+
+def raw_text_columns(df: DataFrame) -> List[str]:
+    return [name for name in df.columns if name.startswith(RAW_TEXT_PREFIX)]
+
+def batch_file_column() -> Column:
+    """File name of each row's source batch (URI-encoded, as input_file_name())."""
+    return element_at(split(input_file_name(), "/"), -1)
+
+def build_spark_session(extra_conf: Optional[Dict[str, str]] = None) -> SparkSession:
+    """Creates (or returns the active) SparkSession tuned from settings."""
+    # Instruction 3: Spark Tuning from Config & Enable Arrow
+    builder = SparkSession.builder \
+        .appName(settings.spark.app_name) \
+        .config("spark.driver.memory", settings.spark.driver_memory) \
+        .config("spark.executor.memory", settings.spark.executor_memory) \
+        .config("spark.executor.cores", settings.spark.executor_cores) \
+        .config("spark.sql.shuffle.partitions", settings.spark.shuffle_partitions) \
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
+        .config("spark.sql.parquet.outputTimestampType", "TIMESTAMP_MICROS")
+    for key, value in {**settings.spark.extra_conf, **(extra_conf or {})}.items():
+        builder = builder.config(key, value)
+    spark = builder.getOrCreate()
+    logger.info("Spark Session initialized successfully.")
+    return spark
 
 class BankingTransformer:
     """
@@ -25,86 +99,359 @@ class BankingTransformer:
     Implements security (GDPR), Arrow-Vectorized UDFs, and Quarantine handling.
     """
     
-    def __init__(self):
+    def __init__(self, spark: Optional[SparkSession] = None):
+        """
+        Uses the given (shared, long-lived) session if provided; otherwise builds its
+        own session, which close() then stops.
+        """
         self.security = SecurityManager()
-        
-        # Instruction 3: Spark Tuning from Config & Enable Arrow
-        self.spark = SparkSession.builder \
-            .appName(settings.spark.app_name) \
-            .config("spark.driver.memory", settings.spark.driver_memory) \
-            .config("spark.executor.memory", settings.spark.executor_memory) \
-            .config("spark.executor.cores", settings.spark.executor_cores) \
-            .config("spark.sql.shuffle.partitions", settings.spark.shuffle_partitions) \
-            .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
-            .getOrCreate()
-        logger.info("Spark Session initialized successfully.")
-
-    def handle_quarantine(self, df_invalid: pd.DataFrame, execution_date: str):
-        """Saves invalid records to the quarantine directory (Instruction 2)."""
+        self.rules = compile_rules()
+        self._broadcast_key = None
+        self._broadcast_hash_key = None
+        self._owns_session = spark is None
+        self.spark = spark if spark is not None else build_spark_session()
+
+    def handle_quarantine(self, df_invalid: pd.DataFrame, execution_date: str, batch_key: str,
+                          run_id: Optional[str] = None):
+        """
+        Appends invalid records to the partitioned Parquet DLQ (Instruction 2), tagged
+        with the batch and the run (see src/dlq.py). A streamed batch calls this once
+        per chunk with the same `run_id`.
+        """
         if df_invalid.empty:
             return
-            
-        quarantine_dir = os.path.join(settings.paths.quarantine, execution_date)
-        os.makedirs(quarantine_dir, exist_ok=True)
-        
-        output_path = os.path.join(quarantine_dir, "invalid_records.csv")
-        df_invalid.to_csv(output_path, index=False)
-        logger.warning(f"DLQ: Saved {len(df_invalid)} invalid records to {output_path}")
+        written = write_dlq(df_invalid, execution_date, batch_key, run_id or new_run_id())
+        logger.warning(f"DLQ: Saved {written} invalid records of {batch_key} to {dlq_root()}")
+
+    def read_raw(self, path: Union[str, List[str]]) -> DataFrame:
+        """
+        Reads a raw CSV or bronze Parquet batch (or several of the same format)
+        directly into Spark with the explicit registry schema: no driver-side parsing
+        and no schema inference.
+        """
+        paths = [path] if isinstance(path, str) else list(path)
+        formats = {batch_format(p) for p in paths}
+        if len(formats) > 1:
+            return reduce(lambda left, right: left.unionByName(right, allowMissingColumns=True),
+                          [self.read_raw([p for p in paths if batch_format(p) == fmt]) for fmt in sorted(formats)])
+        fmt = formats.pop()
+        if fmt == "parquet":
+            return self.spark.read.schema(raw_spark_schema()).parquet(*paths)
+        if fmt == "csv":
+            # Timestamps are parsed after the read, so their raw text is still there for the DLQ
+            return with_typed_timestamps(self.spark.read.schema(raw_spark_schema(typed_timestamps=False))
+                                         .option("header", "true").option("mode", "PERMISSIVE").csv(paths))
+        raise ValueError(f"Spark cannot read {fmt} batches directly; write bronze as parquet: {paths}")
+
+    def ingest_to_silver(self, batch_path: str, execution_date: str, run_id: Optional[str] = None) -> Optional[str]:
+        """
+        Distributed ingestion: reads the batch on the executors, splits it with the
+        quarantine predicates as column expressions, writes invalid rows to the DLQ and
+        secured valid rows to silver. Only the two split counts reach the driver.
+        Returns the silver path, or None if the batch had no valid records.
+        """
+        logger.info(f"Spark: Native ingestion of {batch_path}")
+        # Same compiled rule registry as DataQualityManager, as one bit-mask expression
+        batch_key = os.path.basename(batch_path)
+        raw = self.read_raw(batch_path)
+        flagged = raw.withColumn(MASK_COLUMN, self.rules.spark_failure_mask(batch_key, raw.columns))
+        flagged = flagged.withColumn("_is_valid", col(MASK_COLUMN) == 0)
+        flagged.persist(StorageLevel.MEMORY_AND_DISK)
+        try:
+            counts = {row["_is_valid"]: row["count"] for row in flagged.groupBy("_is_valid").count().collect()}
+            valid_count, invalid_count = counts.get(True, 0), counts.get(False, 0)
+
+            if invalid_count:
+                invalid = flagged.filter(~col("_is_valid")) \
+                    .withColumn(REASON_COLUMN, self.rules.spark_reason_codes(col(MASK_COLUMN)))
+                self._append_dlq(spark_dlq_frame(invalid, execution_date, batch_key, run_id or new_run_id()))
+                logger.warning(f"DLQ: Saved {invalid_count} invalid records of {batch_key} to {dlq_root()}")
+            else:
+                record_clean_runs({batch_key: execution_date}, run_id or new_run_id())
+
+            if not valid_count:
+                return None
+            df_valid = flagged.filter(col("_is_valid")).drop("_is_valid", MASK_COLUMN, *raw_text_columns(flagged))
+            logger.info(f"Spark: Securing {valid_count} valid records...")
+            silver_path = self._publish_silver(self._secure(df_valid), batch_key, valid_count,
+                                               execution_date=execution_date)
+            # Accepted ids go to the duplicate index only once silver is published
+            self._record_accepted(df_valid.withColumn(BATCH_COLUMN, lit(batch_key)), {batch_key: batch_key})
+            return silver_path
+        finally:
+            flagged.unpersist()
+
+    def _record_accepted(self, df_valid: DataFrame, batches: Dict[str, str]):
+        """
+        Adds the ids of published rows to the duplicate indexes without collecting
+        them: the executors hash them (spark_id_hashes) into Parquet, partitioned by
+        BATCH_COLUMN, and the driver merges each batch's hashes into the index.
+        `batches` maps batch file name -> its value in BATCH_COLUMN.
+        """
+        if not self.rules.unique_columns or not batches:
+            return
+        ids_dir = os.path.join(table_root(), f"_ids-{uuid.uuid4().hex[:8]}")
+        try:
+            df_valid.select(BATCH_COLUMN, *self.rules.spark_id_hashes()) \
+                .write.partitionBy(BATCH_COLUMN).parquet(ids_dir)
+            partitioning = ds.partitioning(pa.schema([(BATCH_COLUMN, pa.string())]), flavor="hive")
+            # The partition directories start with "_" (BATCH_COLUMN): only Spark's markers are skipped
+            dataset = ds.dataset(ids_dir, format="parquet", partitioning=partitioning, ignore_prefixes=[".", "_SUCCESS"])
+            for key, value in sorted(batches.items()):
+                ids = dataset.to_table(columns=self.rules.unique_columns, filter=pc.field(BATCH_COLUMN) == value)
+                self.rules.record_hashes({column: ids.column(column).to_numpy().view(np.uint64)
+                                          for column in self.rules.unique_columns}, key)
+        finally:
+            shutil.rmtree(ids_dir, ignore_errors=True)
+
+    def ingest_batches_to_silver(self, batches: Dict[str, str], run_id: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """
+        Backfill ingestion of several batch files (path -> execution date) in one
+        Spark read: the quarantine split, the DLQ and the secured silver rows of all
+        batches are computed and written by the same jobs. Each batch's files land in
+        its date partition of the silver table, as by ingest_to_silver, so re-running
+        one date on its own replaces exactly that batch's files (and supersedes its
+        DLQ rows). Returns path -> silver partition (None for a batch without valid
+        records).
+        """
+        by_key = {os.path.basename(path): path for path in batches}
+        logger.info(f"Spark: Native ingestion of {len(by_key)} batch(es) in one pass")
+        raw = self.read_raw(sorted(batches)).withColumn(BATCH_COLUMN, batch_file_column())
+        silver_paths = self.ingest_frame_to_silver(raw, {key: batches[path] for key, path in by_key.items()}, run_id)
+        return {path: silver_paths[key] for key, path in by_key.items()}
+
+    def ingest_frame_to_silver(self, raw: DataFrame, execution_dates: Optional[Dict[str, str]] = None,
+                               run_id: Optional[str] = None) -> Dict[str, Optional[str]]:
+        """
+        ingest_batches_to_silver over raw rows already read, with their batch file in
+        BATCH_COLUMN (batch_file_column()), e.g. a Structured Streaming micro-batch.
+        `execution_dates` maps batch file name -> execution date; batches not in it
+        take the date in their name. Returns batch file name -> silver partition.
+        """
+        flagged = raw.withColumn(MASK_COLUMN, self.rules.spark_failure_mask(col(BATCH_COLUMN), raw.columns))
+        flagged = flagged.withColumn("_is_valid", col(MASK_COLUMN) == 0)
+        flagged.persist(StorageLevel.MEMORY_AND_DISK)
+        staging = os.path.join(table_root(), f"_backfill-{uuid.uuid4().hex[:8]}")
+        try:
+            # input_file_name() is URI-encoded: file name -> value in the partition directories
+            counts: Dict[str, Dict[bool, int]] = {key: {} for key in execution_dates or {}}
+            partition_values: Dict[str, str] = {}
+            for row in flagged.groupBy(BATCH_COLUMN, "_is_valid").count().collect():
+                partition_values[unquote(row[BATCH_COLUMN])] = row[BATCH_COLUMN]
+                counts.setdefault(unquote(row[BATCH_COLUMN]), {})[row["_is_valid"]] = row["count"]
+            dates = {key: (execution_dates or {}).get(key) or execution_date_from_path(key) for key in counts}
+
+            if any(c.get(False) for c in counts.values()):
+                # One DLQ append for all batches: raw file name -> batch name / execution date
+                names = create_map(*chain.from_iterable((lit(value), lit(key)) for key, value in partition_values.items()))
+                date_map = create_map(*chain.from_iterable((lit(value), lit(dates[key]))
+                                                           for key, value in partition_values.items()))
+                invalid = flagged.filter(~col("_is_valid")) \
+                    .withColumn(REASON_COLUMN, self.rules.spark_reason_codes(col(MASK_COLUMN)))
+                self._append_dlq(spark_dlq_frame(invalid, date_map[col(BATCH_COLUMN)], names[col(BATCH_COLUMN)],
+                                                 run_id or new_run_id()))
+            record_clean_runs({key: dates[key] for key in counts if not counts[key].get(False)}, run_id or new_run_id())
+            df_valid = flagged.filter(col("_is_valid")).drop("_is_valid", MASK_COLUMN, *raw_text_columns(flagged))
+            valid_total = sum(c.get(True, 0) for c in counts.values())
+            if valid_total:
+                clustered, options = cluster_spark(self._secure(df_valid), valid_total, keys=[BATCH_COLUMN])
+                clustered.write.options(**options).partitionBy(BATCH_COLUMN).parquet(os.path.join(staging, "silver"))
 
-    def transform_to_silver(self, df_valid: pd.DataFrame, filename: str) -> str:
-        """Applies security transformations using Vectorized (Pandas) UDFs."""
+            silver_paths: Dict[str, Optional[str]] = {}
+            for key in counts:
+                if counts[key].get(False):
+                    logger.warning(f"DLQ: Saved {counts[key][False]} invalid records of {key} to {dlq_root()}")
+                silver_paths[key] = None
+                if counts[key].get(True):
+                    silver_path = publish_batch(os.path.join(staging, "silver", f"{BATCH_COLUMN}={partition_values[key]}"),
+                                                dates[key], batch_stem(key))
+                    silver_paths[key] = silver_path
+                    logger.info(f"Silver layer published: {silver_path} ({counts[key][True]} records of {key})")
+
+            self._record_accepted(df_valid, {key: partition_values[key] for key in counts if counts[key].get(True)})
+            return silver_paths
+        finally:
+            flagged.unpersist()
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @staticmethod
+    def _append_dlq(df_dlq: DataFrame):
+        """Appends to the partitioned Parquet DLQ; existing files are never rewritten."""
+        df_dlq.write.mode("append").partitionBy(*PARTITION_COLUMNS).parquet(dlq_root())
+
+    def transform_to_silver(self, df_valid: pd.DataFrame, filename: str, mode: str = "overwrite",
+                            execution_date: Optional[str] = None) -> str:
+        """
+        Applies security transformations using Vectorized (Pandas) UDFs.
+        `mode="append"` adds the records to the batch's silver files (used for
+        streamed chunks). The date partition defaults to the one in the batch name.
+        """
         logger.info(f"Spark: Vectorizing security logic for {len(df_valid)} records...")
         
         spark_df = self.spark.createDataFrame(df_valid)
-        
+        # Typed timestamps in every silver file (min/max statistics, one schema per partition)
+        spark_df = spark_df.withColumn("timestamp", col("timestamp").cast(TimestampType()))
+        return self._publish_silver(self._secure(spark_df), filename, len(df_valid), mode, execution_date)
+
+    def _secure(self, spark_df: DataFrame) -> DataFrame:
+        """Hashes the email, encrypts the PAN and drops the raw PII columns."""
         # Instruction 3: Vectorized Hashing (Native) and Encryption (Pandas UDF)
-        spark_df = spark_df.withColumn("email_hashed", sha2(col("email"), 256))
+        pseudonymizer = self.security.pseudonymizer
+        spark_df = spark_df.withColumn("email_hashed", pseudonymizer.spark_column("email", self._hash_key_broadcast()))
         
+        # Only the broadcast key travels with the UDF; each Python worker builds its
+        # Fernet once (process-wide cache) and reuses it for every Arrow batch
+        key_broadcast = self._key_broadcast()
+
         @pandas_udf(StringType())
-        def encrypt_pan_series(pan_series: pd.Series) -> pd.Series:
-            return pan_series.apply(self.security.encrypt_pan)
+        def encrypt_pan_series(pan_batches: Iterator[pd.Series]) -> Iterator[pd.Series]:
+            key = key_broadcast.value
+            for pan_series in pan_batches:
+                yield encrypt_pan_batch(pan_series, key)
         
         spark_df = spark_df.withColumn("pan_encrypted", encrypt_pan_series(col("pan")))
         
         # GDPR Minimization: Drop raw PII
-        df_silver = spark_df.drop("email", "pan")
-        
-        silver_dir = settings.paths.silver
-        os.makedirs(silver_dir, exist_ok=True)
-        silver_file = filename.replace(".csv", "_silver.parquet")
-        silver_path = os.path.join(silver_dir, silver_file)
-        
-        df_silver.write.mode("overwrite").parquet(silver_path)
-        logger.info(f"Silver layer published: {silver_path}")
+        return spark_df.drop("email", "pan")
+
+    def _key_broadcast(self):
+        """Broadcasts the encryption key once per session instead of pickling it into every task."""
+        if self._broadcast_key is None:
+            self._broadcast_key = self.spark.sparkContext.broadcast(self.security.key)
+        return self._broadcast_key
+
+    def _hash_key_broadcast(self):
+        """Broadcasts the HMAC pseudonymization key once per session (None in sha256 mode)."""
+        if self._broadcast_hash_key is None and self.security.pseudonymizer.keyed:
+            self._broadcast_hash_key = self.spark.sparkContext.broadcast(self.security.pseudonymizer.key)
+        return self._broadcast_hash_key
+
+    def _publish_silver(self, df_silver: DataFrame, filename: str, rows: int, mode: str = "overwrite",
+                        execution_date: Optional[str] = None) -> str:
+        """
+        Writes a secured DataFrame as the batch's files in its date partition of the
+        silver table, clustered on silver.cluster_by in target-size files. Returns the
+        partition path.
+        """
+        execution_date = execution_date or execution_date_from_path(filename)
+        staging = os.path.join(table_root(), f"_staging-{uuid.uuid4().hex[:8]}")
+        try:
+            clustered, options = cluster_spark(df_silver, rows)
+            clustered.write.options(**options).parquet(staging)
+            silver_path = publish_batch(staging, execution_date, batch_stem(filename), replace=mode != "append")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        logger.info(f"Silver layer published: {silver_path} ({filename})")
         return silver_path
 
-    def silver_to_gold(self, silver_path: str):
-        """Distributed aggregation to Gold layer."""
-        logger.info("Spark: Processing Gold Aggregations...")
+    def _read_silver_for_gold(self, silver_paths: List[str]) -> DataFrame:
+        """
+        Reads the columns Gold needs from several silver inputs. Inputs from the pandas
+        path store the timestamp as an ISO string, so it is normalized before the union.
+        """
+        columns = [col(name) for name in silver_columns() if name != "timestamp"]
+        frames = [
+            self.spark.read.parquet(path).select(*columns, col("timestamp").cast(TimestampType()).alias("timestamp"))
+            for path in silver_paths
+        ]
+        return reduce(DataFrame.unionByName, frames)
+
+    def silver_to_gold(self, silver_paths: Union[str, List[str]]):
+        """
+        Incremental, partition-scoped aggregation to the Gold tables (gold.tables).
         
-        spark_df = self.spark.read.parquet(silver_path)
+        Only the dates present in the new silver input(s) are recomputed, from every
+        silver input already known to contribute to them, and written with dynamic
+        partition overwrite so all other year/month/day partitions are left untouched.
+        The silver rows are read once and cached; every table is aggregated from that
+        cache. A state record in the Gold directory tracks which inputs are already
+        folded in, and the table layout: Gold written with another one has every
+        folded date rebuilt.
+        """
+        logger.info("Spark: Processing Gold Aggregations...")
+        if isinstance(silver_paths, str):
+            silver_paths = [silver_paths]
+
+        gold_dir = settings.paths.gold
+        state = GoldState(gold_dir)
+        fingerprints = {path: silver_fingerprint(path) for path in silver_paths}
+        new_inputs = [path for path in silver_paths if not state.is_folded(path, fingerprints[path])]
+        layout = gold_layout()
+        stale = state.stale_dates(layout)
+        if not new_inputs and not stale:
+            logger.info("Gold: silver input already folded in, nothing to do.")
+            return gold_dir
+        if stale:
+            logger.warning(f"Gold: table layout changed; rebuilding {len(stale)} folded date(s) from silver.")
+
+        # Dates each new input contributes to (one small distinct query, not a collect of data)
+        new_dates = {}
+        for path in new_inputs:
+            dates_df = self._read_silver_for_gold([path]).select(to_date(col("timestamp")).alias("date")).distinct()
+            new_dates[path] = {row["date"].isoformat() for row in dates_df.collect() if row["date"] is not None}
+
+        # A re-run input may have moved away from dates it used to contribute to
+        affected = set().union(stale, *new_dates.values(), *(state.dates_of(path) for path in new_inputs))
+        sources = sorted((set(state.sources_for(affected)) | set(new_inputs)))
+        for path in [p for p in sources if not os.path.exists(p)]:
+            logger.warning(f"Gold: silver input {path} no longer exists; dropping it from the state.")
+            state.forget(path)
+            sources.remove(path)
+        if stale:
+            drop_legacy_partitions(gold_dir, state.stale_dates(layout))
+        logger.info(f"Gold: recomputing {len(affected)} partition(s) from {len(sources)} silver input(s).")
+
+        # The timestamp range is pushed down to the Parquet scan: row groups outside it are skipped
+        first, last = date.fromisoformat(min(affected)), date.fromisoformat(max(affected))
+        spark_df = self._read_silver_for_gold(sources) \
+            .filter((col("timestamp") >= lit(datetime.combine(first, time.min))) &
+                    (col("timestamp") < lit(datetime.combine(last + timedelta(days=1), time.min)))) \
+            .withColumn("date", to_date(col("timestamp"))) \
+            .filter(col("date").isin(sorted(affected)))
         
-        spark_df = spark_df.withColumn("date", to_date(col("timestamp"))) \
-                           .withColumn("year", year(col("timestamp"))) \
+        spark_df = spark_df.withColumn("year", year(col("timestamp"))) \
                            .withColumn("month", month(col("timestamp"))) \
                            .withColumn("day", dayofmonth(col("timestamp")))
         
-        gold_df = spark_df.groupBy("date", "currency", "year", "month", "day") \
-                          .agg({"amount": "sum", "transaction_id": "count"}) \
-                          .withColumnRenamed("sum(amount)", "total_amount") \
-                          .withColumnRenamed("count(transaction_id)", "tx_count")
-        
-        gold_dir = settings.paths.gold
-        os.makedirs(gold_dir, exist_ok=True)
-        
-        (gold_df.write
-            .mode("overwrite")
-            .partitionBy("year", "month", "day")
-            .parquet(gold_dir))
+        storage_for(gold_dir).makedirs(gold_dir)
+        tables = gold_tables()
+        # One scan of silver for every table: the first write fills the cache, the others reuse it
+        if len(tables) > 1:
+            spark_df = spark_df.persist(StorageLevel.MEMORY_AND_DISK)
+        try:
+            for table in tables:
+                (spark_aggregate(spark_df, table).write
+                    .mode("overwrite")
+                    .option("partitionOverwriteMode", "dynamic")
+                    .partitionBy("year", "month", "day")
+                    .parquet(table_dir(table.name, gold_dir)))
+        finally:
+            spark_df.unpersist()
+
+        # Dynamic overwrite only replaces partitions that received rows
+        for date_str in affected - set().union(*(new_dates.get(p, state.dates_of(p)) for p in sources)):
+            self._drop_gold_partition(gold_dir, date_str)
+
+        for path in new_inputs:
+            state.record(path, fingerprints[path], new_dates[path])
+        state.touch(affected)
+        state.layout = layout
+        state.save()
             
         logger.info(f"Gold Tier updated at: {gold_dir}")
         return gold_dir
 
+    @staticmethod
+    def _drop_gold_partition(gold_dir: str, date_str: str):
+        """Removes a date's partition, in every Gold table, that no longer has any contributing silver input."""
+        for table in gold_tables():
+            partition = partition_dir(table_dir(table.name, gold_dir), date.fromisoformat(date_str))
+            storage = storage_for(partition)
+            if storage.isdir(partition):
+                storage.rmtree(partition)
+                logger.info(f"Gold: removed empty partition {partition}")
+
     def close(self):
-        if self.spark:
+        # A shared session belongs to its SparkSessionManager and stays warm
+        if self.spark and self._owns_session:
             self.spark.stop()
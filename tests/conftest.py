@@ -0,0 +1,58 @@
+import pytest
+import pandas as pd
+from src.config_loader import settings
+
+# One row passing every rule, one failing five of them, one with a null id, and the expected
+# DLQ reason codes (in customer_id order): every engine must quarantine them the same way
+REASON_CODE_ROWS = pd.DataFrame({
+    "transaction_id": ["00000000-0000-4000-8000-000000000001", "not-a-uuid", None],
+    "customer_id": ["C1", "C2", "C3"],
+    "email": ["a@b.com"] * 3,
+    "pan": ["4111222233334444", "4111", "4111222233334444"],
+    "amount": [100.0, -5.0, 10.0],
+    "currency": ["USD", "YEN", "EUR"],
+    "timestamp": ["2023-01-01T10:00:00", "2023-13-45T99:00:00", "2023-01-01T10:00:00"]
+})
+REASON_CODES = [
+    "TRANSACTION_ID_UUID|PAN_DIGITS|AMOUNT_MIN|CURRENCY_ISO4217|TIMESTAMP_ISO8601",
+    "TRANSACTION_ID_NOT_NULL",
+]
+
+@pytest.fixture(scope="session", autouse=True)
+def log_paths(tmp_path_factory):
+    """Sends module logs and run metrics to a temporary directory instead of the repository's logs/."""
+    logs = tmp_path_factory.mktemp("logs")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(settings.paths, "logs", str(logs))
+        patch.setattr(settings.metrics, "run_log", str(logs / "pipeline_metrics.jsonl"))
+        patch.setattr(settings.metrics, "prometheus_file", str(logs / "pipeline_metrics.prom"))
+        yield logs
+
+@pytest.fixture
+def data_paths(tmp_path, monkeypatch):
+    """Redirects the medallion layers to a temporary directory."""
+    for layer in ("raw", "bronze", "silver", "gold", "quarantine"):
+        monkeypatch.setattr(settings.paths, layer, str(tmp_path / layer))
+    return tmp_path
+
+def make_batch(day: str, amounts, first_id: int = 0, **columns) -> pd.DataFrame:
+    """A raw batch of `amounts` on `day` (one USD customer by default); `columns` override whole columns."""
+    amounts = list(amounts)
+    batch = pd.DataFrame({
+        "transaction_id": [f"00000000-0000-4000-8000-{day.replace('-', '')}{i:04d}" for i in range(first_id, first_id + len(amounts))],
+        "customer_id": ["C1"] * len(amounts),
+        "email": ["a@b.com"] * len(amounts),
+        "pan": ["4111222233334444"] * len(amounts),
+        "amount": amounts,
+        "currency": ["USD"] * len(amounts),
+        "timestamp": [f"{day}T10:00:00.000000"] * len(amounts)
+    })
+    for name, values in columns.items():
+        batch[name] = values
+    return batch
+
+def write_batch(directory, day: str, amounts, first_id: int = 0, name: str = None, **columns) -> str:
+    """Writes make_batch(...) as transactions_YYYYMMDD.csv (or `name`) under `directory`."""
+    path = directory / (name or f"transactions_{day.replace('-', '')}.csv")
+    make_batch(day, amounts, first_id, **columns).to_csv(path, index=False)
+    return str(path)
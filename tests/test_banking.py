@@ -1,8 +1,10 @@
 import pytest
 import pandas as pd
 import os
+from cryptography.fernet import InvalidToken
 from src.security import SecurityManager
 from src.quality import DataQualityManager
+from conftest import REASON_CODE_ROWS, REASON_CODES
 
 @pytest.fixture
 def security_manager():
@@ -23,6 +25,41 @@ def test_pan_encryption_is_reversible(security_manager):
     assert encrypted != original_pan
     assert decrypted == original_pan
 
+def test_batch_pan_encryption_is_reversible(security_manager):
+    """Validate that batch encryption round-trips and keeps the Series index."""
+    pans = pd.Series(["4111222233334444", "4000000000000002", "4111"], index=[10, 11, 12])
+    encrypted = security_manager.encrypt_pans(pans)
+    decrypted = security_manager.decrypt_pans(encrypted)
+
+    assert list(encrypted.index) == [10, 11, 12]
+    assert encrypted.nunique() == 3
+    pd.testing.assert_series_equal(decrypted, pans, check_dtype=False)
+
+def test_batch_pan_encryption_is_fernet_compatible(security_manager):
+    """Validate that batch tokens and single-value tokens are interchangeable."""
+    pans = pd.Series(["4111222233334444", "4000000000000002"])
+    batch_tokens = security_manager.encrypt_pans(pans)
+    single_tokens = pans.map(security_manager.encrypt_pan)
+
+    assert [security_manager.decrypt_pan(t) for t in batch_tokens] == pans.tolist()
+    assert security_manager.decrypt_pans(single_tokens).tolist() == pans.tolist()
+
+def test_batch_pan_decryption_across_workers_rejects_tampered_tokens(security_manager):
+    """Validate the worker-pool path and that a tampered token raises InvalidToken like Fernet."""
+    pans = pd.Series([f"4111222233334{i:03d}" for i in range(8)])
+    tokens = security_manager.encrypt_pans(pans, workers=2)
+    assert security_manager.decrypt_pans(tokens, workers=2).tolist() == pans.tolist()
+
+    tampered = tokens.copy()
+    tampered[3] = tampered[3][:-4] + ("AAAA" if not tampered[3].endswith("AAAA") else "BBBB")
+    with pytest.raises(InvalidToken):
+        security_manager.decrypt_pans(tampered, workers=2)
+
+def test_batch_pan_encryption_rejects_missing_values(security_manager):
+    """Validate that a batch containing a null PAN is rejected as a whole."""
+    with pytest.raises(ValueError):
+        security_manager.encrypt_pans(pd.Series(["4111222233334444", None]))
+
 def test_email_hashing_is_consistent(security_manager):
     """Validate that the same email always produces the same hash (deterministic)."""
     email = "test@bank.com"
@@ -44,16 +81,68 @@ def test_quality_manager_detects_schema_mismatch(quality_manager):
     assert is_valid is False
 
 def test_quality_manager_detects_invalid_values(quality_manager):
-    """Validate that the Quality Manager fails if amount is negative."""
+    """Validate that the Quality Manager quarantines a record with a negative amount."""
     invalid_data = pd.DataFrame({
-        "transaction_id": ["id1"],
+        "transaction_id": ["00000000-0000-4000-8000-000000000001"],
         "customer_id": ["C1"],
         "email": ["a@b.com"],
-        "pan": ["1234"],
+        "pan": ["4111222233334444"],
         "amount": [-50.0],  # Critical failure point
         "currency": ["USD"],
         "timestamp": ["2023-01-01T10:00:00.000000"]
     })
     
-    validation_result = quality_manager.run_valitations(invalid_data)
-    assert validation_result["success"] is False
+    df_valid, df_invalid = quality_manager.run_quarantine_check(invalid_data)
+    assert df_valid.empty
+    assert df_invalid["dq_reason_codes"].tolist() == ["AMOUNT_MIN"]
+
+def test_quality_manager_checks_schema_from_file_header(quality_manager, tmp_path):
+    """Validate that the schema check works on a file path using only its header."""
+    good_file = tmp_path / "good.csv"
+    good_file.write_text(",".join(quality_manager.expected_columns) + "\n")
+    bad_file = tmp_path / "bad.csv"
+    bad_file.write_text("transaction_id,amount\nid1,not-even-parsed\n")
+
+    assert quality_manager.validate_schema(str(good_file)) is True
+    assert quality_manager.validate_schema(str(bad_file)) is False
+
+def test_quality_manager_streams_quarantine_in_chunks(quality_manager, tmp_path, monkeypatch):
+    """Validate that streaming quarantine splits every chunk and loses no records."""
+    from src.config_loader import settings
+    monkeypatch.setattr(settings.paths, "silver", str(tmp_path / "silver"))
+    df = pd.DataFrame({
+        "transaction_id": [f"00000000-0000-4000-8000-{i:012d}" for i in range(10)],
+        "customer_id": ["C1"] * 10,
+        "email": ["a@b.com"] * 10,
+        "pan": ["4111222233334444"] * 10,
+        "amount": [100.0, -1.0] * 5,  # Every second record is invalid
+        "currency": ["USD"] * 10,
+        "timestamp": ["2023-01-01T10:00:00"] * 10
+    })
+    csv_file = tmp_path / "batch.csv"
+    df.to_csv(csv_file, index=False)
+
+    chunks = list(quality_manager.stream_quarantine_check(str(csv_file), chunk_rows=4))
+
+    assert len(chunks) == 3
+    assert sum(len(valid) for valid, _ in chunks) == 5
+    assert sum(len(invalid) for _, invalid in chunks) == 5
+    assert chunks[0][0]["pan"].tolist() == ["4111222233334444"] * 2
+
+def test_quarantined_rows_carry_reason_codes(quality_manager):
+    """Validate that every failed rule is reported per row, in one mask and as reason codes."""
+    df_valid, df_invalid = quality_manager.run_quarantine_check(REASON_CODE_ROWS.copy())
+
+    assert len(df_valid) == 1
+    assert df_invalid["dq_reason_codes"].tolist() == REASON_CODES
+    assert (df_invalid["dq_failure_mask"] > 0).all()
+
+def test_rules_without_config_fall_back_to_legacy_checks():
+    """Validate that a settings file without a rule registry keeps the original checks."""
+    from src.config_loader import QualityConfig
+    from src.quality_rules import compile_rules
+
+    rules = compile_rules(QualityConfig(expected_columns=[], min_amount=0.0, currency_len=3))
+    df = pd.DataFrame({"transaction_id": ["x", "y"], "amount": [1.0, -1.0], "currency": ["ABC", "ABCD"]})
+
+    assert rules.reason_codes(rules.failure_mask(df)).tolist() == ["", "AMOUNT_MIN|CURRENCY_LENGTH"]
@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from bench_phases import compare
+
+def phase(seconds, rows_per_s, peak_rss_mb):
+    return {"rows": 100000, "seconds": seconds, "rows_per_s": rows_per_s, "peak_rss_mb": peak_rss_mb}
+
+BASELINE = {
+    "max_regression": 0.25,
+    "thresholds": {"gold_aggregate": 0.5},
+    "results": {"100000": {"phases": {
+        "quarantine": phase(1.0, 100000.0, 400.0),
+        "gold_aggregate": phase(2.0, 50000.0, 800.0),
+        "schema_check": phase(0.01, 1e7, 300.0),
+    }}},
+}
+
+def test_phase_regressions_fail_past_their_threshold():
+    """Validate throughput and memory regressions against the baseline and per-phase thresholds."""
+    results = {"100000": {"phases": {
+        "quarantine": phase(1.5, 66000.0, 410.0),       # 34% slower: over the 25% default
+        "gold_aggregate": phase(3.0, 33000.0, 900.0),   # 34% slower: within its own 50%
+        "schema_check": phase(0.02, 5e6, 300.0),        # too short to compare throughput
+    }}, "1000": {"phases": {"quarantine": phase(0.1, 1.0, 1.0)}}}  # no baseline for this size
+
+    regressions = compare(results, BASELINE)
+    assert [(r["phase"], r["metric"]) for r in regressions] == [("quarantine", "rows_per_s")]
+
+    # A global threshold overrides the baseline's
+    assert compare(results, BASELINE, max_regression=0.1)[-1]["phase"] == "gold_aggregate"
+    assert compare(results, BASELINE, max_regression=0.9) == []
@@ -0,0 +1,63 @@
+import pandas as pd
+from src.config_loader import settings
+from src.dedup_index import TransactionIdIndex, hash_ids
+from src.quality import DataQualityManager
+
+def make_ids(start: int, count: int):
+    return [f"00000000-0000-4000-8000-{i:012d}" for i in range(start, start + count)]
+
+def test_index_membership_survives_compaction(tmp_path):
+    """Validate lookups across batches, re-runs of the same batch and segment merges."""
+    index = TransactionIdIndex(str(tmp_path / "index"), max_segments=2, merge_chunk_rows=3)
+    index.add(hash_ids(make_ids(0, 10)), "batch-0")
+    # Opened before the other batches: its merged-away segments are gone by the time it looks up
+    stale = TransactionIdIndex(str(tmp_path / "index"), max_segments=2, merge_chunk_rows=3)
+    for batch in range(1, 5):
+        index.add(hash_ids(make_ids(batch * 10, 10)), f"batch-{batch}")
+
+    assert len(index.manifest["segments"]) <= 2 and "batches" not in index.manifest
+    assert stale.lookup(hash_ids(make_ids(0, 50))).all()
+    assert len(index) == 50
+    probe = hash_ids(make_ids(45, 10))
+    assert index.lookup(probe).tolist() == [True] * 5 + [False] * 5
+    # The batch that recorded an id does not see it as a duplicate when re-run
+    assert not index.lookup(probe, "batch-4")[:5].any()
+
+    reopened = TransactionIdIndex(str(tmp_path / "index"), max_segments=2, merge_chunk_rows=3)
+    assert reopened.lookup(hash_ids(make_ids(0, 50))).all()
+    assert index.add(hash_ids(make_ids(0, 50)), "batch-5") == 0
+    # A batch whose rows were all quarantined records nothing
+    assert index.add(hash_ids([]), "batch-6") == 0 and len(index) == 50
+
+def test_later_batch_duplicates_are_quarantined(tmp_path, monkeypatch):
+    """Validate that ids accepted by one batch are quarantined in the next, and repeats within a batch too."""
+    monkeypatch.setattr(settings.paths, "silver", str(tmp_path / "silver"))
+    dq = DataQualityManager()
+
+    def batch(ids):
+        return pd.DataFrame({
+            "transaction_id": ids,
+            "customer_id": ["C1"] * len(ids),
+            "email": ["a@b.com"] * len(ids),
+            "pan": ["4111222233334444"] * len(ids),
+            "amount": [10.0] * len(ids),
+            "currency": ["USD"] * len(ids),
+            "timestamp": ["2024-01-01T10:00:00"] * len(ids)
+        })
+
+    first_valid, _ = dq.run_quarantine_check(batch(make_ids(0, 3)), "transactions_20240101.csv")
+    assert len(first_valid) == 3
+    # Ids are only recorded once the batch is published: an unpublished check leaves no trace
+    assert dq.run_quarantine_check(batch(make_ids(0, 3)), "transactions_20240109.csv")[1].empty
+    dq.record_accepted(first_valid, "transactions_20240101.csv")
+
+    second = make_ids(2, 2) + make_ids(3, 1)
+    second_valid, second_invalid = dq.run_quarantine_check(batch(second), "transactions_20240102.csv")
+    dq.record_accepted(second_valid, "transactions_20240102.csv")
+    assert second_valid["transaction_id"].tolist() == make_ids(3, 1)
+    assert second_invalid["dq_reason_codes"].tolist() == ["DUPLICATE_TRANSACTION_ID"] * 2
+
+    # Re-running the first batch does not quarantine its own ids
+    rerun_valid, _ = dq.run_quarantine_check(batch(make_ids(0, 3)), "transactions_20240101.csv")
+    assert len(rerun_valid) == 3
+    assert len(TransactionIdIndex(str(tmp_path / "silver" / "_dedup_index" / "transaction_id"))) == 4
@@ -0,0 +1,91 @@
+import os
+import shutil
+import pandas as pd
+import pyarrow.parquet as pq
+from src.dlq import RUNS_DIR, STAGING_DIR, compact, count_by_day, read_dlq, record_clean_runs, write_dlq
+
+def quarantined(reasons):
+    return pd.DataFrame({
+        "transaction_id": [f"id{i}" for i in range(len(reasons))],
+        "customer_id": ["C1"] * len(reasons),
+        "email": ["a@b.com"] * len(reasons),
+        "pan": ["4111222233334444"] * len(reasons),
+        "amount": [-1.0] * len(reasons),
+        "currency": ["US"] * len(reasons),
+        "timestamp": ["not-a-timestamp"] * len(reasons),
+        "dq_failure_mask": [1] * len(reasons),
+        "dq_reason_codes": reasons
+    })
+
+def test_dlq_appends_runs_and_answers_reason_queries(tmp_path):
+    """Validate append semantics, latest-run-per-batch reads and reason queries across secondary codes."""
+    root = str(tmp_path / "dlq")
+    write_dlq(quarantined(["CURRENCY_LENGTH", "AMOUNT_MIN|CURRENCY_ISO4217"]), "2024-07-01", "b1.csv", "run-1", root)
+    write_dlq(quarantined(["AMOUNT_MIN"]), "2024-08-15", "b2.csv", "run-1", root)
+    # A re-run of b1 appends; it does not overwrite the first run's files
+    write_dlq(quarantined(["CURRENCY_LENGTH"]), "2024-07-01", "b1.csv", "run-2", root)
+
+    assert sorted(os.listdir(os.path.join(root, "date=2024-07-01"))) == ["reason=AMOUNT_MIN", "reason=CURRENCY_LENGTH"]
+    assert len(read_dlq(root=root, latest_only=False)) == 4
+    latest = read_dlq(root=root).to_pandas()
+    assert sorted(zip(latest["dq_batch"], latest["dq_run_id"])) == [("b1.csv", "run-2"), ("b2.csv", "run-1")]
+    assert latest["timestamp"].tolist() == ["not-a-timestamp"] * 2
+
+    q3 = count_by_day(["CURRENCY_*"], "2024-07-01", "2024-09-30", latest_only=False, root=root)
+    assert q3.to_dict("records") == [{"date": "2024-07-01", "records": 3}]
+    assert count_by_day(["AMOUNT_MIN"], "2024-08-01", root=root).to_dict("records") == [{"date": "2024-08-15", "records": 1}]
+
+def test_dlq_compaction_merges_small_files(tmp_path):
+    """Validate that compaction merges a partition's small files without losing rows, and recovers an interrupted run."""
+    root = str(tmp_path / "dlq")
+    for run in range(4):
+        write_dlq(quarantined(["AMOUNT_MIN"] * 3), "2024-07-01", f"b{run}.csv", f"run-{run}", root)
+    partition = os.path.join(root, "date=2024-07-01", "reason=AMOUNT_MIN")
+    before = sorted(os.listdir(partition))
+
+    assert compact(root, min_files=3, target_file_mb=1) == {"partitions": 1, "files_in": 4, "files_out": 1}
+    (merged,) = os.listdir(partition)
+    assert len(read_dlq(root=root)) == 12
+
+    # A crash after publishing the merged file left a source behind: the next run deletes it
+    pq.write_table(pq.read_table(os.path.join(partition, merged)).slice(0, 3), os.path.join(partition, before[0]))
+    compact(root, min_files=3, target_file_mb=1)
+    assert os.listdir(partition) == [merged]
+    assert len(read_dlq(root=root, latest_only=False)) == 12
+
+def test_dlq_compaction_skips_in_flight_spark_output(tmp_path):
+    """Validate that a Spark append still in its _temporary attempt directory is neither merged nor deleted."""
+    root = str(tmp_path / "dlq")
+    for run in range(3):
+        write_dlq(quarantined(["AMOUNT_MIN"]), "2024-07-02", f"b{run}.csv", f"run-{run}", root)
+    attempt = os.path.join(root, "_temporary", "0", "_temporary", "attempt_0001", "date=2024-07-02", "reason=AMOUNT_MIN")
+    for run in range(3):
+        write_dlq(quarantined(["AMOUNT_MIN"]), "2024-07-02", f"late{run}.csv", f"run-{run}", str(tmp_path / "task"))
+    shutil.copytree(tmp_path / "task" / "date=2024-07-02" / "reason=AMOUNT_MIN", attempt)
+    in_flight = sorted(os.listdir(attempt))
+
+    assert compact(root, min_files=3, target_file_mb=1) == {"partitions": 1, "files_in": 3, "files_out": 1}
+    assert sorted(os.listdir(attempt)) == in_flight
+
+def test_dlq_clean_rerun_supersedes_and_staged_files_are_skipped(tmp_path):
+    """Validate that a re-run quarantining nothing hides the batch's earlier rows and that staged writes are left alone."""
+    root = str(tmp_path / "dlq")
+    for run in range(3):
+        write_dlq(quarantined(["AMOUNT_MIN"]), "2024-07-03", f"b{run}.csv", f"run-{run}", root)
+    assert os.listdir(os.path.join(root, STAGING_DIR)) == []
+    # A write still in progress: only a truncated file under the staging directory
+    staged = os.path.join(root, STAGING_DIR, "inflight", "date=2024-07-03", "reason=AMOUNT_MIN")
+    os.makedirs(staged)
+    with open(os.path.join(staged, "part-run-9-0.parquet"), "wb") as f:
+        f.write(b"PAR1")
+
+    record_clean_runs({"b0.csv": "2024-07-03"}, "run-5", root)
+    record_clean_runs({"b1.csv": "2024-07-03", "b2.csv": "2024-07-04"}, "run-6", root)
+    assert read_dlq(root=root).num_rows == 0
+    assert read_dlq(end="2024-07-03", root=root)["dq_batch"].to_pylist() == ["b2.csv"]
+    assert len(read_dlq(root=root, latest_only=False)) == 3
+
+    assert compact(root, min_files=2, target_file_mb=1) == {"partitions": 1, "files_in": 3, "files_out": 1}
+    assert os.listdir(staged) == ["part-run-9-0.parquet"]
+    assert len(os.listdir(os.path.join(root, RUNS_DIR))) == 1
+    assert read_dlq(end="2024-07-03", root=root)["dq_batch"].to_pylist() == ["b2.csv"]
@@ -0,0 +1,72 @@
+import pytest
+import pandas as pd
+import pyarrow.parquet as pq
+from datetime import date
+from src.config_loader import settings
+from src.generator import BankingDataGenerator, luhn_is_valid
+from src.ingestion import read_batch, raw_arrow_schema
+
+EXECUTION_DATE = date(2024, 3, 1)
+
+@pytest.fixture
+def generator():
+    """Fixture for BankingDataGenerator."""
+    return BankingDataGenerator()
+
+def read_raw(path):
+    return pd.read_csv(path, dtype={"pan": str})
+
+def test_bulk_mode_is_reproducible_from_seed(generator, tmp_path):
+    """Validate that the same seed produces byte-identical files, regardless of worker count."""
+    first = generator.generate_bulk(500, EXECUTION_DATE, str(tmp_path / "a"), seed=42, shards=3, workers=1)
+    second = generator.generate_bulk(500, EXECUTION_DATE, str(tmp_path / "b"), seed=42, shards=3, workers=2)
+
+    assert len(first) == 3
+    for path_a, path_b in zip(first, second):
+        with open(path_a) as a, open(path_b) as b:
+            assert a.read() == b.read()
+
+def test_bulk_mode_produces_valid_rows(generator, tmp_path):
+    """Validate schema, Luhn-valid Visa PANs, customer ids and timestamps within the execution date."""
+    path = generator.generate_batch(2000, EXECUTION_DATE, str(tmp_path), mode="bulk", seed=1)
+    df = read_raw(path)
+
+    assert list(df.columns) == generator.columns
+    assert len(df) == 2000
+    assert df["transaction_id"].is_unique
+    assert df["pan"].str.match(r"^4\d{15}$").all()
+    assert df["pan"].map(luhn_is_valid).all()
+    assert df["customer_id"].str.match(r"^CUST-\d{5}$").all()
+    assert (df["amount"] > 0).all()
+    assert df["timestamp"].str.startswith("2024-03-01T").all()
+
+def test_bulk_shards_split_the_requested_count(generator, tmp_path):
+    """Validate that the shard files add up to the requested number of records."""
+    paths = generator.generate_bulk(1001, EXECUTION_DATE, str(tmp_path), seed=3, shards=4, workers=1)
+
+    assert sum(len(read_raw(p)) for p in paths) == 1001
+
+@pytest.mark.parametrize("mode", ["realistic", "bulk"])
+def test_parquet_output_is_typed_and_chunked(generator, tmp_path, monkeypatch, mode):
+    """Validate that Parquet batches follow the registry schema and are written in row groups."""
+    monkeypatch.setattr(settings.generator, "chunk_rows", 100)
+    path = generator.generate_batch(250, EXECUTION_DATE, str(tmp_path), mode=mode, seed=5, output_format="parquet")
+
+    parquet_file = pq.ParquetFile(path)
+    assert path.endswith("transactions_20240301.parquet")
+    assert parquet_file.schema_arrow == raw_arrow_schema()
+    assert parquet_file.metadata.num_row_groups == 3
+
+    df = read_batch(path)
+    assert len(df) == 250
+    assert (df["timestamp"].dt.date == EXECUTION_DATE).all()
+
+def test_arrow_ipc_output_matches_csv_values(generator, tmp_path):
+    """Validate that the same seed yields the same records in CSV and Arrow IPC output."""
+    csv_path = generator.generate_batch(300, EXECUTION_DATE, str(tmp_path), mode="bulk", seed=9)
+    ipc_path = generator.generate_batch(300, EXECUTION_DATE, str(tmp_path), mode="bulk", seed=9, output_format="arrow")
+
+    df_csv = read_raw(csv_path)
+    df_ipc = read_batch(ipc_path)
+    pd.testing.assert_series_equal(df_csv["transaction_id"], df_ipc["transaction_id"], check_dtype=False)
+    pd.testing.assert_series_equal(pd.to_datetime(df_csv["timestamp"]), df_ipc["timestamp"], check_dtype=False)
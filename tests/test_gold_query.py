@@ -0,0 +1,72 @@
+import numpy as np
+from src.gold_query import GoldQuery
+from src.polars_engine import PolarsEngine
+from conftest import write_batch
+
+def load_day(directory, day: str, rows):
+    """Runs a batch of (amount, currency) rows for one day through the Polars engine into Gold."""
+    path = write_batch(directory, day, [amount for amount, _ in rows], currency=[currency for _, currency in rows])
+    PolarsEngine().run_batch(path, day)
+
+def totals(table):
+    return {(str(row["date"]), row["currency"]): row["total_amount"] for row in table.to_pylist()}
+
+def test_gold_query_prunes_partitions_and_caches_them(data_paths):
+    """Validate date-range pruning, currency filters, pandas output and cache hits on repeated queries."""
+    load_day(data_paths, "2024-01-31", [(10.0, "USD"), (4.0, "EUR")])
+    load_day(data_paths, "2024-02-01", [(1.0, "USD"), (2.0, "EUR")])
+    load_day(data_paths, "2024-02-02", [(3.0, "USD")])
+    gold = GoldQuery(cache_partitions=2)
+
+    assert [day.isoformat() for day, _ in gold.partitions("2024-02-01")] == ["2024-02-01", "2024-02-02"]
+    assert totals(gold.query("2024-01-31", "2024-02-01", currencies=["USD"])) == {
+        ("2024-01-31", "USD"): 10.0, ("2024-02-01", "USD"): 1.0}
+    assert gold.cache_info()["misses"] == 2
+
+    frame = gold.query_pandas("2024-02-01", "2024-02-01", columns=["currency", "tx_count"])
+    assert sorted(frame.itertuples(index=False, name=None)) == [("EUR", 1), ("USD", 1)]
+    assert gold.cache_info() == {"hits": 1, "misses": 2, "partitions": 2, "capacity": 2}
+
+    # The least recently used partition (2024-01-31) makes room for 2024-02-02
+    assert len(gold.query()) == 5
+    assert gold.cache_info()["partitions"] == 2
+    assert gold.query("2025-01-01").num_rows == 0
+
+def test_gold_query_sees_rewritten_partitions(data_paths):
+    """Validate that a partition rewritten by silver_to_gold is decoded again, and only that one."""
+    load_day(data_paths, "2024-03-01", [(10.0, "USD")])
+    load_day(data_paths, "2024-03-02", [(5.0, "USD")])
+    gold = GoldQuery()
+    assert totals(gold.query()) == {("2024-03-01", "USD"): 10.0, ("2024-03-02", "USD"): 5.0}
+
+    # A corrected re-run of 2024-03-01 rewrites its partition
+    load_day(data_paths, "2024-03-01", [(7.0, "USD")])
+    assert totals(gold.query()) == {("2024-03-01", "USD"): 7.0, ("2024-03-02", "USD"): 5.0}
+    assert gold.cache_info()["hits"] == 1
+    assert gold.cache_info()["misses"] == 3
+
+def test_gold_rollups_merge_sketches(data_paths):
+    """Validate month/quarter rollups: distinct customers and amount quantiles merged from the daily sketches."""
+    rng = np.random.default_rng(7)
+    days = ["2024-07-30", "2024-07-31", "2024-08-01"]
+    batches = {}
+    for day in days:
+        customers = [f"C{n}" for n in rng.integers(0, 1500, 1000)]
+        amounts = np.round(rng.lognormal(4, 1, 1000), 2)
+        batches[day] = (customers, amounts)
+        path = write_batch(data_paths, day, amounts, customer_id=customers, email=[f"{c}@bank.com" for c in customers])
+        PolarsEngine().run_batch(path, day)
+
+    months = GoldQuery().rollup("month").to_pandas().set_index("period")
+    july = batches["2024-07-30"][0] + batches["2024-07-31"][0]
+    assert list(months.index) == ["2024-07", "2024-08"]
+    assert months.loc["2024-07", "tx_count"] == 2000
+    for sketch in ("customers", "emails"):   # one email per customer
+        assert abs(months.loc["2024-07", sketch] - len(set(july))) <= 0.03 * len(set(july))
+
+    quarter = GoldQuery().rollup("quarter", currencies=["USD"]).to_pylist()
+    all_amounts = np.concatenate([amounts for _, amounts in batches.values()])
+    assert [row["period"] for row in quarter] == ["2024Q3"]
+    for q in (0.5, 0.9, 0.99):
+        exact = np.quantile(all_amounts, q, method="lower")
+        assert abs(quarter[0][f"amount_quantiles_p{q * 100:g}"] - exact) <= 0.011 * exact
@@ -0,0 +1,99 @@
+import os
+import json
+import shutil
+import pytest
+import pandas as pd
+import pyarrow.parquet as pq
+from src.config_loader import GoldMetric, GoldTable, settings
+from src.gold_state import STATE_FILE
+from src.polars_engine import PolarsEngine
+from conftest import write_batch
+
+TABLES = [
+    GoldTable(name="daily_currency", keys=["currency"], metrics=[
+        GoldMetric(name="total_amount", agg="sum", column="amount"),
+        GoldMetric(name="tx_count", agg="count", column="transaction_id"),
+        GoldMetric(name="customers", agg="hll", column="customer_id"),
+        GoldMetric(name="amount_quantiles", agg="quantiles", column="amount")]),
+    GoldTable(name="customer_daily", keys=["customer_id"], metrics=[
+        GoldMetric(name="tx_count", agg="count"),
+        GoldMetric(name="max_amount", agg="max", column="amount")]),
+    GoldTable(name="hourly_volume", keys=["hour"], metrics=[GoldMetric(name="tx_count", agg="count")]),
+    GoldTable(name="amount_histogram", keys=["currency", "amount_bucket"], metrics=[GoldMetric(name="tx_count", agg="count")]),
+]
+
+@pytest.fixture
+def data_paths(data_paths, monkeypatch):
+    """Declares the tables under test on top of the redirected medallion layers."""
+    monkeypatch.setattr(settings.gold, "tables", TABLES)
+    monkeypatch.setattr(settings.gold, "amount_buckets", [0.0, 10.0, 100.0])
+    return data_paths
+
+def write_rows(directory, day: str, rows):
+    """rows: (customer_id, amount, currency, hh:mm)."""
+    return write_batch(directory, day, [row[1] for row in rows], customer_id=[row[0] for row in rows],
+                       currency=[row[2] for row in rows], timestamp=[f"{day}T{row[3]}:00.000000" for row in rows])
+
+def read_table(name, sketches=False):
+    table = pq.read_table(os.path.join(settings.paths.gold, name)).drop_columns(["year", "month", "day"])
+    if not sketches:
+        table = table.drop_columns([column for column in ("customers", "amount_quantiles") if column in table.column_names])
+    return sorted((str(row["date"]), *list(row.values())[1:]) for row in table.to_pylist())
+
+ROWS = [("C1", 5.0, "USD", "09:15"), ("C1", 50.0, "USD", "09:45"), ("C2", 500.0, "EUR", "17:00")]
+
+def test_polars_writes_every_declared_table(data_paths):
+    """Validate that one run fills every declared table, each in its own partitioned dataset."""
+    PolarsEngine().run_batch(write_rows(data_paths, "2024-05-01", ROWS), "2024-05-01")
+
+    assert read_table("daily_currency") == [("2024-05-01", "EUR", 500.0, 1), ("2024-05-01", "USD", 55.0, 2)]
+    assert read_table("customer_daily") == [("2024-05-01", "C1", 2, 50.0), ("2024-05-01", "C2", 1, 500.0)]
+    assert read_table("hourly_volume") == [("2024-05-01", 9, 2), ("2024-05-01", 17, 1)]
+    assert read_table("amount_histogram") == [
+        ("2024-05-01", "EUR", 100.0, 1), ("2024-05-01", "USD", 0.0, 1), ("2024-05-01", "USD", 10.0, 1)]
+    (usd,) = [row for row in read_table("daily_currency", sketches=True) if row[1] == "USD"]
+    assert len(usd[4]) == 1 and usd[4][0]["value"] >= 1                   # one customer: one register
+    assert [entry["value"] for entry in usd[5]] == [1, 1]                 # two amounts, one per bucket
+    for name in ("customer_daily", "hourly_volume"):
+        assert os.listdir(os.path.join(settings.paths.gold, name, "year=2024", "month=5")) == ["day=1"]
+
+def test_gold_from_an_older_layout_is_rebuilt(data_paths):
+    """Validate that Gold from before per-table directories is rebuilt from silver, not lost, on the next run."""
+    PolarsEngine().run_batch(write_rows(data_paths, "2024-05-01", ROWS), "2024-05-01")
+    expected = {table.name: read_table(table.name) for table in TABLES}
+    # The single-table layout: gold/year=/month=/day= and a state without a layout
+    gold_dir = settings.paths.gold
+    os.replace(os.path.join(gold_dir, "daily_currency", "year=2024"), os.path.join(gold_dir, "year=2024"))
+    for table in TABLES:
+        shutil.rmtree(os.path.join(gold_dir, table.name))
+    with open(os.path.join(gold_dir, STATE_FILE)) as f:
+        state = json.load(f)
+    del state["layout"]
+    with open(os.path.join(gold_dir, STATE_FILE), "w") as f:
+        json.dump(state, f)
+
+    PolarsEngine().run_batch(write_rows(data_paths, "2024-05-02", ROWS[:1]), "2024-05-02")
+
+    assert read_table("daily_currency") == [*expected["daily_currency"], ("2024-05-02", "USD", 5.0, 1)]
+    assert read_table("hourly_volume") == [*expected["hourly_volume"], ("2024-05-02", 9, 1)]
+    assert not os.path.exists(os.path.join(gold_dir, "year=2024"))
+
+@pytest.mark.skipif(shutil.which("java") is None and "JAVA_HOME" not in os.environ,
+                    reason="Spark tests need a Java runtime")
+def test_spark_tables_match_polars(data_paths):
+    """Validate that Spark computes the same tables (sketches included), from one cached read of silver, with the same types."""
+    from src.transformer import BankingTransformer
+    PolarsEngine().run_batch(write_rows(data_paths, "2024-05-01", ROWS), "2024-05-01")
+    expected = {table.name: read_table(table.name, sketches=True) for table in TABLES}
+    schemas = {table.name: pd.read_parquet(os.path.join(settings.paths.gold, table.name)).dtypes.to_dict() for table in TABLES}
+
+    transformer = BankingTransformer()
+    try:
+        silver = transformer.ingest_to_silver(write_rows(data_paths, "2024-05-01", ROWS), "2024-05-01")
+        transformer.silver_to_gold(silver)
+    finally:
+        transformer.close()
+
+    for table in TABLES:
+        assert read_table(table.name, sketches=True) == expected[table.name]
+        assert pd.read_parquet(os.path.join(settings.paths.gold, table.name)).dtypes.to_dict() == schemas[table.name]
@@ -0,0 +1,52 @@
+import pandas as pd
+from src.config_loader import settings
+from src.dlq import read_dlq, write_dlq
+from src.ingestion import iter_batch_chunks, read_batch
+from src.quality import DataQualityManager
+
+def write_csv(path, timestamps, currencies):
+    pd.DataFrame({
+        "transaction_id": [f"00000000-0000-4000-8000-{i:012d}" for i in range(len(timestamps))],
+        "customer_id": [f"C{i % 3}" for i in range(len(timestamps))],
+        "email": ["a@b.com"] * len(timestamps),
+        "pan": ["0011222233334444"] * len(timestamps),
+        "amount": [float(i) for i in range(len(timestamps))],
+        "currency": currencies,
+        "timestamp": timestamps
+    }).to_csv(path, index=False)
+    return str(path)
+
+def test_csv_batches_are_read_typed_and_compact(tmp_path):
+    """Validate Arrow-backed strings, categorical currencies, native timestamps and exact chunk sizes."""
+    timestamps = [f"2024-05-01T10:00:{i % 60:02d}.{i:06d}" for i in range(250)]
+    path = write_csv(tmp_path / "transactions_20240501.csv", timestamps, ["USD", "EUR", None, "USD", "GBP"] * 50)
+
+    df = read_batch(path)
+    assert df["pan"].dtype == pd.StringDtype("pyarrow") and df["pan"][0] == "0011222233334444"
+    assert isinstance(df["currency"].dtype, pd.CategoricalDtype)
+    assert sorted(df["currency"].cat.categories) == ["EUR", "GBP", "USD"] and df["currency"].isna().sum() == 50
+    assert df["timestamp"].dtype == "datetime64[us]"
+    assert df["timestamp"].tolist() == pd.to_datetime(pd.Series(timestamps), format="ISO8601").tolist()
+
+    chunks = list(iter_batch_chunks(path, 100))
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
+
+def test_malformed_timestamps_reach_the_dlq_as_they_arrived(tmp_path, monkeypatch):
+    """Validate that a batch with an unparseable timestamp keeps its strings for the rule and the DLQ."""
+    monkeypatch.setattr(settings.paths, "silver", str(tmp_path / "silver"))
+    path = write_csv(tmp_path / "transactions_20240502.csv",
+                     ["2024-05-02T10:00:00.000000", "02/05/2024 10:00", "2024-05-02T11:30:00.000000"], ["USD"] * 3)
+
+    df = read_batch(path)
+    assert df["timestamp"].tolist() == ["2024-05-02T10:00:00.000000", "02/05/2024 10:00", "2024-05-02T11:30:00.000000"]
+    valid, invalid = DataQualityManager().run_quarantine_check(df, "transactions_20240502.csv")
+    assert len(valid) == 2 and invalid["dq_reason_codes"].tolist() == ["TIMESTAMP_ISO8601"]
+
+    # Typed timestamps are written back to the DLQ in the raw files' ISO-8601 text
+    typed = read_batch(write_csv(tmp_path / "transactions_20240503.csv", ["2024-05-03T09:15:00.000250"], ["US"]))
+    _, typed_invalid = DataQualityManager().run_quarantine_check(typed, "transactions_20240503.csv")
+    root = str(tmp_path / "dlq")
+    write_dlq(invalid, "2024-05-02", "transactions_20240502.csv", "run-1", root)
+    write_dlq(typed_invalid, "2024-05-03", "transactions_20240503.csv", "run-1", root)
+    assert sorted(read_dlq(root=root)["timestamp"].to_pylist()) == ["02/05/2024 10:00", "2024-05-03T09:15:00.000250"]
@@ -0,0 +1,58 @@
+import pytest
+from cryptography.fernet import Fernet
+from src.config_loader import settings
+from src.key_provider import FileSecretManager, KeyCache, key_cache
+from src.security import SecurityManager
+
+SECRET = "projects/bank/secrets/banking-key"
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_key_cache_ttl_and_refresh_ahead():
+    """Validate hits while fresh, a background reload after refresh_ahead * ttl, a blocking reload once expired, and stale-on-error."""
+    clock, versions = Clock(), iter(["v1", "v2", "v3"])
+    cache = KeyCache(ttl=100, refresh_ahead=0.8, clock=clock)
+    load = lambda: next(versions)
+
+    assert cache.get(("test",), load) == "v1"
+    clock.now = 50
+    assert cache.get(("test",), load) == "v1"
+    clock.now = 90                                  # refresh-ahead: cached value now, v2 loaded behind it
+    assert cache.get(("test",), load) == "v1"
+    cache.join()
+    assert cache.get(("test",), load) == "v2"
+    clock.now = 200                                 # expired: reloaded on access
+    assert cache.get(("test",), load) == "v3"
+    clock.now = 400                                 # source down: the last value is served
+    assert cache.get(("test",), load) == "v3"
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 3
+    assert cache.stats()["refreshes"] == 1 and cache.stats()["errors"] == 1 and cache.stats()["loads"] == 3
+
+    with pytest.raises(StopIteration):              # nothing cached yet: the error surfaces
+        cache.get(("other",), load)
+
+def test_security_managers_share_one_secret_manager_fetch(tmp_path, monkeypatch):
+    """Validate the file-backed Secret Manager stand-in: many managers, one fetch, new versions after clear()."""
+    manager = FileSecretManager(str(tmp_path))
+    first, second = Fernet.generate_key(), Fernet.generate_key()
+    manager.add_secret_version(SECRET, first.decode())
+    monkeypatch.setattr(settings.security, "secret_manager_dir", str(tmp_path))
+    monkeypatch.setenv("GCP_SECRET_ID", f"{SECRET}/versions/latest")
+    key_cache().clear()
+    fetches = lambda: key_cache().stats()["loads_by_source"].get("secret_manager", 0)
+    before = fetches()
+
+    assert all(SecurityManager().key == first for _ in range(5))
+    assert fetches() == before + 1
+
+    assert manager.add_secret_version(SECRET, second.decode()) == f"{SECRET}/versions/2"
+    assert SecurityManager().key == first           # cached until the TTL (or a rotation) drops it
+    key_cache().clear()
+    assert SecurityManager().key == second
+    assert manager.access_secret_version(f"{SECRET}/versions/1") == first.decode()
+    key_cache().clear()
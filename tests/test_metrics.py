@@ -0,0 +1,47 @@
+import json
+import pytest
+from src.config_loader import settings, pipeline_config
+from src.metrics import RunMetrics, SlaBreachError
+
+@pytest.fixture
+def metrics_files(tmp_path, monkeypatch):
+    """Redirects the run log and the Prometheus file to a temporary directory."""
+    monkeypatch.setattr(settings.metrics, "run_log", str(tmp_path / "runs.jsonl"))
+    monkeypatch.setattr(settings.metrics, "prometheus_file", str(tmp_path / "pipeline.prom"))
+    return tmp_path
+
+def test_run_metrics_are_published_per_phase(metrics_files):
+    """Validate that every phase is recorded in the JSON-lines log and the Prometheus file."""
+    with RunMetrics(pipeline="test", engine="polars", mode="polars") as run:
+        with run.phase("generate") as phase:
+            phase.rows_out, phase.bytes_written = 100, 2048
+        with run.phase("quarantine") as phase:
+            phase.rows_in, phase.rows_out = 100, 97
+
+    record = json.loads((metrics_files / "runs.jsonl").read_text().splitlines()[-1])
+    assert record["status"] == "success" and record["sla"]["breached"] is False
+    assert [(p["phase"], p["rows_in"], p["rows_out"]) for p in record["phases"]] == \
+        [("generate", None, 100), ("quarantine", 100, 97)]
+    assert all(p["wall_seconds"] >= 0 and p["peak_rss_mb"] > 0 for p in record["phases"])
+
+    prom = (metrics_files / "pipeline.prom").read_text()
+    assert '# TYPE banking_pipeline_phase_rows_out gauge' in prom
+    assert 'banking_pipeline_phase_rows_out{pipeline="test",engine="polars",mode="polars",phase="quarantine"} 97' in prom
+    assert 'banking_pipeline_phase_rows_in{pipeline="test",engine="polars",mode="polars",phase="generate"}' not in prom
+
+def test_sla_breach_is_flagged_or_fails_the_run(metrics_files, monkeypatch):
+    """Validate the SLA check: a run over budget is flagged, and fails once sla_action is 'fail'."""
+    monkeypatch.setattr(pipeline_config.sla, "latency_threshold_minutes", 0)
+    with RunMetrics(pipeline="test") as run:
+        with run.phase("gold"):
+            pass
+    assert run.record["sla"]["breached"] is True
+
+    monkeypatch.setattr(settings.metrics, "sla_action", "fail")
+    with pytest.raises(SlaBreachError):
+        with RunMetrics(pipeline="test") as run:
+            with run.phase("gold"):
+                pass
+    # Metrics are published before the run fails
+    assert len((metrics_files / "runs.jsonl").read_text().splitlines()) == 2
+    assert "banking_pipeline_sla_breached{pipeline=\"test\"} 1" in (metrics_files / "pipeline.prom").read_text()
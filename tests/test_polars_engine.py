@@ -0,0 +1,176 @@
+import os
+import shutil
+import pytest
+import pandas as pd
+from src.config_loader import settings
+from src.dlq import read_dlq
+from src.gold_tables import gold_table
+from src.ingestion import read_batch
+from src.polars_engine import PolarsEngine
+from src.quality import DataQualityManager
+from conftest import write_batch
+
+TX_IDS = [f"00000000-0000-4000-8000-00000000000{i}" for i in range(4)]
+
+RAW_ROWS = pd.DataFrame({
+    "transaction_id": [TX_IDS[1], TX_IDS[2], None, TX_IDS[3]],
+    "customer_id": ["C1", "C2", "C3", "C4"],
+    "email": ["a@b.com", "c@d.com", "e@f.com", "g@h.com"],
+    "pan": ["4111222233334444"] * 4,
+    "amount": [100.0, -50.0, 300.0, 20.0],
+    "currency": ["USD", "EUR", "USD", "YEN"],
+    "timestamp": ["2023-01-01T10:00:00.000000"] * 4
+})
+
+@pytest.fixture
+def engine():
+    return PolarsEngine()
+
+def read_gold():
+    gold = pd.read_parquet(os.path.join(settings.paths.gold, "daily_currency"))
+    return {str(row.date): (row.total_amount, row.tx_count) for row in gold.itertuples()}
+
+def test_polars_ingestion_matches_quality_manager(engine, data_paths):
+    """Validate that the Polars query quarantines the same rows, with the same reason codes, as pandas."""
+    raw_file = data_paths / "transactions_20230101.csv"
+    RAW_ROWS.to_csv(raw_file, index=False)
+
+    silver_path = engine.ingest_to_silver(str(raw_file), "2023-01-01")
+
+    # Same batch key: a re-check of the batch does not see its own ids as duplicates
+    _, expected_invalid = DataQualityManager().run_quarantine_check(RAW_ROWS, raw_file.name)
+    quarantine = read_dlq("2023-01-01", "2023-01-01").to_pandas().sort_values("customer_id")
+    assert quarantine["dq_reason_codes"].tolist() == expected_invalid["dq_reason_codes"].tolist()
+    assert quarantine["dq_failure_mask"].tolist() == expected_invalid["dq_failure_mask"].tolist()
+
+    silver = pd.read_parquet(silver_path)
+    assert list(silver.columns) == ["transaction_id", "customer_id", "amount", "currency", "timestamp",
+                                    "email_hashed", "pan_encrypted"]
+    assert silver["transaction_id"].tolist() == [TX_IDS[1]]
+    assert silver["email_hashed"][0] == engine.security.hash_email("a@b.com")
+    assert engine.security.decrypt_pan(silver["pan_encrypted"][0]) == "4111222233334444"
+
+def test_polars_gold_is_incremental_per_partition(engine, data_paths, monkeypatch):
+    """Validate the Spark engine's Gold semantics (per-day partitions, idempotent re-runs) and one hash per email."""
+    digests = []
+    digest = engine.security.pseudonymizer._digest
+    monkeypatch.setattr(engine.security.pseudonymizer, "_digest", lambda value: digests.append(value) or digest(value))
+    engine.run_batch(write_batch(data_paths, "2024-01-01", [0.75] * 20), "2024-01-01")
+    # Once per consumer of the secured rows (silver and the email sketch), not once per row
+    assert set(digests) == {"a@b.com"} and len(digests) <= 2
+    engine.run_batch(write_batch(data_paths, "2024-01-02", [1.0]), "2024-01-02")
+    assert read_gold() == {"2024-01-01": (15.0, 20), "2024-01-02": (1.0, 1)}
+
+    engine.run_batch(write_batch(data_paths, "2024-01-01", [7.0]), "2024-01-01")
+    assert read_gold() == {"2024-01-01": (7.0, 1), "2024-01-02": (1.0, 1)}
+
+    # A Gold write that fails midway leaves the day's previous partition in place
+    import src.polars_engine
+    def failing_write(table, path, **kwargs):
+        open(path, "wb").close()
+        raise OSError("disk full")
+    with monkeypatch.context() as patch, pytest.raises(OSError):
+        patch.setattr(src.polars_engine.pq, "write_table", failing_write)
+        engine.run_batch(write_batch(data_paths, "2024-01-02", [2.0]), "2024-01-02")
+    assert read_gold() == {"2024-01-01": (7.0, 1), "2024-01-02": (1.0, 1)}
+
+def read_layers(root, security):
+    """Silver (PANs decrypted with `security`) and every Gold table under `root`, in a stable order."""
+    silver = pd.read_parquet(root / "silver" / settings.silver.table)
+    silver["pan_encrypted"] = security.decrypt_pans(silver["pan_encrypted"]).tolist()
+    # Spark writes UTC-adjusted timestamps, Polars naive ones (see PolarsEngine._scan_silver)
+    silver["timestamp"] = pd.to_datetime(silver["timestamp"], utc=True).dt.tz_localize(None).astype("datetime64[us]")
+    silver = silver.sort_values("transaction_id").reset_index(drop=True)
+    gold = {}
+    for table in sorted(os.listdir(root / "gold")):
+        if (root / "gold" / table).is_dir():
+            frame = pd.read_parquet(root / "gold" / table)
+            gold[table] = frame.sort_values(["date", *gold_table(table).keys]).reset_index(drop=True)
+    return silver, gold
+
+@pytest.mark.skipif(shutil.which("java") is None and "JAVA_HOME" not in os.environ,
+                    reason="Spark tests need a Java runtime")
+def test_polars_output_matches_pandas_engine(engine, data_paths, monkeypatch):
+    """Validate that the Polars engine writes the same silver rows and Gold tables as the pandas engine."""
+    from src.transformer import BankingTransformer
+    days = {"2024-02-01": [10.0, -5.0, 2.5], "2024-02-02": [1.0, 4.0]}
+
+    monkeypatch.setattr(settings.paths, "silver", str(data_paths / "pandas" / "silver"))
+    monkeypatch.setattr(settings.paths, "gold", str(data_paths / "pandas" / "gold"))
+    transformer = BankingTransformer()
+    try:
+        for day, amounts in days.items():
+            batch = write_batch(data_paths, day, amounts)
+            valid, invalid = DataQualityManager().run_quarantine_check(read_batch(batch), os.path.basename(batch))
+            transformer.handle_quarantine(invalid, day, os.path.basename(batch))
+            transformer.silver_to_gold(transformer.transform_to_silver(valid, os.path.basename(batch), execution_date=day))
+    finally:
+        transformer.close()
+
+    monkeypatch.setattr(settings.paths, "silver", str(data_paths / "polars" / "silver"))
+    monkeypatch.setattr(settings.paths, "gold", str(data_paths / "polars" / "gold"))
+    for day, amounts in days.items():
+        engine.run_batch(write_batch(data_paths, day, amounts), day)
+
+    pandas_silver, pandas_gold = read_layers(data_paths / "pandas", transformer.security)
+    polars_silver, polars_gold = read_layers(data_paths / "polars", engine.security)
+    pd.testing.assert_frame_equal(polars_silver[pandas_silver.columns], pandas_silver, check_dtype=False,
+                                  check_categorical=False)
+    assert sorted(polars_gold) == sorted(pandas_gold) and pandas_gold
+    for table, frame in pandas_gold.items():
+        pd.testing.assert_frame_equal(polars_gold[table][frame.columns], frame, check_dtype=False,
+                                      check_categorical=False)
+
+@pytest.mark.skipif(shutil.which("java") is None and "JAVA_HOME" not in os.environ,
+                    reason="Spark tests need a Java runtime")
+def test_polars_gold_folds_spark_silver(engine, data_paths):
+    """Validate that both engines share one Gold table: Polars merges silver written by Spark."""
+    from src.transformer import BankingTransformer
+    transformer = BankingTransformer()
+    try:
+        spark_silver = transformer.ingest_to_silver(write_batch(data_paths, "2024-03-01", [2.0, 3.0]), "2024-03-01")
+        transformer.silver_to_gold(spark_silver)
+    finally:
+        transformer.close()
+
+    # A second batch for the same day (its own files in the date partition, its own transaction ids)
+    polars_batch = write_batch(data_paths, "2024-03-01", [4.0], first_id=2, name="transactions_20240301_late.csv")
+    engine.run_batch(polars_batch, "2024-03-01")
+
+    assert read_gold() == {"2024-03-01": (9.0, 3)}
+
+# ISO-8601 variants pandas and Spark both accept, and one value neither does
+MIXED_TIMESTAMPS = ["2024-06-01T10:00:00.000000", "2024-06-01 11:00:00", "2024-06-01", "2024-06-01T12:30",
+                    "2024-06-01T14:00:00+02:00", "2024-06-01T15:00:00Z", "01/06/2024 10:00"]
+
+@pytest.mark.skipif(shutil.which("java") is None and "JAVA_HOME" not in os.environ,
+                    reason="Spark tests need a Java runtime")
+def test_engines_accept_the_same_iso8601_timestamps(engine, data_paths, monkeypatch):
+    """Validate that pandas, Spark and Polars accept, quarantine and store one mixed batch of timestamps alike."""
+    from src.transformer import BankingTransformer
+    batch = write_batch(data_paths, "2024-06-01", [1.0] * len(MIXED_TIMESTAMPS), timestamp=MIXED_TIMESTAMPS)
+    name = os.path.basename(batch)
+
+    def use_layers(engine_name):
+        for layer in ("silver", "gold", "quarantine"):
+            monkeypatch.setattr(settings.paths, layer, str(data_paths / engine_name / layer))
+
+    transformer = BankingTransformer()
+    try:
+        use_layers("pandas")
+        valid, invalid = DataQualityManager().run_quarantine_check(read_batch(batch), name)
+        transformer.handle_quarantine(invalid, "2024-06-01", name)
+        transformer.transform_to_silver(valid, name, execution_date="2024-06-01")
+        use_layers("spark")
+        transformer.ingest_to_silver(batch, "2024-06-01")
+    finally:
+        transformer.close()
+    use_layers("polars")
+    engine.ingest_to_silver(batch, "2024-06-01")
+
+    for engine_name in ("pandas", "spark", "polars"):
+        use_layers(engine_name)
+        assert read_dlq("2024-06-01", "2024-06-01")["timestamp"].to_pylist() == ["01/06/2024 10:00"], engine_name
+        silver = pd.read_parquet(data_paths / engine_name / "silver" / settings.silver.table)
+        timestamps = pd.to_datetime(silver.sort_values("transaction_id")["timestamp"], utc=True)
+        assert timestamps.dt.strftime("%H:%M").tolist() == ["10:00", "11:00", "00:00", "12:30", "12:00", "15:00"], engine_name
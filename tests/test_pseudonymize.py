@@ -0,0 +1,66 @@
+import os
+import hmac
+import shutil
+import hashlib
+import pytest
+import pandas as pd
+import polars as pl
+import pyarrow as pa
+from src.config_loader import settings
+from src.pseudonymize import Pseudonymizer
+from src.security import SecurityManager
+
+EMAILS = ["  Alice@Example.COM\t", "alice@example.com", None, "ÉLODIE@Exemple.fr", ""]
+
+@pytest.mark.parametrize("key", [None, b"pepper"])
+def test_every_batch_path_produces_the_same_hashes(key):
+    """Validate one normalization rule and digest across single values, pandas, Arrow and Polars."""
+    engine = Pseudonymizer(key)
+    expected = [engine.hash_value(email) for email in EMAILS]
+    digest = (lambda v: hmac.new(key, v.encode(), hashlib.sha256).hexdigest()) if key else \
+             (lambda v: hashlib.sha256(v.encode()).hexdigest())
+    assert expected[0] == expected[1] == digest("alice@example.com")
+    assert expected[2] is None
+    assert expected[3] == digest("Élodie@exemple.fr")      # only ASCII letters are lower-cased
+
+    assert engine.hash_arrow(pa.array(EMAILS)).to_pylist() == expected
+    assert engine.hash_series(pd.Series(EMAILS)).tolist() == expected
+    assert pl.DataFrame({"email": EMAILS}).select(engine.polars_expr("email"))["email"].to_list() == expected
+
+def test_security_manager_uses_the_configured_mode(monkeypatch):
+    """Validate the sha256 default, the keyed mode from the environment and the refusal to run without a key."""
+    assert SecurityManager().hash_email(" A@B.com") == hashlib.sha256(b"a@b.com").hexdigest()
+
+    monkeypatch.setattr(settings.security, "email_hash", "hmac")
+    monkeypatch.setenv(settings.security.hash_key_env, "pepper")
+    security = SecurityManager()
+    assert security.hash_email("a@b.com") == hmac.new(b"pepper", b"a@b.com", hashlib.sha256).hexdigest()
+    assert security.hash_emails(pd.Series(["a@b.com", None])).tolist() == [security.hash_email("a@b.com"), None]
+
+    monkeypatch.delenv(settings.security.hash_key_env)
+    with pytest.raises(ValueError, match="no key"):
+        SecurityManager()
+
+@pytest.mark.skipif(shutil.which("java") is None and "JAVA_HOME" not in os.environ,
+                    reason="Spark tests need a Java runtime")
+def test_spark_native_hashes_match():
+    """Validate that the Spark columns (plain and HMAC) match the batch engine, and that the key stays out of the plan."""
+    from src.transformer import build_spark_session
+    spark = build_spark_session()
+    try:
+        df = spark.createDataFrame(pd.DataFrame({"email": EMAILS}))
+        for key in (None, b"pepper", b"k" * 100):
+            engine = Pseudonymizer(key)
+            hashed_df = df.select(engine.spark_column("email", spark.sparkContext.broadcast(key) if key else None))
+            assert [row[0] for row in hashed_df.collect()] == engine.hash_arrow(pa.array(EMAILS)).to_pylist()
+            if key:
+                # Neither the key nor the HMAC pads derived from it (RFC 2104) are in the plan
+                plan = hashed_df._jdf.queryExecution().toString().lower()
+                block = (hashlib.sha256(key).digest() if len(key) > 64 else key).ljust(64, b"\0")
+                secrets = [key, *(bytes(b ^ pad for b in block) for pad in (0x36, 0x5C))]
+                assert not any(secret.hex() in plan or secret.hex()[:16] in plan for secret in secrets)
+                assert key.decode() not in plan
+        with pytest.raises(ValueError, match="broadcast"):
+            Pseudonymizer(b"pepper").spark_column("email")
+    finally:
+        spark.stop()
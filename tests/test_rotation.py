@@ -0,0 +1,91 @@
+import json
+import os
+import pytest
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from cryptography.fernet import Fernet
+from src.security import SecurityManager
+from src.rotation import SilverKeyRotationJob, STATE_FILE, rotate_parquet_file
+
+PANS = ["4111222233334444", "4000000000000002", "4242424242424242"]
+
+@pytest.fixture
+def old_key():
+    return Fernet.generate_key()
+
+@pytest.fixture
+def new_key():
+    return Fernet.generate_key()
+
+@pytest.fixture
+def silver_root(tmp_path, old_key):
+    """Two silver datasets (Spark-style directories) encrypted with the old key."""
+    old = SecurityManager(old_key, previous_keys=[])
+    for day in ("20240101", "20240102"):
+        dataset = tmp_path / f"transactions_{day}_silver.parquet"
+        dataset.mkdir()
+        pd.DataFrame({
+            "transaction_id": [f"{day}-{i}" for i in range(len(PANS))],
+            "pan_encrypted": old.encrypt_pans(pd.Series(PANS)),
+        }).to_parquet(dataset / "part-00000.parquet", index=False)
+    return tmp_path
+
+def read_tokens(silver_root):
+    return pd.read_parquet(silver_root / "transactions_20240101_silver.parquet")["pan_encrypted"]
+
+def test_keyring_decrypts_every_key_version(old_key, new_key):
+    """Validate MultiFernet semantics: new key encrypts, old tokens still decrypt."""
+    old_token = SecurityManager(old_key, previous_keys=[]).encrypt_pan(PANS[0])
+    manager = SecurityManager(new_key, previous_keys=[old_key])
+
+    assert manager.decrypt_pan(old_token) == PANS[0]
+    assert manager.decrypt_pans(pd.Series([old_token, manager.encrypt_pan(PANS[1])])).tolist() == PANS[:2]
+
+def test_rotation_job_reencrypts_silver_under_new_key(silver_root, old_key, new_key):
+    """Validate that after rotation the data decrypts with the new key alone and keeps token timestamps."""
+    created = [Fernet(old_key).extract_timestamp(token.encode()) for token in read_tokens(silver_root)]
+    job = SilverKeyRotationJob(SecurityManager(new_key, previous_keys=[old_key]), str(silver_root), workers=1)
+    report = job.run()
+
+    assert report["files_rotated"] == 2
+    assert report["rows"] == 6
+    assert SecurityManager(new_key, previous_keys=[]).decrypt_pans(read_tokens(silver_root)).tolist() == PANS
+    assert [Fernet(new_key).extract_timestamp(token.encode()) for token in read_tokens(silver_root)] == created
+
+def test_rotation_job_resumes_from_state(silver_root, old_key, new_key):
+    """Validate that completed files are skipped when the job is re-run."""
+    manager = SecurityManager(new_key, previous_keys=[old_key])
+    SilverKeyRotationJob(manager, str(silver_root), workers=1).run()
+    tokens_after_first_run = read_tokens(silver_root).tolist()
+
+    report = SilverKeyRotationJob(manager, str(silver_root), workers=1).run()
+
+    assert report["files_rotated"] == 0 and report["files_skipped"] == 2
+    assert read_tokens(silver_root).tolist() == tokens_after_first_run
+    with open(os.path.join(silver_root, STATE_FILE)) as f:
+        assert len(json.load(f)["completed"]) == 2
+
+def test_rotation_skips_a_file_replaced_since_listing(silver_root, old_key, new_key):
+    """Validate that a file removed by a re-published batch is not brought back by the rotation."""
+    path = silver_root / "transactions_20240101_silver.parquet" / "part-00000.parquet"
+    os.remove(path)
+
+    assert rotate_parquet_file(str(path), (new_key, old_key), 1024) == 0
+    assert not path.exists()
+
+def test_rotation_keeps_row_groups_and_schema_metadata(tmp_path, old_key, new_key):
+    """Validate that a rotated file keeps its rows in order, its schema metadata and row groups of the given size."""
+    tokens = SecurityManager(old_key, previous_keys=[]).encrypt_pans(pd.Series(PANS * 4)).tolist()
+    table = pa.table({"customer_id": [f"C{i:02d}" for i in range(12)], "pan_encrypted": tokens}) \
+              .replace_schema_metadata({b"silver.replaced": b"[]"})
+    path = tmp_path / "part-00000.parquet"
+    pq.write_table(table, path, row_group_size=12)
+
+    assert rotate_parquet_file(str(path), (new_key, old_key), batch_rows=5, row_group_rows=4) == 12
+    rotated = pq.ParquetFile(path)
+    assert [rotated.metadata.row_group(i).num_rows for i in range(rotated.metadata.num_row_groups)] == [4, 4, 4]
+    assert rotated.schema_arrow.metadata[b"silver.replaced"] == b"[]"
+    result = rotated.read()
+    assert result["customer_id"].to_pylist() == table["customer_id"].to_pylist()
+    assert SecurityManager(new_key, previous_keys=[]).decrypt_pans(result["pan_encrypted"].to_pandas()).tolist() == PANS * 4
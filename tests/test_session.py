@@ -0,0 +1,45 @@
+import os
+import shutil
+import pytest
+import pandas as pd
+from src.config_loader import settings
+from conftest import write_batch
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("java") is None and "JAVA_HOME" not in os.environ,
+    reason="Spark tests need a Java runtime"
+)
+
+@pytest.fixture(scope="module")
+def manager():
+    """Fixture for a SparkSessionManager owning one local session."""
+    from src.session import SparkSessionManager
+    manager = SparkSessionManager()
+    yield manager
+    manager.stop()
+
+def test_run_batches_reuses_one_session(manager, data_paths):
+    """Validate that several batches go through silver and gold on the same warm session."""
+    batches = [
+        write_batch(data_paths, "2024-05-01", [10.0, 5.0]),
+        (write_batch(data_paths, "2024-05-02", [1.0]), {"spark.sql.shuffle.partitions": "3"}),
+    ]
+
+    report = manager.run_batches(batches)
+
+    assert report["sessions_started"] == 1
+    assert len(report["silver_paths"]) == 2
+    assert report["batches"][1]["conf"]["applied"] == ["spark.sql.shuffle.partitions"]
+    gold = pd.read_parquet(os.path.join(settings.paths.gold, "daily_currency"))
+    assert {str(row.date): row.tx_count for row in gold.itertuples()} == {"2024-05-01": 2, "2024-05-02": 1}
+
+    # Per-batch overrides do not leak into later batches
+    assert manager.session().conf.get("spark.sql.shuffle.partitions") == str(settings.spark.shuffle_partitions)
+
+def test_static_settings_are_reported_not_applied(manager):
+    """Validate that settings Spark cannot change at runtime are flagged instead of silently ignored."""
+    result = manager.apply_conf({"spark.sql.adaptive.enabled": "false", "spark.driver.memory": "3g"})
+
+    assert result == {"applied": ["spark.sql.adaptive.enabled"], "requires_restart": ["spark.driver.memory"]}
+    assert manager.sessions_started == 1
+    manager.apply_conf({"spark.sql.adaptive.enabled": "true"})
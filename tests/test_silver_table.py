@@ -0,0 +1,120 @@
+import os
+import threading
+import pytest
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from src.config_loader import settings
+from src.silver_table import LOCK_FILE, batch_files, estimate_row_bytes, lookup_customer, optimize, partition_lock, \
+    partition_path, publish_batch, scan_plan, silver_dataset
+
+def silver_rows(customers, day="2024-01-01"):
+    return pa.table({
+        "transaction_id": [f"{day}-{c}" for c in customers],
+        "customer_id": [f"C{c:04d}" for c in customers],
+        "amount": [1.0] * len(customers),
+        "currency": ["USD"] * len(customers),
+        "timestamp": pa.array([0] * len(customers), pa.timestamp("us")),
+        "email_hashed": [f"{c:064x}" for c in customers],
+        "pan_encrypted": ["token"] * len(customers),
+    })
+
+def stage(tmp_path, *chunks):
+    staging = tmp_path / f"staging-{len(os.listdir(tmp_path))}"
+    staging.mkdir()
+    for number, chunk in enumerate(chunks):
+        pq.write_table(chunk, staging / f"part-{number:05d}.parquet")
+    return str(staging)
+
+def test_batches_are_replaced_independently_in_their_date_partition(tmp_path, monkeypatch):
+    """Validate that a re-run replaces only its own batch's files in the shared date partition."""
+    monkeypatch.setattr(settings.paths, "silver", str(tmp_path / "silver"))
+    partition = publish_batch(stage(tmp_path, silver_rows(range(3))), "2024-01-01", "transactions_20240101")
+    publish_batch(stage(tmp_path, silver_rows(range(3, 5))), "2024-01-01", "transactions_20240101_late")
+    assert partition == partition_path("2024-01-01")
+
+    publish_batch(stage(tmp_path, silver_rows(range(1))), "2024-01-01", "transactions_20240101")
+    assert len(batch_files(partition, "transactions_20240101")) == 1
+    assert pq.read_table(partition).num_rows == 3
+    assert silver_dataset().to_table().column("date").to_pylist() == ["2024-01-01"] * 3
+
+def test_optimize_clusters_batches_for_row_group_pruning(tmp_path, monkeypatch):
+    """Validate OPTIMIZE: streamed chunks become sorted target-size files, and lookups skip row groups."""
+    monkeypatch.setattr(settings.paths, "silver", str(tmp_path / "silver"))
+    # Five appended chunks with interleaved customers, as a streamed batch leaves them
+    chunks = [silver_rows(range(start, 1000, 5)) for start in range(5)]
+    partition = publish_batch(stage(tmp_path, *chunks), "2024-01-01", "transactions_20240101")
+    assert scan_plan(silver_dataset(), ds.field("customer_id") == "C0123")["row_groups"] == 5
+    row_mb = estimate_row_bytes() / 2**20
+    monkeypatch.setattr(settings.silver, "target_file_mb", 400 * row_mb)   # ~400 rows per file
+    monkeypatch.setattr(settings.silver, "row_group_mb", 50 * row_mb)      # ~50 rows per row group
+
+    stats = optimize()
+
+    files = batch_files(partition, "transactions_20240101")
+    assert stats["files_in"] == 5 and stats["files_out"] == len(files) < 5
+    table = pq.read_table(partition)
+    assert table.num_rows == 1000
+    assert table.column("customer_id").to_pylist() == sorted(table.column("customer_id").to_pylist())
+    assert optimize() == {"batches": 0, "files_in": 0, "files_out": 0, "rows": 0}
+
+    found = lookup_customer("C0123", start="2024-01-01", end="2024-01-31")
+    assert found.column("transaction_id").to_pylist() == ["2024-01-01-123"]
+    plan = scan_plan(silver_dataset(), ds.field("customer_id") == "C0123")
+    assert plan["row_groups"] == 1 and plan["row_groups_total"] >= 10
+
+def test_interrupted_optimize_never_loses_rows(tmp_path, monkeypatch):
+    """Validate recovery from a crash between the renames of the new files, and after the manifest."""
+    from src import silver_table
+    monkeypatch.setattr(settings.paths, "silver", str(tmp_path / "silver"))
+    partition = publish_batch(stage(tmp_path, *[silver_rows(range(start, 600, 3)) for start in range(3)]),
+                              "2024-01-01", "transactions_20240101")
+    monkeypatch.setattr(settings.silver, "target_file_mb", 300 * estimate_row_bytes() / 2**20)  # 2 output files
+    sources = batch_files(partition, "transactions_20240101")
+
+    replace, remove = os.replace, os.remove
+
+    def crash_on_second_call(function):
+        calls = []
+        def failing(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise OSError("crash")
+            return function(*args)
+        return failing
+
+    # Crash after the first of the new files is renamed into place: no source is deleted
+    monkeypatch.setattr(silver_table.os, "replace", crash_on_second_call(replace))
+    with pytest.raises(OSError):
+        optimize()
+    monkeypatch.setattr(silver_table.os, "replace", replace)
+    assert set(sources) < set(batch_files(partition, "transactions_20240101"))
+
+    silver_table._recover(partition)
+    assert sorted(os.listdir(partition)) == [LOCK_FILE, *sources]
+
+    # Crash while deleting the sources, once the manifest is written: the next run finishes the job
+    monkeypatch.setattr(silver_table.os, "remove", crash_on_second_call(remove))
+    with pytest.raises(OSError):
+        optimize()
+    monkeypatch.setattr(silver_table.os, "remove", remove)
+    optimize()
+    files = batch_files(partition, "transactions_20240101")
+    assert not set(files) & set(sources) and sorted(os.listdir(partition)) == [LOCK_FILE, *files]
+    assert pq.read_table(partition).num_rows == 600
+
+def test_republish_waits_for_partition_maintenance(tmp_path, monkeypatch):
+    """Validate that a batch re-published during an optimize or a rotation replaces its files only once they finish."""
+    monkeypatch.setattr(settings.paths, "silver", str(tmp_path / "silver"))
+    partition = publish_batch(stage(tmp_path, silver_rows(range(3))), "2024-01-01", "transactions_20240101")
+    before = batch_files(partition, "transactions_20240101")
+    republish = threading.Thread(target=publish_batch,
+                                 args=(stage(tmp_path, silver_rows(range(1))), "2024-01-01", "transactions_20240101"))
+    with partition_lock(partition):
+        republish.start()
+        republish.join(timeout=0.5)
+        assert republish.is_alive()
+        assert batch_files(partition, "transactions_20240101") == before
+    republish.join()
+    assert batch_files(partition, "transactions_20240101") != before
+    assert pq.read_table(partition).num_rows == 1
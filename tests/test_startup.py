@@ -0,0 +1,22 @@
+import json
+import subprocess
+import sys
+
+def loaded_after(code: str):
+    """Runs `code` in a fresh interpreter and returns the heavy modules it imported."""
+    probe = (f"import sys, json; {code}; "
+             "print(json.dumps([m for m in ('pandas', 'pyspark', 'great_expectations', 'faker') if m in sys.modules]))")
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_quality_and_generator_imports_stay_light():
+    """Validate that importing the quality and generator modules loads neither Spark, GX nor Faker."""
+    assert loaded_after("import src.generator") == []
+    assert "great_expectations" not in loaded_after("from src.quality import DataQualityManager; DataQualityManager()")
+    assert "pyspark" not in loaded_after("import src.quality, src.security, main")
+
+def test_settings_load_on_first_access():
+    """Validate that importing a module does not read the configuration until it is used."""
+    code = ("import src.ingestion; from src.config_loader import settings; "
+            "assert settings._config is None; settings.paths; assert settings._config is not None")
+    assert loaded_after(code) == []
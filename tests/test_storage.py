@@ -0,0 +1,81 @@
+import os
+import pytest
+import pandas as pd
+from src import storage
+from src.backfill import date_range, prepare_batches
+from src.config_loader import settings
+from src.dlq import read_dlq
+from src.gold_query import GoldQuery
+from src.polars_engine import PolarsEngine
+from src.storage import COMMIT_MARKER, UPLOADS_PREFIX, committed_files, storage_for, transfer
+
+@pytest.fixture
+def emulator(tmp_path, monkeypatch):
+    """Points gs:// paths at a directory-backed GCS emulator, with a fresh storage per test."""
+    monkeypatch.setattr(settings.storage, "gcs_emulator_dir", str(tmp_path / "gcs"))
+    monkeypatch.setattr(storage, "_STORAGES", {})
+    return storage_for("gs://bucket").client
+
+def test_transfer_round_trip_with_parallel_parts(tmp_path, emulator, monkeypatch):
+    """Validate a directory copied to gs:// and back: multipart uploads, ranged downloads and the commit marker."""
+    monkeypatch.setattr(settings.storage, "part_size_mb", 1 / 64)         # 16 KiB parts
+    source = tmp_path / "raw"
+    (source / "nested").mkdir(parents=True)
+    payloads = {"big.bin": os.urandom(600 * 1024), "small.csv": b"a,b\n1,2\n", "nested/empty": b""}
+    for name, data in payloads.items():
+        (source / name).write_bytes(data)
+
+    assert transfer(str(source), "gs://bucket/raw") == {"files": 3, "bytes": sum(map(len, payloads.values()))}
+    assert emulator.requests["compose"] >= 2                             # 38 parts: more than one compose round
+    assert committed_files("gs://bucket/raw") == {name: len(data) for name, data in payloads.items()}
+    remote = storage_for("gs://bucket")
+    assert not remote.exists(f"gs://bucket/{UPLOADS_PREFIX}")
+    assert remote.read_range("gs://bucket/raw/big.bin", 1000, 10) == payloads["big.bin"][1000:1010]
+
+    transfer("gs://bucket/raw", str(tmp_path / "copy"))
+    for name, data in payloads.items():
+        assert (tmp_path / "copy" / name).read_bytes() == data
+    assert (tmp_path / "copy" / COMMIT_MARKER).exists()
+
+def test_listings_are_paged(emulator, monkeypatch):
+    """Validate that one-level and recursive listings walk every page."""
+    monkeypatch.setattr(settings.storage, "list_page_size", 3)
+    remote = storage_for("gs://bucket")
+    for day in range(1, 8):
+        remote.write_bytes(f"gs://bucket/gold/day={day}/part-0.parquet", b"x" * day)
+        remote.write_bytes(f"gs://bucket/gold/day={day}/part-1.parquet", b"y")
+
+    assert remote.listdir("gs://bucket/gold") == [f"day={day}" for day in range(1, 8)]
+    files = list(remote.list_files("gs://bucket/gold"))
+    assert len(files) == 14 and sum(info.size for info in files) == 28 + 7
+    assert emulator.requests["list"] >= 5
+
+    remote.rmtree("gs://bucket/gold/day=1")
+    assert not remote.isdir("gs://bucket/gold/day=1") and remote.isdir("gs://bucket/gold")
+
+def test_pipeline_reads_and_writes_gs_paths(tmp_path, emulator, monkeypatch):
+    """Validate a Polars batch from gs:// raw into gs:// gold and quarantine, read back through GoldQuery."""
+    for layer in ("raw", "gold", "quarantine"):
+        monkeypatch.setattr(settings.paths, layer, f"gs://bucket/{layer}")
+    monkeypatch.setattr(settings.paths, "silver", str(tmp_path / "silver"))
+    raw = tmp_path / "transactions_20240105.csv"
+    pd.DataFrame({
+        "transaction_id": ["00000000-0000-4000-8000-000000000001", "00000000-0000-4000-8000-000000000002", None],
+        "customer_id": ["C1", "C2", "C3"],
+        "email": ["a@b.com"] * 3,
+        "pan": ["4111222233334444"] * 3,
+        "amount": [10.0, 5.0, 1.0],
+        "currency": ["USD", "EUR", "USD"],
+        "timestamp": ["2024-01-05T10:00:00.000000"] * 3
+    }).to_csv(raw, index=False)
+    transfer(str(raw), "gs://bucket/raw/transactions_20240105.csv")
+
+    # A backfill over already-landed batches finds them in the bucket
+    assert prepare_batches(date_range("2024-01-04", "2024-01-05"), 0, generate=False, output_format="csv") == {
+        "gs://bucket/raw/transactions_20240105.csv": "2024-01-05"}
+    PolarsEngine().run_batch("gs://bucket/raw/transactions_20240105.csv", "2024-01-05")
+
+    gold = GoldQuery().query()
+    assert sorted((row["currency"], row["total_amount"]) for row in gold.to_pylist()) == [("EUR", 5.0), ("USD", 10.0)]
+    assert read_dlq("2024-01-05", "2024-01-05").num_rows == 1
+    assert not os.path.exists(tmp_path / "gcs" / ".staging") or not os.listdir(tmp_path / "gcs" / ".staging")
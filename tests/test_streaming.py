@@ -0,0 +1,73 @@
+import os
+import json
+import shutil
+import pytest
+import pandas as pd
+from src.config_loader import settings
+from src.dlq import read_dlq
+from conftest import write_batch
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("java") is None and "JAVA_HOME" not in os.environ,
+    reason="Spark tests need a Java runtime"
+)
+
+@pytest.fixture(scope="module")
+def transformer():
+    """Fixture for a BankingTransformer on a local Spark session."""
+    from src.transformer import BankingTransformer
+    transformer = BankingTransformer()
+    yield transformer
+    transformer.close()
+
+@pytest.fixture
+def data_paths(data_paths, monkeypatch):
+    """Redirects the run log along with the medallion layers, and creates the landing zone."""
+    monkeypatch.setattr(settings.metrics, "run_log", str(data_paths / "runs.jsonl"))
+    os.makedirs(data_paths / "raw")
+    return data_paths
+
+def land(directory, name: str, day: str, amounts, first_id: int = 0):
+    """Lands a raw batch the way an upload does: written aside, then renamed into the landing zone."""
+    os.replace(write_batch(directory, day, amounts, first_id, name=".landing.tmp"), directory / "raw" / name)
+
+def read_gold():
+    gold = pd.read_parquet(os.path.join(settings.paths.gold, "daily_currency"))
+    return {str(row.date): (row.total_amount, row.tx_count) for row in gold.itertuples()}
+
+def stream_runs(data_paths):
+    with open(data_paths / "runs.jsonl") as f:
+        return [run for run in map(json.loads, f) if run["mode"] == "structured_streaming"]
+
+def test_stream_takes_landed_batches_to_gold(transformer, data_paths):
+    """Validate quarantine, silver and Gold per micro-batch, and that a restart only reads new files."""
+    from src.streaming import StreamingPipeline
+    land(data_paths, "transactions_20240101.csv", "2024-01-01", [10.0, 5.0, -1.0])
+    land(data_paths, "transactions_20240102.csv", "2024-01-02", [2.0])
+    StreamingPipeline(transformer).run(available_now=True)
+
+    assert read_gold() == {"2024-01-01": (15.0, 2), "2024-01-02": (2.0, 1)}
+    assert read_dlq()["dq_reason_codes"].to_pylist() == ["AMOUNT_MIN"]
+    assert stream_runs(data_paths)[-1]["landing_to_gold_seconds"] >= 0
+
+    # A late batch for a day already in Gold: the next start picks up that file only
+    land(data_paths, "transactions_20240101_late.csv", "2024-01-01", [4.0], first_id=3)
+    StreamingPipeline(transformer).run(available_now=True)
+    assert read_gold() == {"2024-01-01": (19.0, 3), "2024-01-02": (2.0, 1)}
+    assert stream_runs(data_paths)[-1]["batches"] == ["transactions_20240101_late.csv"]
+
+def test_replayed_micro_batch_is_exactly_once(transformer, data_paths):
+    """Validate that a micro-batch replayed after a crash (output written, commit lost) changes nothing."""
+    from src.streaming import StreamingPipeline, checkpoint_dir
+    land(data_paths, "transactions_20240301.csv", "2024-03-01", [7.0, 3.0, -2.0])
+    StreamingPipeline(transformer).run(available_now=True)
+    silver_files = sorted(os.listdir(os.path.join(settings.paths.silver, "transactions", "date=2024-03-01")))
+
+    for name in ("0", ".0.crc"):
+        os.remove(os.path.join(checkpoint_dir(), "commits", name))
+    StreamingPipeline(transformer).run(available_now=True)
+
+    assert [run["micro_batch"] for run in stream_runs(data_paths)] == [0, 0]
+    assert read_gold() == {"2024-03-01": (10.0, 2)}
+    assert len(read_dlq()) == 1
+    assert len(os.listdir(os.path.join(settings.paths.silver, "transactions", "date=2024-03-01"))) == len(silver_files)
@@ -0,0 +1,115 @@
+import os
+import shutil
+import pytest
+import pandas as pd
+from src.config_loader import settings
+from src.dedup_index import TransactionIdIndex, hash_ids
+from src.dlq import read_dlq
+from conftest import REASON_CODE_ROWS, REASON_CODES, make_batch
+
+# Only the tests that start a Spark session need a JVM; the schema test does not
+requires_java = pytest.mark.skipif(
+    shutil.which("java") is None and "JAVA_HOME" not in os.environ,
+    reason="Spark tests need a Java runtime"
+)
+
+TX_IDS = [f"00000000-0000-4000-8000-00000000000{i}" for i in range(4)]
+
+RAW_ROWS = pd.DataFrame({
+    "transaction_id": [TX_IDS[1], TX_IDS[2], None, TX_IDS[3]],
+    "customer_id": ["C1", "C2", "C3", "C4"],
+    "email": ["a@b.com", "c@d.com", "e@f.com", "g@h.com"],
+    "pan": ["4111222233334444"] * 4,
+    "amount": [100.0, -50.0, 300.0, 20.0],
+    "currency": ["USD", "EUR", "USD", None],
+    "timestamp": ["2023-01-01T10:00:00.000000"] * 4
+})
+
+@pytest.fixture(scope="module")
+def transformer():
+    """Fixture for a BankingTransformer on a local Spark session."""
+    from src.transformer import BankingTransformer
+    transformer = BankingTransformer()
+    yield transformer
+    transformer.close()
+
+@requires_java
+def test_spark_ingestion_splits_batch_without_pandas(transformer, data_paths):
+    """Validate that Spark-native ingestion applies the quarantine predicates and secures silver."""
+    raw_file = data_paths / "transactions_20230101.csv"
+    RAW_ROWS.to_csv(raw_file, index=False)
+
+    silver_path = transformer.ingest_to_silver(str(raw_file), "2023-01-01")
+
+    silver = pd.read_parquet(silver_path)
+    assert silver["transaction_id"].tolist() == [TX_IDS[1]]
+    assert "pan" not in silver.columns and "email" not in silver.columns
+    assert silver["timestamp"].notnull().all()
+
+    quarantine = read_dlq("2023-01-01", "2023-01-01").to_pandas()
+    assert sorted(quarantine["dq_reason_codes"]) == ["AMOUNT_MIN", "CURRENCY_NOT_NULL", "TRANSACTION_ID_NOT_NULL"]
+    assert set(quarantine["dq_batch"]) == {"transactions_20230101.csv"}
+    assert set(quarantine["timestamp"]) == {"2023-01-01T10:00:00.000000"}
+
+    # A malformed timestamp is quarantined with the text it arrived with, not as null
+    malformed = RAW_ROWS.iloc[[0]].assign(transaction_id=TX_IDS[0], timestamp="01/02/2023 10:00")
+    malformed.to_csv(data_paths / "transactions_20230102.csv", index=False)
+    assert transformer.ingest_to_silver(str(data_paths / "transactions_20230102.csv"), "2023-01-02") is None
+    assert read_dlq("2023-01-02", "2023-01-02")["timestamp"].to_pylist() == ["01/02/2023 10:00"]
+
+    # Accepted ids reach the duplicate index from the executors' hashes, not a collect
+    index = TransactionIdIndex(os.path.join(settings.paths.silver, "_dedup_index", "transaction_id"))
+    assert index.lookup(hash_ids(TX_IDS[1:3])).tolist() == [True, False]
+    assert not any(name.startswith("_ids-") for name in os.listdir(os.path.join(settings.paths.silver, "transactions")))
+
+@requires_java
+def test_spark_reason_codes_match_the_pandas_engine(transformer, data_paths):
+    """Validate that Spark quarantines each row with the pandas engine's reason codes (malformed timestamps included)."""
+    raw_file = data_paths / "transactions_20230105.csv"
+    REASON_CODE_ROWS.to_csv(raw_file, index=False)
+
+    transformer.ingest_to_silver(str(raw_file), "2023-01-05")
+
+    quarantine = read_dlq("2023-01-05", "2023-01-05").to_pandas().sort_values("customer_id")
+    assert quarantine["dq_reason_codes"].tolist() == REASON_CODES
+    assert quarantine["timestamp"].tolist() == ["2023-13-45T99:00:00", "2023-01-01T10:00:00"]
+
+def test_spark_schema_follows_registry():
+    """Validate that the explicit Spark schema is built from pipeline_config.yaml."""
+    from src.transformer import raw_spark_schema
+
+    schema = raw_spark_schema()
+    assert schema.fieldNames() == settings.quality.expected_columns
+    assert schema["amount"].dataType.typeName() == "double"
+    assert schema["timestamp"].dataType.typeName() == "timestamp"
+
+def read_gold():
+    gold = pd.read_parquet(os.path.join(settings.paths.gold, "daily_currency"))
+    return {str(row.date): (row.total_amount, row.tx_count) for row in gold.itertuples()}
+
+@requires_java
+def test_gold_is_updated_incrementally_per_partition(transformer, data_paths):
+    """Validate that a new day adds its partition without wiping earlier days, and re-runs replace."""
+    day1 = transformer.transform_to_silver(make_batch("2024-01-01", [10.0, 5.0]), "transactions_20240101.csv")
+    transformer.silver_to_gold(day1)
+    day2 = transformer.transform_to_silver(make_batch("2024-01-02", [1.0]), "transactions_20240102.csv")
+    transformer.silver_to_gold(day2)
+
+    assert read_gold() == {"2024-01-01": (15.0, 2), "2024-01-02": (1.0, 1)}
+
+    # Idempotent re-run of day 1 with corrected data
+    day1 = transformer.transform_to_silver(make_batch("2024-01-01", [7.0]), "transactions_20240101.csv")
+    transformer.silver_to_gold(day1)
+    assert read_gold() == {"2024-01-01": (7.0, 1), "2024-01-02": (1.0, 1)}
+
+@requires_java
+def test_gold_skips_already_folded_input(transformer, data_paths):
+    """Validate that re-submitting an unchanged silver input does not rewrite Gold."""
+    silver = transformer.transform_to_silver(make_batch("2024-02-01", [3.0]), "transactions_20240201.csv")
+    transformer.silver_to_gold(silver)
+    partition = os.path.join(settings.paths.gold, "daily_currency", "year=2024", "month=2", "day=1")
+    files_before = sorted(os.listdir(partition))
+
+    transformer.silver_to_gold(silver)
+
+    assert sorted(os.listdir(partition)) == files_before